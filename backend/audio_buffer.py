@@ -0,0 +1,482 @@
+"""
+Preallocated audio buffers for the capture path
+The PortAudio callback copies each block into storage allocated up front
+instead of allocating a fresh array and growing a Python list per callback.
+Recordings are spooled to memory-mapped WAV files, so their RAM use stays
+flat and a crash leaves the audio on disk.
+"""
+import mmap
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from typing import List, Optional
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity: int, channels: int = 1, dtype=np.int16):
+        """
+        Fixed-capacity single-producer/single-consumer ring buffer
+
+        One thread (the audio callback) writes and one thread reads. Each side
+        only advances its own position counter, so no lock is needed.
+
+        Args:
+            capacity: Frames the buffer holds
+            channels: Channels per frame
+            dtype: Sample type
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((capacity, channels), dtype=dtype)
+        self._write_pos = 0  # Total frames ever written (writer-owned)
+        self._read_pos = 0  # Total frames ever read (reader-owned)
+        self._data_ready = threading.Event()
+
+        self.overflow_frames = 0  # Frames dropped because the reader fell behind
+
+    def __len__(self) -> int:
+        return self._write_pos - self._read_pos
+
+    def available(self) -> int:
+        """Frames waiting to be read"""
+        return self._write_pos - self._read_pos
+
+    def free(self) -> int:
+        """Frames that can be written without dropping"""
+        return self.capacity - self.available()
+
+    def write(self, block: np.ndarray) -> int:
+        """
+        Copy a block in; frames that don't fit are dropped and counted
+
+        Args:
+            block: Array of shape (frames, channels) or (frames,)
+
+        Returns:
+            Frames written
+        """
+        block = block.reshape(-1, self.channels)
+        n = min(len(block), self.free())
+        if n < len(block):
+            self.overflow_frames += len(block) - n
+
+        if n:
+            start = self._write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[start:start + first] = block[:first]
+            if first < n:
+                self._data[:n - first] = block[first:n]
+            self._write_pos += n
+            self._data_ready.set()
+        return n
+
+    def read(self, frames: Optional[int] = None, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Read frames, waiting for them to arrive
+
+        Args:
+            frames: Exact number of frames to read (None = whatever is available)
+            timeout: Seconds to wait; None waits forever
+
+        Returns:
+            Array of shape (frames, channels), or None on timeout
+        """
+        wanted = frames or 1
+        while self.available() < wanted:
+            self._data_ready.clear()
+            if self.available() >= wanted:
+                break
+            if not self._data_ready.wait(timeout):
+                return None
+
+        n = frames or self.available()
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty((n, self.channels), dtype=self._data.dtype)
+        out[:first] = self._data[start:start + first]
+        if first < n:
+            out[first:] = self._data[:n - first]
+        self._read_pos += n
+        return out
+
+    def clear(self):
+        """Discard unread frames (reader side)"""
+        self._read_pos = self._write_pos
+
+
+WAV_HEADER_BYTES = 44
+SPOOL_PREFIX = 'recording_'
+RECOVERED_PREFIX = 'recovered_'
+SAVED_PREFIX = 'saved_'
+
+
+def wav_header(sample_rate: int, channels: int, data_bytes: int) -> bytes:
+    """Canonical 44-byte header of a 16-bit PCM WAV file"""
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_bytes, b'WAVE',
+                       b'fmt ', 16, 1, channels, sample_rate,
+                       sample_rate * channels * 2, channels * 2, 16,
+                       b'data', data_bytes)
+
+
+class RecordingBuffer:
+    def __init__(self, sample_rate: int = 16000, channels: int = 1,
+                 initial_seconds: float = 60,
+                 grow_seconds: float = 600,
+                 spool_dir: str = None,
+                 realtime: bool = False):
+        """
+        Append-only int16 recording spooled to a memory-mapped WAV file
+
+        Blocks are copied straight into the mapping, so RAM use doesn't grow
+        with the recording and view() hands the decoder the samples without
+        a copy. The header's sizes are updated with every block (a store into
+        the mapping, no system call), so if the process dies mid-recording
+        the spool is a valid recording up to the last block; recover_spools()
+        finalizes such files. close() trims the file to the audio.
+
+        The spool is extended on a background thread once it is half full, so
+        writes normally do no file I/O. With realtime (the writer is the audio
+        callback), call open() before the first block; a block that finds the
+        spool full anyway is cut short and counted in dropped_frames instead
+        of extending the file in the callback.
+
+        Args:
+            sample_rate: Sample rate of the audio
+            channels: Channels per frame
+            initial_seconds: Spool size mapped up front
+            grow_seconds: Largest step the spool grows by (it doubles up to this)
+            spool_dir: Directory for spool files (default: system temp dir)
+            realtime: Never extend the spool in write()
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.spool_dir = spool_dir or tempfile.gettempdir()
+        self.realtime = realtime
+
+        self._initial_frames = max(1, int(initial_seconds * sample_rate))
+        self._grow_frames = max(1, int(grow_seconds * sample_rate))
+        self._frame_bytes = 2 * channels
+        self._length = 0
+        self._capacity = 0
+        self._path = None
+        self._file = None
+        self._map = None
+        self._samples = None  # (capacity, channels) int16 array over the mapping
+        self._retired = []  # Weak refs to mappings replaced while a view() still used them
+        self._grow_requested = False
+        self._lock = threading.Lock()  # Serializes opening, growing and closing (not write())
+
+        self.dropped_frames = 0  # Realtime frames that found the spool full
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def duration(self) -> float:
+        """Recorded seconds"""
+        return self._length / self.sample_rate
+
+    @property
+    def path(self) -> Optional[str]:
+        """Spool file of the current recording (None until opened)"""
+        return self._path
+
+    def open(self):
+        """Create the spool now, so the first write() doesn't have to"""
+        with self._lock:
+            if self._file is None:
+                self._open_locked()
+
+    def write(self, block: np.ndarray):
+        """
+        Append a block (single writer)
+
+        Args:
+            block: int16 array of shape (frames, channels) or (frames,)
+        """
+        block = np.asarray(block, dtype=np.int16).reshape(-1, self.channels)
+        n = len(block)
+        if not n:
+            return
+
+        if self._file is None:
+            if self.realtime:
+                return  # Not opened yet, or a late block after close()
+            self.open()
+        # Read the capacity before the samples: the grower publishes them in the other order
+        capacity = self._capacity
+        if self._length + n > capacity:
+            if self.realtime:
+                self.dropped_frames += self._length + n - capacity
+                n = capacity - self._length
+                block = block[:n]
+            else:
+                with self._lock:
+                    self._grow_locked(self._length + n)
+                capacity = self._capacity
+        if capacity - (self._length + n) < self._headroom(capacity) and not self._grow_requested:
+            self._grow_requested = True
+            _grow_requests.put(self)
+        samples, mapping = self._samples, self._map
+        if not n or samples is None:
+            return
+
+        samples[self._length:self._length + n] = block
+        self._length += n
+        data_bytes = self._length * self._frame_bytes
+        struct.pack_into('<I', mapping, 4, 36 + data_bytes)
+        struct.pack_into('<I', mapping, 40, data_bytes)
+
+    def _headroom(self, capacity: int) -> int:
+        """Free frames below which the spool is extended in the background"""
+        return min(capacity, self._grow_frames) // 2
+
+    def _open_locked(self):
+        _start_grower()
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._path = os.path.join(self.spool_dir, f'{SPOOL_PREFIX}{uuid.uuid4().hex}.wav')
+        self._file = open(self._path, 'w+b')
+        self._file.write(wav_header(self.sample_rate, self.channels, 0))
+        self._length = 0
+        self._capacity = 0
+        self._grow_locked(self._initial_frames)
+
+    def _grow_ahead(self):
+        """Extend the spool before the writer runs out of room (grower thread)"""
+        with self._lock:
+            self._grow_requested = False
+            if self._file is None:
+                return  # Closed meanwhile
+            if self._capacity - self._length < self._headroom(self._capacity):
+                self._grow_locked(self._length)
+
+    def _grow_locked(self, needed: int):
+        """Extend the spool file and map it again"""
+        capacity = max(needed, min(max(self._capacity * 2, self._initial_frames),
+                                   self._capacity + self._grow_frames))
+        self._file.truncate(WAV_HEADER_BYTES + capacity * self._frame_bytes)
+        new_map = mmap.mmap(self._file.fileno(), WAV_HEADER_BYTES + capacity * self._frame_bytes)
+        # Publish the new samples before the capacity, so a concurrent write()
+        # or view() never indexes past the end of the array it got. A block
+        # still being stored through the old mapping lands in the same file.
+        self._samples = np.frombuffer(new_map, dtype=np.int16,
+                                      offset=WAV_HEADER_BYTES).reshape(capacity, self.channels)
+        old_map, self._map = self._map, new_map
+        self._capacity = capacity
+        if old_map is not None:
+            try:
+                old_map.close()
+            except BufferError:
+                # A view() handed out earlier still uses it; close() waits for it
+                self._retired.append(weakref.ref(old_map))
+
+    def view(self) -> np.ndarray:
+        """
+        The recorded audio without copying
+
+        Returns:
+            Read-only array of shape (frames, channels) over the spool mapping.
+            It stays valid after the buffer grows, resets or closes.
+        """
+        # Length first: samples published no earlier than it always cover it
+        length = self._length
+        samples = self._samples
+        if not length or samples is None:
+            return np.empty((0, self.channels), dtype=np.int16)
+        view = samples[:length]
+        view.flags.writeable = False
+        return view
+
+    def reset(self):
+        """Discard the recording and start a new one (in a new spool file)"""
+        self.close()
+
+    def close(self, keep: bool = False) -> Optional[str]:
+        """
+        Finish the spool: trim it to the audio and delete it unless kept
+
+        While view()s of the recording are still alive the file stays mapped,
+        and it can't be trimmed, deleted or renamed (Windows refuses); that is
+        then done when the last of them is released.
+
+        Args:
+            keep: Leave the finalized WAV file on disk, renamed to saved_<time>.wav
+                  so it isn't taken for an interrupted recording
+
+        Returns:
+            Path of the kept file, or None
+        """
+        with self._lock:
+            if self._file is None:
+                return None
+
+            path, file = self._path, self._file
+            size = WAV_HEADER_BYTES + self._length * self._frame_bytes
+            target = _stamped_path(path, SAVED_PREFIX) if keep else None
+            maps = [ref() for ref in self._retired] + [self._map]
+            self._samples = None
+            self._map = None
+            self._retired = []
+            self._file = None
+            self._path = None
+            self._length = 0
+            self._capacity = 0
+
+        in_use = []
+        for mapping in maps:
+            if mapping is None or mapping.closed:
+                continue
+            mapping.flush()
+            try:
+                mapping.close()
+            except BufferError:
+                in_use.append(mapping)
+        del maps, mapping
+        if not in_use:
+            _finish_spool(file, path, size, target)
+            return target
+
+        # Finish once every mapping still read through a view() is released
+        remaining = [len(in_use)]
+        lock = threading.Lock()
+
+        def release():
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            _finish_spool(file, path, size, target)
+
+        for mapping in in_use:
+            weakref.finalize(mapping, release)
+        return target
+
+
+def _finish_spool(file, path: str, size: int, target: Optional[str]):
+    """Trim a closed spool to its audio, then move it to target or delete it"""
+    try:
+        try:
+            file.truncate(size)
+        finally:
+            file.close()
+        if target:
+            os.replace(path, target)
+            return
+        os.remove(path)
+    except OSError as e:
+        # Left on disk; an unfinished spool is recovered as a recording on the next start
+        print(f"[AUDIO] Could not finish spool {path}: {e}")
+
+
+_grow_requests = queue.SimpleQueue()  # RecordingBuffers whose spool is filling up
+_grower = None
+_grower_lock = threading.Lock()
+
+
+def _start_grower():
+    """Start the thread that extends spools, so the audio callback never has to"""
+    global _grower
+    with _grower_lock:
+        if _grower is None:
+            _grower = threading.Thread(target=_grow_spools, name='spool-grower', daemon=True)
+            _grower.start()
+
+
+def _grow_spools():
+    while True:
+        buffer = _grow_requests.get()
+        try:
+            buffer._grow_ahead()
+        except OSError as e:
+            print(f"[AUDIO] Could not extend recording spool {buffer.path}: {e}")
+        del buffer
+
+
+def _stamped_path(spool_path: str, prefix: str) -> str:
+    """recording_<id>.wav -> <prefix><modification time>_<short id>.wav"""
+    directory, name = os.path.split(spool_path)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(os.path.getmtime(spool_path)))
+    return os.path.join(directory, f'{prefix}{stamp}_{name[len(SPOOL_PREFIX):][:8]}.wav')
+
+
+def remove_stale_recordings(spool_dir: str, max_age_seconds: float) -> int:
+    """
+    Delete kept (saved_) and recovered (recovered_) recordings older than max_age_seconds
+
+    Spools of recordings in progress are left alone.
+
+    Returns:
+        Number of files deleted
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    try:
+        entries = list(os.scandir(spool_dir))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.startswith((SAVED_PREFIX, RECOVERED_PREFIX)) or not entry.name.endswith('.wav'):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue  # Removed meanwhile, or in use
+    if removed:
+        print(f"[AUDIO] Deleted {removed} old saved or recovered recording(s) from {spool_dir}")
+    return removed
+
+
+def recover_spools(spool_dir: str) -> List[str]:
+    """
+    Finalize spool files left behind by a process that died while recording
+
+    Only call this when no other process records into spool_dir.
+
+    Returns:
+        Paths of the recovered WAV files, renamed to recovered_<time>.wav
+    """
+    if not os.path.isdir(spool_dir):
+        return []
+
+    recovered = []
+    for name in sorted(os.listdir(spool_dir)):
+        if not (name.startswith(SPOOL_PREFIX) and name.endswith('.wav')):
+            continue
+        path = os.path.join(spool_dir, name)
+        try:
+            with open(path, 'r+b') as f:
+                header = f.read(WAV_HEADER_BYTES)
+                if len(header) < WAV_HEADER_BYTES or header[:4] != b'RIFF':
+                    data_bytes = 0
+                else:
+                    block_align = max(struct.unpack_from('<H', header, 32)[0], 1)
+                    data_bytes = min(struct.unpack_from('<I', header, 40)[0],
+                                     os.fstat(f.fileno()).st_size - WAV_HEADER_BYTES)
+                    data_bytes -= data_bytes % block_align
+                if data_bytes > 0:
+                    f.truncate(WAV_HEADER_BYTES + data_bytes)
+                    f.seek(4)
+                    f.write(struct.pack('<I', 36 + data_bytes))
+                    f.seek(40)
+                    f.write(struct.pack('<I', data_bytes))
+            if data_bytes <= 0:
+                os.remove(path)
+                continue
+
+            target = _stamped_path(path, RECOVERED_PREFIX)
+            os.replace(path, target)
+            recovered.append(target)
+            print(f"[AUDIO] Recovered interrupted recording: {target}")
+        except OSError as e:
+            print(f"[AUDIO] Could not recover {path}: {e}")
+    return recovered
@@ -0,0 +1,221 @@
+"""
+Incremental decoding of uploaded audio
+Turns a request body stream (raw PCM, WAV, or compressed audio through
+PyAV) into 16kHz mono int16 blocks as the bytes arrive, without temp files
+and without holding the whole upload in memory.
+"""
+import struct
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+TARGET_RATE = 16000
+READ_BYTES = 64 * 1024
+
+WAV_TYPES = ('audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave')
+PCM_TYPES = ('audio/pcm', 'audio/l16', 'audio/x-raw', 'application/octet-stream')
+
+
+class UnsupportedAudio(ValueError):
+    """The upload is in a format this backend can't decode"""
+
+
+class _PeekStream:
+    """Read-only stream that lets the first bytes be inspected without losing them"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._head = b""
+
+    def peek(self, n: int) -> bytes:
+        while len(self._head) < n:
+            data = self._stream.read(n - len(self._head))
+            if not data:
+                break
+            self._head += data
+        return self._head[:n]
+
+    def read(self, n: int = -1) -> bytes:
+        if self._head:
+            if n is None or n < 0:
+                data, self._head = self._head + self._stream.read(), b""
+                return data
+            data, self._head = self._head[:n], self._head[n:]
+            if len(data) < n:
+                data += self._stream.read(n - len(data)) or b""
+            return data
+        return self._stream.read(n)
+
+    def read_exact(self, n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            piece = self.read(n - len(data))
+            if not piece:
+                break
+            data += piece
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        # Files on disk are seekable (M4A often keeps its index at the end); request bodies are not
+        seekable = getattr(self._stream, 'seekable', None)
+        return bool(seekable and seekable())
+
+    def tell(self) -> int:
+        return self._stream.tell() - len(self._head)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset, whence = self.tell() + offset, 0
+        self._head = b""
+        return self._stream.seek(offset, whence)
+
+
+def iter_pcm_blocks(stream: BinaryIO, content_type: Optional[str] = None,
+                    audio_format: Optional[str] = None,
+                    sample_rate: int = TARGET_RATE,
+                    channels: int = 1) -> Iterator[np.ndarray]:
+    """
+    Decode an audio byte stream incrementally into 16kHz mono int16 blocks
+
+    Args:
+        stream: File-like object with read(n), e.g. a request body stream
+        content_type: MIME type of the upload, used when audio_format is not given
+        audio_format: 'pcm', 'wav', 'av' (anything PyAV can decode) or None to detect
+        sample_rate: Sample rate of raw PCM uploads (must be 16kHz)
+        channels: Channel count of raw PCM uploads (mixed down to mono)
+
+    Yields:
+        1-D int16 arrays at 16kHz
+
+    Raises:
+        UnsupportedAudio: If the format can't be decoded
+    """
+    source = _PeekStream(stream)
+    audio_format = (audio_format or _detect_format(source, content_type)).lower()
+    if audio_format == 'wav' and not _is_plain_wav(source):
+        audio_format = 'av'  # Other rates/sample formats: FFmpeg decodes and resamples
+
+    if audio_format == 'pcm':
+        if sample_rate != TARGET_RATE:
+            raise UnsupportedAudio(f"Raw PCM must be {TARGET_RATE}Hz, got {sample_rate}Hz; "
+                                   f"send WAV or a compressed format to resample")
+        yield from _iter_pcm(source, channels)
+    elif audio_format == 'wav':
+        channels, data_bytes = _read_wav_header(source)
+        yield from _iter_pcm(source, channels, data_bytes)
+    elif audio_format == 'av':
+        yield from _iter_av(source)
+    else:
+        raise UnsupportedAudio(f"Unknown audio format '{audio_format}'")
+
+
+def _detect_format(source: _PeekStream, content_type: Optional[str]) -> str:
+    head = source.peek(12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return 'wav' if _is_plain_wav(source) else 'av'
+    mime = (content_type or "").split(';')[0].strip().lower()
+    if mime in WAV_TYPES:
+        return 'wav'
+    if mime in PCM_TYPES or not mime:
+        return 'pcm'
+    return 'av'
+
+
+def _is_plain_wav(source: _PeekStream) -> bool:
+    """Whether the peeked WAV header is 16kHz 16-bit PCM, which is decoded without PyAV"""
+    head = source.peek(4096)
+    position = 12
+    while position + 8 <= len(head):
+        chunk_id, size = struct.unpack('<4sI', head[position:position + 8])
+        if chunk_id == b'fmt ':
+            if position + 8 + 16 > len(head):
+                return False
+            tag, _, rate, _, _, bits = struct.unpack('<HHIIHH', head[position + 8:position + 24])
+            return tag in (1, 0xFFFE) and rate == TARGET_RATE and bits == 16
+        position += 8 + size + (size & 1)
+    return False
+
+
+def _read_wav_header(source: _PeekStream) -> Tuple[int, Optional[int]]:
+    """
+    Consume a 16kHz 16-bit PCM RIFF header up to the start of the sample data
+
+    Returns:
+        Channel count, and the size of the data chunk in bytes (None if
+        unknown: streamed WAVs write 0 or 0xFFFFFFFF and run to the end)
+    """
+    riff = source.read_exact(12)
+    if riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise UnsupportedAudio("Not a WAV file")
+
+    channels = None
+    while True:
+        header = source.read_exact(8)
+        if len(header) < 8:
+            raise UnsupportedAudio("WAV file has no data chunk")
+        chunk_id, size = struct.unpack('<4sI', header)
+        if chunk_id == b'data':
+            if not channels:
+                raise UnsupportedAudio("WAV data chunk comes before its format chunk")
+            return channels, (size if size not in (0, 0xFFFFFFFF) else None)
+        body = source.read_exact(size + (size & 1))
+        if chunk_id == b'fmt ':
+            channels = struct.unpack('<H', body[2:4])[0]
+
+
+def _iter_pcm(source: _PeekStream, channels: int,
+              data_bytes: Optional[int] = None) -> Iterator[np.ndarray]:
+    """
+    Little-endian int16 frames, carrying partial frames over between reads
+
+    With data_bytes, stops at the end of the WAV data chunk, so trailing
+    chunks (LIST, id3, ...) aren't decoded as samples.
+    """
+    frame_bytes = 2 * channels
+    leftover = b""
+    remaining = data_bytes
+    while remaining is None or remaining > 0:
+        data = source.read(READ_BYTES if remaining is None else min(READ_BYTES, remaining))
+        if not data:
+            break
+        if remaining is not None:
+            remaining -= len(data)
+        data = leftover + data
+        usable = len(data) - len(data) % frame_bytes
+        leftover = data[usable:]
+        if not usable:
+            continue
+        samples = np.frombuffer(data[:usable], dtype='<i2')
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        yield samples
+
+
+def _iter_av(source: _PeekStream) -> Iterator[np.ndarray]:
+    """Decode anything FFmpeg understands through PyAV, resampling to 16kHz mono"""
+    try:
+        import av
+    except ImportError:
+        raise UnsupportedAudio("Compressed audio needs PyAV (pip install av); "
+                               "send 16kHz WAV or raw PCM instead")
+
+    try:
+        container = av.open(source, mode='r')
+    except Exception as e:
+        raise UnsupportedAudio(f"Could not open audio stream: {e}")
+
+    try:
+        if not container.streams.audio:
+            raise UnsupportedAudio("Upload has no audio stream")
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=TARGET_RATE)
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                yield resampled.to_ndarray().reshape(-1)
+        for resampled in resampler.resample(None):  # Flush buffered samples
+            yield resampled.to_ndarray().reshape(-1)
+    finally:
+        container.close()
@@ -0,0 +1,230 @@
+"""
+Recorded audio sources
+Drop-in replacements for CaptureHub that replay a WAV/FLAC file or an
+in-memory generator instead of a microphone, so WakeWordListener can be
+load-tested and production wake/stop sequences reproduced on machines
+without audio hardware.
+
+Every source has the CaptureHub interface (subscribe/unsubscribe/start/stop,
+device_id, frames_captured), so the listener consumes it unchanged.
+"""
+import threading
+import time
+import wave
+from typing import Iterable, Iterator
+
+import numpy as np
+
+try:
+    import soundfile as sf  # Optional: FLAC and other formats the wave module can't read
+except ImportError:
+    sf = None
+
+
+class ReplaySource:
+    def __init__(self, sample_rate: int = 16000, channels: int = 1,
+                 blocksize: int = 1600, realtime: bool = True):
+        """
+        Base class for sources that push pre-recorded audio to subscribers
+
+        Args:
+            sample_rate: Sample rate of the delivered audio
+            channels: Channels of the delivered audio
+            blocksize: Frames per delivered block (1600 = 100ms at 16kHz)
+            realtime: If True, deliver at 1x speed like a live device (a slow
+                      consumer drops frames, as it would live). If False,
+                      deliver as fast as the subscribers can take it, waiting
+                      for free space in sinks that report it (RingBuffer.free)
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.device_id = None
+
+        self._sinks = ()  # Replaced, never mutated, like CaptureHub._sinks
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.finished = threading.Event()  # Set once the whole source has been delivered
+
+        self.frames_captured = 0
+        self.status_count = 0
+        self.last_status = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def subscribe(self, sink) -> int:
+        """Start delivering blocks to sink; returns the index of its first frame"""
+        with self._lock:
+            if sink not in self._sinks:
+                self._sinks = self._sinks + (sink,)
+            return self.frames_captured
+
+    def unsubscribe(self, sink):
+        """Stop delivering blocks to sink"""
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def start(self):
+        """Start replaying in a background thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self.finished.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop replaying; subscribers stay registered"""
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the source has delivered everything; False on timeout"""
+        return self.finished.wait(timeout)
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        """Yield int16 blocks of shape (frames, channels); implemented by subclasses"""
+        raise NotImplementedError
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            for block in self._blocks():
+                if not self._running:
+                    return
+                if self.realtime:
+                    # A microphone delivers a block once its last frame is captured
+                    due = start + (self.frames_captured + len(block)) / self.sample_rate
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                elif not self._wait_for_space(len(block)):
+                    return
+                for sink in self._sinks:
+                    sink.write(block)
+                self.frames_captured += len(block)
+        except Exception as e:
+            self.status_count += 1
+            self.last_status = str(e)
+            print(f"[REPLAY] Error replaying audio: {e}")
+        finally:
+            self._running = False
+            self.finished.set()
+
+    def _wait_for_space(self, frames: int) -> bool:
+        """Backpressure for unthrottled replay: wait until every bounded sink has room"""
+        while self._running:
+            if all(getattr(sink, 'free', None) is None or sink.free() >= frames
+                   for sink in self._sinks):
+                return True
+            time.sleep(0.005)
+        return False
+
+    def _to_blocks(self, audio: np.ndarray) -> Iterator[np.ndarray]:
+        """Split audio into blocksize blocks of the delivered shape"""
+        audio = audio.reshape(-1, self.channels)
+        for offset in range(0, len(audio), self.blocksize):
+            yield audio[offset:offset + self.blocksize]
+
+
+class FileSource(ReplaySource):
+    def __init__(self, path: str, sample_rate: int = 16000, channels: int = 1,
+                 blocksize: int = 1600, realtime: bool = True,
+                 loop: bool = False, trailing_silence: float = 0.0):
+        """
+        Replay a WAV file (or FLAC/OGG when soundfile is installed)
+
+        The file is read block by block, so hour-long recordings are never
+        loaded whole. Multi-channel files are mixed down when channels=1.
+
+        Args:
+            path: Audio file; must already be at sample_rate
+            sample_rate: Expected sample rate
+            channels: Delivered channels
+            blocksize: Frames per delivered block
+            realtime: 1x speed if True, otherwise as fast as consumed
+            loop: Replay the file until stopped
+            trailing_silence: Seconds of silence delivered after the file, so
+                              the last utterance ends at a pause
+        """
+        super().__init__(sample_rate, channels, blocksize, realtime)
+        self.path = path
+        self.loop = loop
+        self.trailing_silence = trailing_silence
+        self.device_id = path
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        while True:
+            yield from self._read_file()
+            if not (self.loop and self._running):
+                break
+        silence = int(self.trailing_silence * self.sample_rate)
+        if silence:
+            yield from self._to_blocks(np.zeros((silence, self.channels), dtype=np.int16))
+
+    def _read_file(self) -> Iterator[np.ndarray]:
+        if self.path.lower().endswith('.wav'):
+            yield from self._read_wav()
+            return
+        if sf is None:
+            raise RuntimeError(f"{self.path}: install soundfile to replay non-WAV audio")
+
+        with sf.SoundFile(self.path) as sound_file:
+            self._check_format(sound_file.samplerate, sound_file.channels)
+            for block in sound_file.blocks(self.blocksize, dtype='int16', always_2d=True):
+                yield self._mix(block)
+
+    def _read_wav(self) -> Iterator[np.ndarray]:
+        with wave.open(self.path, 'rb') as wav_file:
+            if wav_file.getsampwidth() != 2:
+                raise ValueError(f"{self.path}: expected 16-bit PCM")
+            file_channels = wav_file.getnchannels()
+            self._check_format(wav_file.getframerate(), file_channels)
+            while True:
+                raw = wav_file.readframes(self.blocksize)
+                if not raw:
+                    return
+                yield self._mix(np.frombuffer(raw, dtype=np.int16).reshape(-1, file_channels))
+
+    def _check_format(self, sample_rate: int, file_channels: int):
+        if sample_rate != self.sample_rate:
+            raise ValueError(f"{self.path}: sample rate {sample_rate}Hz, expected {self.sample_rate}Hz")
+        if file_channels != self.channels and self.channels != 1:
+            raise ValueError(f"{self.path}: {file_channels} channels, expected {self.channels}")
+
+    def _mix(self, block: np.ndarray) -> np.ndarray:
+        if block.shape[1] == self.channels:
+            return block
+        return block.mean(axis=1, keepdims=True).astype(np.int16)
+
+
+class GeneratorSource(ReplaySource):
+    def __init__(self, audio: Iterable[np.ndarray], sample_rate: int = 16000,
+                 channels: int = 1, blocksize: int = 1600, realtime: bool = False):
+        """
+        Replay in-memory audio: one array, or any iterable/generator of arrays
+
+        Arrays of any length are re-blocked to blocksize; int16 is expected.
+
+        Args:
+            audio: An int16 array, or an iterable yielding int16 arrays
+            sample_rate: Sample rate of the audio
+            channels: Channels of the audio
+            blocksize: Frames per delivered block
+            realtime: 1x speed if True, otherwise as fast as consumed
+        """
+        super().__init__(sample_rate, channels, blocksize, realtime)
+        self.audio = audio
+        self.device_id = "generator"
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        pieces = [self.audio] if isinstance(self.audio, np.ndarray) else self.audio
+        for piece in pieces:
+            yield from self._to_blocks(np.asarray(piece, dtype=np.int16))
@@ -0,0 +1,484 @@
+"""
+Offline performance benchmark for WhisperClient and WakeWordListener
+Runs against WAV fixtures (or synthetic audio) without a microphone and
+writes machine-readable JSON, so releases can be compared for regressions.
+
+Fixtures directory layout:
+    name.wav   - 16kHz mono int16 audio
+    name.txt   - optional reference transcript (enables WER)
+    name.json  - optional {"wake_end": seconds} marking when the wake
+                 phrase finishes (enables wake-detection latency)
+
+With a wake detector, the cascade's false-accept and false-reject rates
+are measured on labeled windows: one ending at each wake_end, and windows
+across the fixtures without a wake_end, which must not contain the phrase.
+
+Usage:
+    python benchmark.py --fixtures fixtures/ --models tiny.en small.en \\
+        --compute-types int8 --threads 0 4 --output bench.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import time
+import wave
+from datetime import datetime
+
+import numpy as np
+
+
+SAMPLE_RATE = 16000
+WAKE_WINDOW_SECONDS = 3.0  # Length of the labeled windows the wake cascade is scored on
+
+
+def load_wav(path: str) -> np.ndarray:
+    """Read a 16kHz mono int16 WAV file"""
+    with wave.open(path, 'rb') as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 \
+                or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16kHz mono 16-bit PCM")
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+
+def load_fixtures(fixtures_dir: str) -> list:
+    """Load WAV fixtures plus optional reference text and wake markers"""
+    fixtures = []
+    for name in sorted(os.listdir(fixtures_dir)):
+        if not name.lower().endswith('.wav'):
+            continue
+        base = os.path.join(fixtures_dir, name[:-4])
+        path = os.path.join(fixtures_dir, name)
+        fixture = {'name': name, 'path': path, 'audio': load_wav(path),
+                   'reference': None, 'wake_end': None}
+        if os.path.exists(base + '.txt'):
+            with open(base + '.txt', encoding='utf-8') as f:
+                fixture['reference'] = f.read().strip()
+        if os.path.exists(base + '.json'):
+            with open(base + '.json', encoding='utf-8') as f:
+                fixture['wake_end'] = json.load(f).get('wake_end')
+        fixtures.append(fixture)
+    return fixtures
+
+
+def synthetic_fixtures(seconds: float = 30.0, seed: int = 0) -> list:
+    """
+    Speech-like synthetic audio: voiced bursts between low-level noise
+
+    No reference text, so WER is not reported, but real-time factor, VAD
+    skipping and chunk latency are still exercised.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0, 40, n)
+    t = np.arange(n) / SAMPLE_RATE
+    position = 1.0
+    while position < seconds - 2:
+        length = rng.uniform(0.8, 3.0)
+        mask = (t >= position) & (t < position + length)
+        pitch = rng.uniform(100, 220)
+        envelope = np.sin(np.pi * (t[mask] - position) / length)
+        audio[mask] += 4000 * envelope * np.sign(np.sin(2 * np.pi * pitch * t[mask]))
+        position += length + rng.uniform(0.5, 2.5)
+    audio = np.clip(audio, -32768, 32767).astype(np.int16)
+    return [{'name': f'synthetic_{int(seconds)}s', 'path': None, 'audio': audio,
+             'reference': None, 'wake_end': None}]
+
+
+def wake_windows(fixtures: list, seconds: float = WAKE_WINDOW_SECONDS,
+                 negatives_per_fixture: int = 20) -> list:
+    """
+    Labeled windows for WakePhraseCascade.evaluate
+
+    Args:
+        fixtures: Loaded fixtures
+        seconds: Window length
+        negatives_per_fixture: Most windows taken from one fixture without a wake_end
+
+    Returns:
+        List of (audio window, contains_wake_phrase) pairs
+    """
+    size = int(seconds * SAMPLE_RATE)
+    windows = []
+    for fixture in fixtures:
+        audio = fixture['audio']
+        if fixture['wake_end'] is not None:
+            # Ends a little after the phrase, as the listener's window would
+            end = min(len(audio), int((fixture['wake_end'] + 0.5) * SAMPLE_RATE))
+            windows.append((audio[max(0, end - size):end], True))
+            continue
+        starts = range(0, max(1, len(audio) - size + 1), size)
+        step = max(1, len(starts) // negatives_per_fixture)
+        windows.extend((audio[start:start + size], False) for start in starts[::step][:negatives_per_fixture])
+    return windows
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length"""
+    from wake_detector import normalize_text
+
+    ref = normalize_text(reference).split()
+    hyp = normalize_text(hypothesis or "").split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def percentiles(values: list) -> dict:
+    """p50/p90/p99/max in milliseconds"""
+    if not values:
+        return None
+    ms = np.asarray(values) * 1000.0
+    return {
+        'count': len(values),
+        'p50': round(float(np.percentile(ms, 50)), 1),
+        'p90': round(float(np.percentile(ms, 90)), 1),
+        'p99': round(float(np.percentile(ms, 99)), 1),
+        'max': round(float(ms.max()), 1)
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, None where unavailable"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / 2**20 if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class TimingClient:
+    def __init__(self, client):
+        """Proxy around a WhisperClient that records how long each decode takes"""
+        self._client = client
+        self.durations = []
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def transcribe_array(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._client.transcribe_array(*args, **kwargs)
+        finally:
+            self.durations.append(time.perf_counter() - start)
+
+    def iter_segments(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return list(self._client.iter_segments(*args, **kwargs))
+        finally:
+            self.durations.append(time.perf_counter() - start)
+
+
+def run_listener(client, detector_client, fixture: dict) -> dict:
+    """Feed a fixture through WakeWordListener as fast as it can consume it"""
+    from wake_word_listener import WakeWordListener
+    from wake_detector import WakePhraseCascade
+    from audio_source import FileSource, GeneratorSource
+
+    timed = TimingClient(client)
+    wake_detector = None
+    if detector_client:
+        wake_detector = WakePhraseCascade(TimingClient(detector_client), timed, "obsidian note")
+
+    # Unthrottled replay: the source waits for queue space, so nothing is dropped
+    # and the run takes exactly as long as the listener needs.
+    # Trailing silence lets the last utterance end at a pause.
+    if fixture['path']:
+        source = FileSource(fixture['path'], realtime=False, trailing_silence=2)
+    else:
+        silence = np.zeros(SAMPLE_RATE * 2, dtype=np.int16)
+        source = GeneratorSource([fixture['audio'], silence], realtime=False)
+
+    listener = WakeWordListener(timed, wake_phrase="obsidian note", stop_phrase="obsidian stop",
+                                streaming_mode=True, capture_hub=source,
+                                wake_detector=wake_detector)
+
+    wake = {}
+
+    def on_wake():
+        # Audio consumed past the end of the wake phrase, plus the decode that found it
+        wake['audio_lag'] = listener.frames_processed / SAMPLE_RATE - (fixture['wake_end'] or 0)
+        wake['decode'] = timed.durations[-1]
+        if wake_detector:
+            wake['decode'] += wake_detector.detector_client.durations[-1]
+
+    listener.on_wake_detected = on_wake
+    start = time.perf_counter()
+    listener.start_listening()
+
+    source.wait()
+    # A remainder shorter than one block is never read; it is trailing silence
+    block = int(SAMPLE_RATE * listener.block_duration)
+    while listener.audio_queue.available() >= block:
+        time.sleep(0.01)
+    listener.is_listening = False
+    listener.process_thread.join()
+    elapsed = time.perf_counter() - start
+    source.stop()
+
+    chunk_durations = list(timed.durations)
+    if wake_detector:
+        chunk_durations += wake_detector.detector_client.durations
+
+    result = {
+        'chunk_latency_ms': percentiles(chunk_durations),
+        'chunks_transcribed': listener.chunks_transcribed,
+        'blocks_skipped': listener.blocks_skipped,
+        'listener_rtf': round(elapsed / (source.frames_captured / SAMPLE_RATE), 3)
+    }
+    if fixture['wake_end'] is not None:
+        result['wake_detected'] = bool(wake)
+        result['wake_latency_s'] = round(max(0.0, wake['audio_lag']) + wake['decode'], 3) if wake else None
+    if wake_detector:
+        result['wake_detector'] = wake_detector.get_stats()
+    return result
+
+
+def run_config(config: dict, fixtures: list) -> dict:
+    """Benchmark one (model, compute type, threads) combination; runs in its own process"""
+    start = time.perf_counter()
+    from whisper_client import WhisperClient
+    import_seconds = time.perf_counter() - start
+
+    result = dict(config)
+    start = time.perf_counter()
+    client = WhisperClient(config['model'], compute_type=config['compute_type'],
+                           cpu_threads=config['cpu_threads'])
+    result['load_seconds'] = round(time.perf_counter() - start, 2)
+    if not client.check_health():
+        result['error'] = 'model failed to load'
+        return result
+
+    # Cold start: the process is fresh, so this is what the service pays before its first answer
+    warmup_seconds = client.warm_up()
+    first_audio = fixtures[0]['audio'][:SAMPLE_RATE * 5]
+    start = time.perf_counter()
+    client.transcribe_array(first_audio, SAMPLE_RATE)
+    first_seconds = time.perf_counter() - start
+    result['cold_start'] = {
+        'import_seconds': round(import_seconds, 3),
+        'load_seconds': result['load_seconds'],
+        'warmup_seconds': round(warmup_seconds, 3),
+        'first_transcription_seconds': round(first_seconds, 3),
+        'total_seconds': round(import_seconds + result['load_seconds'] + warmup_seconds + first_seconds, 2)
+    }
+
+    detector_client = None
+    if config['wake_detector']:
+        detector_client = WhisperClient(config['wake_detector'], compute_type=config['compute_type'],
+                                        cpu_threads=config['cpu_threads'])
+
+    files = []
+    total_audio = total_decode = 0.0
+    wers = []
+    for fixture in fixtures:
+        seconds = len(fixture['audio']) / SAMPLE_RATE
+        start = time.perf_counter()
+        text = client.transcribe_array(fixture['audio'], SAMPLE_RATE)
+        decode = time.perf_counter() - start
+        total_audio += seconds
+        total_decode += decode
+
+        entry = {
+            'name': fixture['name'],
+            'audio_seconds': round(seconds, 2),
+            'rtf': round(decode / seconds, 3) if seconds else None,
+            'listener': run_listener(client, detector_client, fixture)
+        }
+        if fixture['reference'] is not None:
+            entry['wer'] = round(word_error_rate(fixture['reference'], text), 4)
+            wers.append(entry['wer'])
+        files.append(entry)
+
+    wake_latencies = [f['listener']['wake_latency_s'] for f in files
+                      if f['listener'].get('wake_latency_s') is not None]
+    result['files'] = files
+
+    # Detection accuracy of the cascade (None where there were no windows of that kind)
+    false_accept_rate = false_reject_rate = None
+    if detector_client:
+        from wake_detector import WakePhraseCascade
+
+        cascade = WakePhraseCascade(detector_client, client, "obsidian note")
+        rates = cascade.evaluate(wake_windows(fixtures), SAMPLE_RATE)
+        result['wake_evaluation'] = {k: round(v, 4) if isinstance(v, float) else v
+                                     for k, v in rates.items()}
+        if rates['negatives']:
+            false_accept_rate = round(rates['false_accept_rate'], 4)
+        if rates['positives']:
+            false_reject_rate = round(rates['false_reject_rate'], 4)
+    result['false_accept_rate'] = false_accept_rate
+    result['false_reject_rate'] = false_reject_rate
+
+    result['summary'] = {
+        'rtf': round(total_decode / total_audio, 3) if total_audio else None,
+        'wer': round(float(np.mean(wers)), 4) if wers else None,
+        'wake_latency_s': round(float(np.mean(wake_latencies)), 3) if wake_latencies else None,
+        'chunk_latency_ms': percentiles(
+            [f['listener']['chunk_latency_ms']['p50'] / 1000.0 for f in files
+             if f['listener']['chunk_latency_ms']])
+    }
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def _run_config_worker(config, fixtures, results):
+    sys.stdout = open(os.devnull, 'w')  # Keep model load chatter out of the JSON
+    try:
+        results.put(run_config(config, fixtures))
+    except Exception as e:
+        results.put({**config, 'error': str(e)})
+
+
+def run_isolated(config: dict, fixtures: list, poll_seconds: float = 1.0) -> dict:
+    """
+    Run a config in a fresh process so peak RSS and warm caches don't leak between configs
+
+    A child that dies without reporting (OOM kill, native abort in
+    CTranslate2) is reported as a failed config instead of hanging the run.
+    """
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=_run_config_worker, args=(config, fixtures, results))
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=poll_seconds)
+            break
+        except queue.Empty:
+            if process.is_alive():
+                continue
+        # Exited: take a result it put just before exiting, if any
+        try:
+            result = results.get(timeout=poll_seconds)
+        except queue.Empty:
+            result = {**config, 'error': f'benchmark process died (exit code {process.exitcode})'}
+        break
+    process.join()
+    if result.get('error'):
+        print(f"Config {config} failed: {result['error']}", file=sys.stderr)
+    return result
+
+
+def measure_service_startup(timeout: float = 600.0, url: str = 'http://localhost:8765') -> dict:
+    """
+    Start service.py and time how long until it answers /status, and until its model is ready
+
+    Needs port 8765 to be free. The service opens the default input device if
+    there is one; without audio hardware it logs a warning and carries on.
+    """
+    import subprocess
+    import requests
+
+    try:
+        requests.get(f"{url}/status", timeout=0.5)
+        return {'error': f'a service is already running at {url}'}
+    except requests.RequestException:
+        pass
+
+    result = {'first_response_seconds': None, 'ready_seconds': None, 'state': None}
+    start = time.perf_counter()
+    service_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.py')
+    process = subprocess.Popen([sys.executable, service_script],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout and process.poll() is None:
+            try:
+                state = requests.get(f"{url}/status", timeout=1).json().get('state')
+            except requests.RequestException:
+                time.sleep(0.05)
+                continue
+            elapsed = round(time.perf_counter() - start, 3)
+            if result['first_response_seconds'] is None:
+                result['first_response_seconds'] = elapsed
+            result['state'] = state
+            if state in ('ready', 'failed'):
+                result['ready_seconds'] = elapsed
+                break
+            time.sleep(0.1)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--fixtures', help='Directory of WAV fixtures (default: synthetic audio)')
+    parser.add_argument('--models', nargs='+', default=['tiny.en', 'small.en'])
+    parser.add_argument('--compute-types', nargs='+', default=['int8'])
+    parser.add_argument('--threads', nargs='+', type=int, default=[0],
+                        help='cpu_threads values to try (0 = CTranslate2 default)')
+    parser.add_argument('--wake-detector', default='tiny.en',
+                        help="Screening model for the wake cascade, or 'none'")
+    parser.add_argument('--synthetic-seconds', type=float, default=30.0)
+    parser.add_argument('--service-startup', action='store_true',
+                        help='Also time service.py from launch to first /status response and to model ready')
+    parser.add_argument('--output', help='Write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures(args.synthetic_seconds)
+    if not fixtures:
+        parser.error(f"No .wav fixtures found in {args.fixtures}")
+
+    try:
+        import faster_whisper
+        faster_whisper_version = getattr(faster_whisper, '__version__', None)
+    except ImportError:
+        faster_whisper_version = None
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'faster_whisper': faster_whisper_version
+        },
+        'fixtures': [{'name': f['name'], 'audio_seconds': round(len(f['audio']) / SAMPLE_RATE, 2)}
+                     for f in fixtures],
+        'results': []
+    }
+
+    wake_detector = None if args.wake_detector.lower() == 'none' else args.wake_detector
+    for model, compute_type, threads in itertools.product(args.models, args.compute_types, args.threads):
+        config = {'model': model, 'compute_type': compute_type, 'cpu_threads': threads,
+                  'wake_detector': wake_detector}
+        print(f"[BENCH] {model} {compute_type} threads={threads}", file=sys.stderr)
+        report['results'].append(run_isolated(config, fixtures))
+
+    if args.service_startup:
+        print("[BENCH] service startup", file=sys.stderr)
+        report['service_startup'] = measure_service_startup()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"[BENCH] Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Shared audio capture
+One sounddevice InputStream per device, fanned out to every consumer
+(manual recorder, wake word listener, ...) so they don't fight over the
+device and all see the same, sample-aligned frames.
+"""
+import threading
+
+import numpy as np
+
+
+class CaptureHub:
+    def __init__(self, sample_rate: int = 16000, channels: int = 1,
+                 blocksize: int = 1600, device_id: int = None):
+        """
+        Initialize capture hub
+
+        Args:
+            sample_rate: Capture sample rate
+            channels: Capture channels
+            blocksize: Frames per PortAudio callback (1600 = 100ms at 16kHz)
+            device_id: Audio input device ID (None = use default)
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.device_id = device_id
+
+        # Sinks are objects with a write(block) method (RingBuffer, RecordingBuffer).
+        # The tuple is replaced, never mutated, so the callback iterates it without a lock.
+        self._sinks = ()
+        self._lock = threading.Lock()  # Serializes subscribe/unsubscribe/device changes
+
+        self.stream = None
+        self.frames_captured = 0  # Frames delivered since the hub was created
+        self.status_count = 0  # Callbacks flagged with over/underflow
+        self.last_status = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.stream is not None
+
+    def subscribe(self, sink) -> int:
+        """
+        Start delivering frames to sink
+
+        Args:
+            sink: Object with a write(block) method, called from the audio thread
+
+        Returns:
+            Capture frame index of the first frame the sink will receive
+        """
+        with self._lock:
+            if sink not in self._sinks:
+                self._sinks = self._sinks + (sink,)
+            return self.frames_captured
+
+    def unsubscribe(self, sink):
+        """Stop delivering frames to sink"""
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def start(self):
+        """Open the input stream"""
+        with self._lock:
+            if self.stream is not None:
+                return
+            self._open_locked()
+
+    def stop(self):
+        """Close the input stream; subscribers stay registered"""
+        with self._lock:
+            self._close_locked()
+
+    def set_device(self, device_id: int):
+        """Switch input device, reopening the stream once for every subscriber"""
+        with self._lock:
+            self.device_id = device_id
+            if self.stream is not None:
+                self._close_locked()
+                self._open_locked()
+
+    def _open_locked(self):
+        import sounddevice as sd  # Loads PortAudio; deferred until audio is actually needed
+
+        device_name = "default" if self.device_id is None else f"device {self.device_id}"
+        stream = sd.InputStream(
+            device=self.device_id,
+            channels=self.channels,
+            samplerate=self.sample_rate,
+            callback=self._audio_callback,
+            dtype=np.int16,
+            blocksize=self.blocksize
+        )
+        stream.start()
+        self.stream = stream
+        print(f"[CAPTURE] Audio stream started on {device_name}")
+
+    def _close_locked(self):
+        if self.stream is None:
+            return
+        self.stream.stop()
+        self.stream.close()
+        self.stream = None
+        print("[CAPTURE] Audio stream stopped")
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        """Realtime callback: hand the block to every sink, no allocation"""
+        if status:
+            self.status_count += 1
+            self.last_status = str(status)
+        for sink in self._sinks:
+            sink.write(indata)
+        self.frames_captured += frames
@@ -0,0 +1,92 @@
+"""
+Transcription engine interface
+What the service, job queue and upload endpoint need from a transcription
+backend, implemented by WhisperClient (faster-whisper in this process) and
+RemoteClient (another backend over HTTP).
+"""
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+
+# All engines take mono 16kHz audio
+WHISPER_SAMPLE_RATE = 16000
+
+
+class LongFormSegment(NamedTuple):
+    """A decoded segment of a long recording, timed from the start of the recording"""
+    start: float
+    end: float
+    text: str
+
+
+class TranscriptionEngine:
+    """
+    Base class for transcription backends
+
+    Subclasses implement transcribe_audio, iter_segments,
+    iter_segments_stream and check_health; the rest have generic versions
+    built on those that engines may replace with faster ones.
+    """
+    model_size = None  # Model name, used in logs, /status and metric labels
+
+    def check_health(self) -> bool:
+        """True if the engine can transcribe right now"""
+        raise NotImplementedError
+
+    def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
+        """
+        Transcribe an audio file
+
+        Returns:
+            Transcribed text or None if error
+        """
+        raise NotImplementedError
+
+    def iter_segments(self, audio: np.ndarray,
+                      sample_rate: int = WHISPER_SAMPLE_RATE,
+                      beam_size: int = 5,
+                      initial_prompt: Optional[str] = None,
+                      word_timestamps: bool = False) -> Iterator:
+        """
+        Decode in-memory audio lazily, yielding segments (start, end, text)
+
+        Engines that can't time words ignore word_timestamps; their segments
+        have no words attribute.
+        """
+        raise NotImplementedError
+
+    def iter_segments_stream(self, blocks: Iterable[np.ndarray]) -> Iterator[LongFormSegment]:
+        """Decode 16kHz mono int16 blocks that are still arriving"""
+        raise NotImplementedError
+
+    def iter_segments_long(self, audio: np.ndarray,
+                           sample_rate: int = WHISPER_SAMPLE_RATE) -> Iterator[LongFormSegment]:
+        """Decode a long recording, yielding segments in order"""
+        for segment in self.iter_segments(audio, sample_rate):
+            yield LongFormSegment(segment.start, segment.end, segment.text)
+
+    def transcribe_array(self, audio: np.ndarray,
+                         sample_rate: int = WHISPER_SAMPLE_RATE,
+                         beam_size: int = 5) -> Optional[str]:
+        """
+        Transcribe in-memory audio
+
+        Returns:
+            Transcribed text or None if error
+        """
+        try:
+            text = " ".join(s.text.strip() for s in self.iter_segments(audio, sample_rate, beam_size))
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            return None
+        return text.strip() or None
+
+    def warm_up(self) -> float:
+        """
+        Prepare for the first real request (load kernels, open connections)
+
+        Returns:
+            Seconds it took
+        """
+        return 0.0
@@ -0,0 +1,87 @@
+"""
+In-process event bus backing the Server-Sent Events endpoint
+Keeps a bounded history of numbered events so reconnecting clients can
+resume from their Last-Event-ID.
+"""
+import itertools
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data', 'timestamp')
+
+    def __init__(self, event_id: int, event_type: str, data: dict):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.timestamp = datetime.now().isoformat()
+
+    def to_sse(self) -> str:
+        """Format as a text/event-stream message"""
+        payload = json.dumps({'timestamp': self.timestamp, **self.data})
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class EventBus:
+    def __init__(self, max_events: int = 1000):
+        """
+        Initialize event bus
+
+        Args:
+            max_events: Events kept for resuming clients; older ones are dropped
+        """
+        self._events = deque(maxlen=max_events)
+        self._last_id = 0
+        self._condition = threading.Condition()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event_type: str, data: dict = None) -> int:
+        """
+        Publish an event and wake up waiting subscribers
+
+        Returns:
+            The id assigned to the event
+        """
+        with self._condition:
+            self._last_id += 1
+            self._events.append(Event(self._last_id, event_type, data or {}))
+            self._condition.notify_all()
+            return self._last_id
+
+    def events_since(self, last_id: int) -> List[Event]:
+        """
+        Events with id greater than last_id still in the history
+
+        Ids are consecutive, so the start position is computed rather than searched.
+        """
+        with self._condition:
+            return self._events_since_locked(last_id)
+
+    def _events_since_locked(self, last_id: int) -> List[Event]:
+        if not self._events or last_id >= self._last_id:
+            return []
+        start = max(0, last_id - self._events[0].id + 1)
+        return list(itertools.islice(self._events, start, None))
+
+    def wait(self, last_id: int, timeout: Optional[float] = None) -> List[Event]:
+        """
+        Block until there are events newer than last_id or the timeout expires
+
+        Returns:
+            New events, empty on timeout
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout=timeout)
+            return self._events_since_locked(last_id)
+
+    def oldest_id(self) -> int:
+        """Id of the oldest event still available for resume (0 if none)"""
+        with self._condition:
+            return self._events[0].id if self._events else 0
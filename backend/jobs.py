@@ -0,0 +1,352 @@
+"""
+Background transcription jobs
+Recordings are queued and decoded by a small worker pool so HTTP requests
+return immediately; clients poll the job for progress and the result.
+Each recording session has its own queue and workers take from them in
+turn, so one client's backlog doesn't hold up another's recordings.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Optional
+
+import numpy as np
+from engine import TranscriptionEngine
+from scheduler import BULK, INTERACTIVE, work_class
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue (or the session's share of it) has no room for another job"""
+
+
+class TranscriptionJob:
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, audio: np.ndarray, sample_rate: int = 16000,
+                 release: Callable[[], None] = None,
+                 owner: Optional[str] = None,
+                 speculative=None):
+        """
+        A single transcription request
+
+        Args:
+            audio: Mono audio to transcribe
+            sample_rate: Sample rate of the audio
+            release: Called once the audio is no longer needed (e.g. to free
+                     the buffer the audio is a view of)
+            owner: Recording session the job belongs to
+            speculative: SpeculativeDecoder that decoded most of the audio
+                         while it was recorded; the job only finishes it
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.speculative = speculative
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.duration = len(audio) / sample_rate
+        self._release = release
+
+        self.status = self.QUEUED
+        self.segments = []  # Segments decoded so far
+        self.processed_seconds = 0.0
+        self.transcription = None
+        self.error = None
+
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+        self._cancel = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.COMPLETED, self.FAILED, self.CANCELLED)
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the audio decoded so far"""
+        if self.status == self.COMPLETED:
+            return 1.0
+        if not self.duration:
+            return 0.0
+        return min(1.0, self.processed_seconds / self.duration)
+
+    def cancel(self):
+        """Ask the job to stop; takes effect before it starts or at the next segment"""
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def to_dict(self) -> dict:
+        """JSON-serializable job status"""
+        return {
+            'job_id': self.id,
+            'session_id': self.owner,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'audio_seconds': round(self.duration, 2),
+            'processed_seconds': round(self.processed_seconds, 2),
+            'segments': list(self.segments),
+            'transcription': self.transcription,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobQueue:
+    def __init__(self, get_client: Callable[[], Optional[TranscriptionEngine]],
+                 max_workers: int = 1,
+                 max_queue_depth: int = 8,
+                 max_pending_per_owner: Optional[int] = None,
+                 max_finished_jobs: int = 50,
+                 long_form_seconds: float = 120.0):
+        """
+        Initialize the job queue and start its workers
+
+        Args:
+            get_client: Returns the engine to use; called when each job
+                        starts so model switches apply to the next job
+            max_workers: Concurrent decodes. CTranslate2 already uses every core
+                         for one decode on CPU, so more than 1 mostly helps on GPU.
+            max_queue_depth: Pending jobs accepted before submit() refuses
+            max_pending_per_owner: Pending jobs one session may have (None = no limit
+                                   beyond max_queue_depth)
+            max_finished_jobs: Finished jobs kept around for status queries
+            long_form_seconds: Recordings longer than this are split at pauses
+                               and decoded in parallel batches
+        """
+        self.get_client = get_client
+        self.max_queue_depth = max_queue_depth
+        self.max_pending_per_owner = max_pending_per_owner
+        self.max_finished_jobs = max_finished_jobs
+        self.long_form_seconds = long_form_seconds
+
+        self.on_job_progress = None  # Callback(job, segment_dict) after each decoded segment
+        self.on_job_finished = None  # Callback(job) when a job completes, fails or is cancelled
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> TranscriptionJob, oldest first
+        self._pending = OrderedDict()  # owner -> deque of queued jobs, in round-robin order
+        self._pending_count = 0
+        self._job_available = threading.Condition(self._lock)
+
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'transcribe-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, audio: np.ndarray, sample_rate: int = 16000,
+               release: Callable[[], None] = None,
+               owner: Optional[str] = None,
+               speculative=None) -> TranscriptionJob:
+        """
+        Queue audio for transcription
+
+        Args:
+            audio: Mono audio to transcribe
+            sample_rate: Sample rate of the audio
+            release: Called once the job no longer needs the audio
+            owner: Recording session submitting the job; sessions are served in turn
+            speculative: SpeculativeDecoder already decoding the audio
+
+        Returns:
+            The queued job
+
+        Raises:
+            JobQueueFull: If max_queue_depth jobs (or max_pending_per_owner of
+                          this owner's) are already waiting
+        """
+        job = TranscriptionJob(audio, sample_rate, release, owner, speculative)
+        with self._lock:
+            if self._pending_count >= self.max_queue_depth:
+                raise JobQueueFull(f"Transcription queue is full ({self.max_queue_depth} jobs waiting)")
+            owner_jobs = self._pending.get(owner)
+            if (self.max_pending_per_owner and owner_jobs
+                    and len(owner_jobs) >= self.max_pending_per_owner):
+                raise JobQueueFull(f"Session already has {len(owner_jobs)} recordings waiting")
+            if owner_jobs is None:
+                owner_jobs = self._pending[owner] = deque()
+            owner_jobs.append(job)
+            self._pending_count += 1
+            self._jobs[job.id] = job
+            self._prune_locked()
+            self._job_available.notify()
+
+        print(f"[JOBS] Queued job {job.id} ({job.duration:.1f}s of audio)"
+              + (f" for session {owner}" if owner else ""))
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        """Look up a job by id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[TranscriptionJob]:
+        """
+        Cancel a queued or running job
+
+        Returns:
+            The job, or None if no such job exists
+        """
+        job = self.get(job_id)
+        if not job:
+            return None
+        with self._lock:
+            # Checked and removed under the lock workers take jobs with, so a
+            # job is either still queued here or already a worker's to stop
+            if job.is_finished:
+                return job
+            job.cancel()
+            dequeued = self._remove_pending_locked(job)
+        if dequeued:
+            self._finish(job, TranscriptionJob.CANCELLED)
+        return job
+
+    def has_unfinished(self, owner: str) -> bool:
+        """Whether the owner has a job that is queued or running"""
+        with self._lock:
+            return any(job.owner == owner and not job.is_finished for job in self._jobs.values())
+
+    def _remove_pending_locked(self, job: TranscriptionJob) -> bool:
+        """Take a job out of its owner's queue; False if a worker already took it"""
+        owner_jobs = self._pending.get(job.owner)
+        if not owner_jobs or job not in owner_jobs:
+            return False
+        owner_jobs.remove(job)
+        if not owner_jobs:
+            del self._pending[job.owner]
+        self._pending_count -= 1
+        return True
+
+    def stats(self) -> dict:
+        """Queue depth (overall and per session) and job counts by status"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            by_owner = {str(owner): len(jobs) for owner, jobs in self._pending.items()}
+            depth = self._pending_count
+        return {
+            'queue_depth': depth,
+            'max_queue_depth': self.max_queue_depth,
+            'queue_depth_by_session': by_owner,
+            'workers': len(self._workers),
+            'jobs': counts
+        }
+
+    def _next_job(self) -> TranscriptionJob:
+        """
+        Block until a job is queued and take it
+
+        The owner at the front gives up its oldest job and moves to the
+        back, so sessions with pending work take turns.
+        """
+        with self._job_available:
+            while not self._pending_count:
+                self._job_available.wait()
+            owner, owner_jobs = next(iter(self._pending.items()))
+            job = owner_jobs.popleft()
+            del self._pending[owner]
+            if owner_jobs:
+                self._pending[owner] = owner_jobs
+            self._pending_count -= 1
+            return job
+
+    def _prune_locked(self):
+        """Forget the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _finish(self, job: TranscriptionJob, status: str, error: str = None):
+        with self._lock:
+            if job.is_finished:
+                return
+            job.status = status
+            job.error = error
+            job.finished_at = datetime.now()
+            job.audio = None  # Release the samples, only the text is needed now
+            job.speculative = None
+            release, job._release = job._release, None
+
+        if release:
+            release()
+        print(f"[JOBS] Job {job.id} {status}" + (f": {error}" if error else ""))
+        if self.on_job_finished:
+            self.on_job_finished(job)
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            try:
+                if job.cancel_requested or job.is_finished:
+                    self._finish(job, TranscriptionJob.CANCELLED)
+                    continue
+                # Short dictations (and recordings mostly decoded while they were made) are
+                # waited on; long recordings yield to them between segments
+                long_form = job.duration > self.long_form_seconds and not job.speculative
+                with work_class(BULK if long_form else INTERACTIVE):
+                    self._run(job)
+            except Exception as e:
+                self._finish(job, TranscriptionJob.FAILED, f'Processing error: {e}')
+
+    def _run(self, job: TranscriptionJob):
+        client = self.get_client()
+        if not client or not client.check_health():
+            self._finish(job, TranscriptionJob.FAILED, 'Whisper client not initialized')
+            return
+
+        with self._lock:
+            started = not job.is_finished and not job.cancel_requested
+            if started:
+                job.status = TranscriptionJob.RUNNING
+                job.started_at = datetime.now()
+        if not started:
+            self._finish(job, TranscriptionJob.CANCELLED)
+            return
+        start = time.perf_counter()
+
+        if job.speculative:
+            segments = job.speculative.finish(client)
+        elif job.duration > self.long_form_seconds:
+            segments = client.iter_segments_long(job.audio, job.sample_rate)
+        else:
+            segments = client.iter_segments(job.audio, job.sample_rate)
+
+        texts = []
+        for segment in segments:
+            texts.append(segment.text.strip())
+            segment_data = {
+                'start': round(segment.start, 2),
+                'end': round(segment.end, 2),
+                'text': segment.text.strip()
+            }
+            job.segments.append(segment_data)
+            job.processed_seconds = segment.end
+            if self.on_job_progress:
+                self.on_job_progress(job, segment_data)
+            if job.cancel_requested:
+                segments.close()
+                self._finish(job, TranscriptionJob.CANCELLED)
+                return
+
+        transcription = " ".join(texts).strip()
+        if not transcription:
+            self._finish(job, TranscriptionJob.FAILED, 'Transcription failed')
+            return
+
+        job.transcription = transcription
+        elapsed = time.perf_counter() - start
+        print(f"[JOBS] Job {job.id} decoded {job.duration:.1f}s in {elapsed:.1f}s")
+        self._finish(job, TranscriptionJob.COMPLETED)
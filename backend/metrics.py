@@ -0,0 +1,241 @@
+"""
+Minimal Prometheus metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format for the /metrics endpoint, without depending on prometheus_client.
+Recording a value is a dict lookup and a few additions under a lock, cheap
+enough for the decode path; nothing here runs in the audio callback.
+"""
+import math
+import os
+import sys
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._function = None
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def set_function(self, function: Callable):
+        """
+        Compute the value at scrape time instead of recording it
+
+        Args:
+            function: Returns a number (unlabelled metric), a dict mapping
+                      label-value tuples to numbers, or None to omit the metric
+        """
+        self._function = function
+
+    def _function_samples(self):
+        try:
+            value = self._function()
+        except Exception as e:
+            print(f"[METRICS] Error collecting {self.name}: {e}")
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [("", key if isinstance(key, tuple) else (key,), v)
+                    for key, v in value.items() if v is not None]
+        return [("", (), value)]
+
+    def _samples(self):
+        """(suffix, label values, value) triples, plus an optional extra label"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        samples = self._function_samples() if self._function else self._samples()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for sample in samples:
+            suffix, label_values, value = sample[:3]
+            extra = sample[3] if len(sample) > 3 else ""
+            labels = _format_labels(self.labelnames, label_values, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        """Monotonically increasing count"""
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        """Value that can go up and down"""
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+                 registry: Optional["Registry"] = None):
+        """
+        Distribution of observed values in cumulative buckets
+
+        Args:
+            buckets: Upper bounds; +Inf is added automatically
+        """
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-1] += value
+
+    def _samples(self):
+        with self._lock:
+            snapshot = [(key, list(state)) for key, state in self._values.items()]
+        samples = []
+        for key, state in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append(("_bucket", key, cumulative, f'le="{_format_value(bound)}"'))
+            samples.append(("_sum", key, state[-1]))
+            samples.append(("_count", key, cumulative))
+        return samples
+
+    def set_function(self, function: Callable):
+        raise TypeError("Histograms can only be observed")
+
+
+class Registry:
+    def __init__(self):
+        """Collection of metrics rendered together"""
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, None where unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current, the best available without psutil on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Decode path metrics, recorded by WhisperClient
+TRANSCRIPTION_SECONDS = Histogram(
+    "whisper_transcription_seconds", "Wall time of one transcription call",
+    ("model", "mode"), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+TRANSCRIPTION_AUDIO_SECONDS = Histogram(
+    "whisper_transcription_audio_seconds", "Audio duration handled by one transcription call",
+    ("model", "mode"), buckets=(0.5, 1, 2, 3, 5, 10, 30, 60, 300, 1800, 3600))
+TRANSCRIPTION_RTF = Histogram(
+    "whisper_transcription_real_time_factor", "Decode time divided by audio duration",
+    ("model", "mode"), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5))
+
+
+def observe_transcription(model: str, mode: str, seconds: float, audio_seconds: float):
+    """Record one finished transcription call"""
+    TRANSCRIPTION_SECONDS.observe(seconds, model=model, mode=mode)
+    TRANSCRIPTION_AUDIO_SECONDS.observe(audio_seconds, model=model, mode=mode)
+    if audio_seconds > 0:
+        TRANSCRIPTION_RTF.observe(seconds / audio_seconds, model=model, mode=mode)
@@ -0,0 +1,226 @@
+"""
+Registry of loaded Whisper models
+Keeps models keyed by (model_size, compute_type, device) under a RAM budget
+with LRU eviction, and loads new models in the background so callers can
+swap to them atomically once they are ready.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from whisper_client import WhisperClient
+
+
+# Approximate parameter counts, used to estimate resident memory
+MODEL_PARAMS_M = {
+    'tiny': 39, 'tiny.en': 39,
+    'base': 74, 'base.en': 74,
+    'small': 244, 'small.en': 244,
+    'medium': 769, 'medium.en': 769,
+    'large': 1550, 'large-v1': 1550, 'large-v2': 1550, 'large-v3': 1550,
+}
+
+BYTES_PER_PARAM = {
+    'int8': 1, 'int8_float32': 1, 'int8_float16': 1, 'int8_bfloat16': 1,
+    'float16': 2, 'bfloat16': 2, 'float32': 4,
+}
+
+# Tokenizer, CTranslate2 runtime buffers, etc.
+MODEL_OVERHEAD_MB = 100
+
+
+def estimate_model_memory_mb(model_size: str, compute_type: str = "int8") -> int:
+    """
+    Rough resident size of a loaded model
+
+    Args:
+        model_size: Whisper model size name
+        compute_type: CTranslate2 compute type
+
+    Returns:
+        Estimated memory in MB
+    """
+    params = MODEL_PARAMS_M.get(model_size, MODEL_PARAMS_M['large'])
+    return int(params * BYTES_PER_PARAM.get(compute_type, 4)) + MODEL_OVERHEAD_MB
+
+
+class ModelRegistry:
+    def __init__(self, memory_budget_mb: int = 4096,
+                 client_factory: Callable[..., WhisperClient] = WhisperClient):
+        """
+        Initialize model registry
+
+        Args:
+            memory_budget_mb: Estimated RAM the loaded models may use together
+            client_factory: Callable(model_size, device, compute_type) building a client
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.client_factory = client_factory
+
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # key -> WhisperClient, least recently used first
+        self._pinned = {}  # key -> pin count, never evicted while > 0
+        self._loading = {}  # key -> threading.Event set when the load finishes
+        self._callbacks = {}  # key -> [(on_ready, on_error)] waiting for that load
+        self.load_times = {}  # key -> seconds the last load took
+
+    @staticmethod
+    def make_key(model_size: str, compute_type: str = "int8", device: str = "cpu") -> tuple:
+        """Registry key for a model configuration"""
+        return (model_size, compute_type, device)
+
+    def get(self, model_size: str, compute_type: str = "int8",
+            device: str = "cpu") -> Optional[WhisperClient]:
+        """
+        Get a loaded model, loading it synchronously if needed
+
+        Returns:
+            Ready WhisperClient, or None if the model failed to load
+        """
+        key = self.make_key(model_size, compute_type, device)
+
+        while True:
+            with self._lock:
+                client = self._models.get(key)
+                if client is not None:
+                    self._models.move_to_end(key)
+                    return client
+                pending = self._loading.get(key)
+                if pending is None:
+                    self._loading[key] = threading.Event()
+                    break
+            # Someone else is loading this model, wait for them instead of loading twice
+            pending.wait()
+            with self._lock:
+                if key not in self._models:
+                    return None
+
+        return self._load(key)
+
+    def load_async(self, model_size: str, compute_type: str = "int8", device: str = "cpu",
+                   on_ready: Callable[[WhisperClient], None] = None,
+                   on_error: Callable[[Exception], None] = None) -> bool:
+        """
+        Load a model on a background thread
+
+        If the model is already loaded, on_ready is called immediately. If it
+        is already loading, the callbacks run when that load finishes.
+
+        Args:
+            model_size, compute_type, device: Model configuration
+            on_ready: Called with the loaded client once it is ready
+            on_error: Called if the model fails to load
+
+        Returns:
+            True if the model is loading in the background, False if it was already loaded
+        """
+        key = self.make_key(model_size, compute_type, device)
+
+        with self._lock:
+            client = self._models.get(key)
+            if client is not None:
+                self._models.move_to_end(key)
+            else:
+                self._callbacks.setdefault(key, []).append((on_ready, on_error))
+                if key in self._loading:
+                    return True  # Joins the load in flight
+                self._loading[key] = threading.Event()
+
+        if client is not None:
+            if on_ready:
+                on_ready(client)
+            return False
+
+        threading.Thread(target=self._load, args=(key,), daemon=True).start()
+        return True
+
+    def _load(self, key: tuple) -> Optional[WhisperClient]:
+        """Build the client for key; the caller must have registered key in _loading"""
+        model_size, compute_type, device = key
+        start = time.perf_counter()
+        try:
+            client = self.client_factory(model_size=model_size, device=device,
+                                         compute_type=compute_type)
+        except Exception as e:
+            print(f"[MODELS] Error loading {model_size}: {e}")
+            client = None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            event = self._loading.pop(key)
+            callbacks = self._callbacks.pop(key, [])
+            if client is not None and client.check_health():
+                self._models[key] = client
+                self.load_times[key] = elapsed
+                self._evict_locked(protect=key)
+            else:
+                client = None
+        event.set()
+
+        if client is not None:
+            print(f"[MODELS] Loaded {model_size} ({compute_type}, {device}) in {elapsed:.1f}s")
+        for on_ready, on_error in callbacks:
+            if client is not None:
+                if on_ready:
+                    on_ready(client)
+            elif on_error:
+                on_error(RuntimeError(f"Failed to load Whisper model {model_size}"))
+        return client
+
+    def pin(self, key: tuple):
+        """Protect a model from eviction (e.g. the active model)"""
+        with self._lock:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, key: tuple):
+        """Release a pin taken with pin() and evict if over budget"""
+        with self._lock:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+            self._evict_locked()
+
+    def set_memory_budget(self, memory_budget_mb: int):
+        """Change the budget, evicting least recently used models if needed"""
+        with self._lock:
+            self.memory_budget_mb = memory_budget_mb
+            self._evict_locked()
+
+    def _used_mb_locked(self) -> int:
+        return sum(estimate_model_memory_mb(k[0], k[1]) for k in self._models)
+
+    def _evict_locked(self, protect: tuple = None):
+        """Drop least recently used, unpinned models until under budget"""
+        for key in list(self._models):
+            if self._used_mb_locked() <= self.memory_budget_mb:
+                break
+            if key == protect or self._pinned.get(key):
+                continue
+            # Threads still transcribing hold their own reference, so the
+            # weights are only freed once those calls finish
+            del self._models[key]
+            print(f"[MODELS] Evicted {key[0]} ({key[1]}, {key[2]}) to stay under "
+                  f"{self.memory_budget_mb}MB")
+
+    def status(self) -> dict:
+        """Snapshot of loaded and loading models"""
+        with self._lock:
+            return {
+                'loaded': [
+                    {
+                        'model': k[0],
+                        'compute_type': k[1],
+                        'device': k[2],
+                        'estimated_mb': estimate_model_memory_mb(k[0], k[1]),
+                        'pinned': bool(self._pinned.get(k)),
+                        'load_seconds': round(self.load_times.get(k, 0.0), 2)
+                    }
+                    for k in self._models
+                ],
+                'loading': [k[0] for k in self._loading],
+                'used_mb': self._used_mb_locked(),
+                'budget_mb': self.memory_budget_mb
+            }
@@ -0,0 +1,112 @@
+"""
+Overload policy for the wake word listener
+Watches how far the listener lags behind real time and steps through
+progressively cheaper decoding settings while the lag persists, stepping
+back once it has stayed low for a while (hysteresis, so it doesn't flap).
+"""
+import time
+from typing import Optional
+
+
+class OverloadPolicy:
+    # Each level keeps the measures of the levels before it
+    LEVELS = (
+        'normal',
+        'strict_vad',      # Higher speech threshold, short hangover: fewer blocks reach Whisper
+        'long_chunks',     # Fewer, longer decodes amortize per-call overhead
+        'greedy',          # beam_size=1
+        'fallback_model',  # Decode with the smaller model
+    )
+
+    def __init__(self, high_lag_seconds: float = 3.0,
+                 low_lag_seconds: float = 1.0,
+                 escalate_after: float = 2.0,
+                 recover_after: float = 15.0,
+                 max_level: int = len(LEVELS) - 1):
+        """
+        Initialize overload policy
+
+        Args:
+            high_lag_seconds: Lag at or above which the listener counts as overloaded
+            low_lag_seconds: Lag at or below which it counts as keeping up
+            escalate_after: Seconds of sustained overload before each step up
+            recover_after: Seconds of sustained low lag before each step down
+            max_level: Highest level to use (lower it when there is no fallback model)
+        """
+        self.high_lag_seconds = high_lag_seconds
+        self.low_lag_seconds = low_lag_seconds
+        self.escalate_after = escalate_after
+        self.recover_after = recover_after
+        self.max_level = min(max_level, len(self.LEVELS) - 1)
+        self.reset()
+
+    def reset(self):
+        """Back to normal operation and clear the stats"""
+        self.level = 0
+        self.lag_seconds = 0.0
+        self.peak_lag_seconds = 0.0
+        self.escalations = 0
+        self.recoveries = 0
+        self.last_change = None
+        self._high_since = None
+        self._low_since = None
+
+    @property
+    def level_name(self) -> str:
+        return self.LEVELS[self.level]
+
+    def update(self, lag_seconds: float, now: Optional[float] = None) -> bool:
+        """
+        Feed the current lag
+
+        Args:
+            lag_seconds: Audio waiting to be processed, in seconds
+            now: Monotonic timestamp (default: time.monotonic())
+
+        Returns:
+            True if the level changed
+        """
+        now = time.monotonic() if now is None else now
+        self.lag_seconds = lag_seconds
+        self.peak_lag_seconds = max(self.peak_lag_seconds, lag_seconds)
+
+        if lag_seconds >= self.high_lag_seconds:
+            self._low_since = None
+            if self._high_since is None:
+                self._high_since = now
+            elif now - self._high_since >= self.escalate_after and self.level < self.max_level:
+                self.level += 1
+                self.escalations += 1
+                self._high_since = now  # The next step needs another stretch of overload
+                self.last_change = now
+                return True
+        elif lag_seconds <= self.low_lag_seconds:
+            self._high_since = None
+            if self.level == 0:
+                return False
+            if self._low_since is None:
+                self._low_since = now
+            elif now - self._low_since >= self.recover_after:
+                self.level -= 1
+                self.recoveries += 1
+                self._low_since = now
+                self.last_change = now
+                return True
+        else:
+            # Between the thresholds: hold the current level
+            self._high_since = None
+            self._low_since = None
+        return False
+
+    def get_stats(self) -> dict:
+        """Current level and lag, for /status"""
+        return {
+            'level': self.level,
+            'policy': self.level_name,
+            'lag_seconds': round(self.lag_seconds, 2),
+            'peak_lag_seconds': round(self.peak_lag_seconds, 2),
+            'escalations': self.escalations,
+            'recoveries': self.recoveries,
+            'seconds_since_change': round(time.monotonic() - self.last_change, 1)
+            if self.last_change is not None else None
+        }
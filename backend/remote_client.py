@@ -0,0 +1,254 @@
+"""
+Remote transcription engine
+Sends audio to another transcription backend over HTTP: another instance
+of this service (POST /transcribe, NDJSON segments) or a Whisper server
+with an Ollama-style /api/transcribe. Connections are pooled and kept
+alive, the endpoint that answered is remembered, and audio is uploaded as
+a streamed binary body instead of base64 JSON.
+"""
+import json
+import mimetypes
+import os
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from audio_buffer import wav_header
+from engine import LongFormSegment, TranscriptionEngine, WHISPER_SAMPLE_RATE
+from metrics import observe_transcription
+
+
+UPLOAD_BLOCK_SAMPLES = 32 * 1024  # 64KB of int16 per chunk of the request body
+FORWARDED_HEADER = 'X-Transcription-Forwarded'  # Marks uploads from another backend, so they aren't forwarded again
+
+
+class RemoteClient(TranscriptionEngine):
+    # Candidate endpoints, probed in order once; (path, response format)
+    ENDPOINTS = (
+        ('/transcribe', 'ndjson'),      # This backend: one JSON line per segment, then 'done'
+        ('/api/transcribe', 'json'),    # Ollama-style Whisper servers: {"text": ..., "segments": [...]}
+    )
+
+    def __init__(self, base_url: str = "http://localhost:8766",
+                 model: str = None,
+                 pool_size: int = 4,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 300.0,
+                 health_ttl: float = 5.0):
+        """
+        Initialize remote client
+
+        Args:
+            base_url: Remote backend URL
+            model: Model name sent to servers that take one (None = server default)
+            pool_size: Keep-alive connections kept open to the remote
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait between bytes of the response
+            health_ttl: Seconds a health check result is reused
+        """
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.model_size = f"remote:{model or self.base_url.split('://')[-1]}"
+        self.timeout = (connect_timeout, read_timeout)
+        self.health_ttl = health_ttl
+
+        # One session: TCP (and TLS) handshakes happen once per pooled connection, not per request.
+        # Only failed connects are retried, as the streamed body can't be sent twice.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=Retry(total=2, connect=2, read=0, status=0,
+                                                backoff_factor=0.2))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.endpoint = None  # (path, format) that answered, probed on first use
+        self.remote_model = None  # Model the remote reported using
+        self._endpoint_lock = threading.Lock()
+        self._healthy = False
+        self._health_checked = 0.0
+
+    def _url(self, path: str) -> str:
+        return self.base_url + path
+
+    def _resolve_endpoint(self):
+        """Find (once) which transcription endpoint the remote serves"""
+        with self._endpoint_lock:
+            if self.endpoint:
+                return self.endpoint
+            for path, response_format in self.ENDPOINTS:
+                # An empty body is rejected cheaply by a real endpoint (400/415), 404/405 means absent
+                response = self.session.post(self._url(path), data=b"", timeout=self.timeout)
+                response.close()
+                if response.status_code not in (404, 405, 501):
+                    self.endpoint = (path, response_format)
+                    print(f"[REMOTE] Using {self.base_url}{path}")
+                    return self.endpoint
+            raise RuntimeError(f"{self.base_url} has no transcription endpoint")
+
+    def _post(self, body, content_type: str, mode: str) -> Iterator[LongFormSegment]:
+        """
+        Upload body (bytes, file or iterator of bytes) and yield the segments
+
+        Iterators are sent with chunked transfer encoding as they are produced.
+        """
+        path, response_format = self._resolve_endpoint()
+        start = time.perf_counter()
+        params = {'model': self.model} if self.model else None
+        response = self.session.post(self._url(path), data=body, params=params,
+                                     headers={'Content-Type': content_type, FORWARDED_HEADER: '1'},
+                                     stream=True, timeout=self.timeout)
+        with response:
+            if response.status_code in (404, 405):
+                self.endpoint = None  # The remote changed; probe again next time
+            if response.status_code != 200:
+                raise RuntimeError(f"Remote transcription failed: {response.status_code} "
+                                   f"{response.text[:200]}")
+            self._healthy, self._health_checked = True, time.monotonic()
+
+            audio_seconds = 0.0
+            if response_format == 'ndjson':
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if message.get('type') == 'segment':
+                        audio_seconds = message['end']
+                        yield LongFormSegment(message['start'], message['end'], message['text'])
+                    elif message.get('type') == 'error':
+                        raise RuntimeError(f"Remote transcription failed: {message.get('error')}")
+                    elif message.get('type') == 'done':
+                        audio_seconds = message.get('audio_seconds', audio_seconds)
+                        self.remote_model = message.get('model', self.remote_model)
+            else:
+                result = response.json()
+                segments = result.get('segments') or [
+                    {'start': 0.0, 'end': result.get('duration', 0.0), 'text': result.get('text', '')}]
+                for segment in segments:
+                    audio_seconds = segment.get('end', audio_seconds)
+                    yield LongFormSegment(segment.get('start', 0.0), segment.get('end', 0.0),
+                                          segment.get('text', ''))
+        observe_transcription(self.model_size, mode, time.perf_counter() - start, audio_seconds)
+
+    def iter_segments(self, audio: np.ndarray,
+                      sample_rate: int = WHISPER_SAMPLE_RATE,
+                      beam_size: int = 5,
+                      initial_prompt: Optional[str] = None,
+                      word_timestamps: bool = False) -> Iterator[LongFormSegment]:
+        """
+        Upload in-memory audio as a streamed WAV and yield the remote's segments
+
+        Decoding options are the remote's own; segments carry no word timings.
+        """
+        yield from self._post(_wav_body(audio, sample_rate), 'audio/wav', 'remote')
+
+    def iter_segments_long(self, audio: np.ndarray,
+                           sample_rate: int = WHISPER_SAMPLE_RATE) -> Iterator[LongFormSegment]:
+        """The remote splits long audio itself"""
+        yield from self._post(_wav_body(audio, sample_rate), 'audio/wav', 'remote')
+
+    def iter_segments_stream(self, blocks: Iterable[np.ndarray]) -> Iterator[LongFormSegment]:
+        """Forward 16kHz mono int16 blocks as raw PCM while they arrive"""
+        body = (np.ascontiguousarray(block, dtype='<i2').tobytes() for block in blocks)
+        yield from self._post(body, 'audio/pcm', 'remote')
+
+    def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
+        """
+        Transcribe an audio file, uploading it straight from disk
+
+        Args:
+            audio_file_path: Path to audio file (WAV, or any format the remote decodes)
+
+        Returns:
+            Transcribed text or None if error
+        """
+        content_type = mimetypes.guess_type(audio_file_path)[0] or 'application/octet-stream'
+        try:
+            with open(audio_file_path, 'rb') as f:
+                texts = [s.text.strip() for s in self._post(f, content_type, 'remote')]
+        except FileNotFoundError:
+            print(f"Audio file not found: {audio_file_path}")
+            return None
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            print(f"Remote transcription error: {e}")
+            return None
+        return " ".join(t for t in texts if t) or None
+
+    def check_health(self) -> bool:
+        """
+        Check if the remote is reachable, reusing the answer for health_ttl seconds
+
+        Returns:
+            True if the remote answered, False otherwise
+        """
+        now = time.monotonic()
+        if now - self._health_checked < self.health_ttl:
+            return self._healthy
+        try:
+            response = self.session.get(self._url('/status'), timeout=self.timeout[0])
+            if response.status_code == 404:
+                response = self.session.get(self._url('/api/tags'), timeout=self.timeout[0])
+            self._healthy = response.status_code == 200
+        except requests.exceptions.RequestException:
+            self._healthy = False
+        self._health_checked = now
+        return self._healthy
+
+    def warm_up(self) -> float:
+        """Open a pooled connection and probe the endpoint ahead of the first request"""
+        start = time.perf_counter()
+        try:
+            if self.check_health():
+                self._resolve_endpoint()
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            print(f"[REMOTE] Warm-up failed: {e}")
+        return time.perf_counter() - start
+
+    def get_stats(self) -> dict:
+        """Remote URL, endpoint and health, for /status"""
+        return {
+            'url': self.base_url,
+            'endpoint': self.endpoint[0] if self.endpoint else None,
+            'model': self.remote_model or self.model,
+            'healthy': self._healthy
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def _wav_body(audio: np.ndarray, sample_rate: int) -> Iterator[bytes]:
+    """
+    Yield a 16-bit mono WAV of the audio in chunks
+
+    Float audio is converted a chunk at a time, and int16 arrays (including
+    a spooled recording's memmap) are sent without a full copy.
+    """
+    audio = np.asarray(audio)
+    if audio.ndim == 2:
+        audio = audio[:, 0]
+    yield wav_header(sample_rate, 1, len(audio) * 2)
+    for i in range(0, len(audio), UPLOAD_BLOCK_SAMPLES):
+        block = audio[i:i + UPLOAD_BLOCK_SAMPLES]
+        if block.dtype != np.int16:
+            block = (np.clip(block, -1.0, 1.0) * 32767).astype(np.int16)
+        yield np.ascontiguousarray(block, dtype='<i2').tobytes()
+
+
+if __name__ == "__main__":
+    # Test the remote client against another backend instance
+    import sys
+
+    client = RemoteClient(sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8766")
+
+    print(f"Testing connection to {client.base_url}...")
+    if client.check_health():
+        print("✓ Remote backend is reachable")
+        if len(sys.argv) > 2 and os.path.exists(sys.argv[2]):
+            print(client.transcribe_audio(sys.argv[2]))
+    else:
+        print("✗ Remote backend is not running or not accessible")
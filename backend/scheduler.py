@@ -0,0 +1,164 @@
+"""
+Inference scheduler for the shared Whisper models
+The wake listener, recording jobs and uploads all decode on the same CPU.
+Every local decode step (one segment, or one batch of the batched
+pipeline) runs in a scheduler slot; slots go to waiting work by priority
+class, so a wake chunk waits for at most one segment of a long
+transcription, and the number of concurrent CTranslate2 decodes never
+exceeds what the cores can run.
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Work classes, most urgent first
+WAKE = 'wake'  # Wake listener chunks: the user is speaking right now
+INTERACTIVE = 'interactive'  # Short dictations and notes the user is waiting for
+BULK = 'bulk'  # Long recordings and file uploads
+PRIORITIES = {WAKE: 0, INTERACTIVE: 1, BULK: 2}
+
+_current = threading.local()
+
+
+@contextmanager
+def work_class(name: str):
+    """Label the decodes this thread runs inside the block with a work class"""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown work class '{name}'")
+    previous = getattr(_current, 'work_class', None)
+    _current.work_class = name
+    try:
+        yield
+    finally:
+        _current.work_class = previous
+
+
+def current_work_class() -> str:
+    """Work class of the calling thread (INTERACTIVE if unlabelled)"""
+    return getattr(_current, 'work_class', None) or INTERACTIVE
+
+
+class InferenceScheduler:
+    def __init__(self, max_concurrent: int = 1, max_bulk: Optional[int] = None):
+        """
+        Initialize scheduler
+
+        Args:
+            max_concurrent: Decode steps run at once across all models; with
+                            cpu_threads per decode this should add up to the cores
+            max_bulk: Slots bulk work may hold at once (None = all but one
+                      when max_concurrent > 1, so wake chunks never wait behind bulk)
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_bulk = max_bulk if max_bulk is not None else max(1, self.max_concurrent - 1)
+        self._condition = threading.Condition()
+        self._waiting = []  # Heap of (priority, sequence, work class)
+        self._sequence = itertools.count()
+        self._running = {name: 0 for name in PRIORITIES}
+        self._local = threading.local()
+        self._stats = {name: {'granted': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+                       for name in PRIORITIES}
+
+    @contextmanager
+    def slot(self, name: Optional[str] = None):
+        """
+        Hold a decode slot for the block, waiting behind more urgent work
+
+        Nested slots on the same thread reuse the outer one.
+
+        Args:
+            name: Work class (None = the calling thread's current_work_class())
+        """
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        name = name or current_work_class()
+        self._acquire(name)
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            self._release(name)
+
+    def _acquire(self, name: str):
+        ticket = (PRIORITIES[name], next(self._sequence), name)
+        start = time.perf_counter()
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            while not self._can_run_locked(ticket):
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._running[name] += 1
+            waited = time.perf_counter() - start
+            stats = self._stats[name]
+            stats['granted'] += 1
+            stats['wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+            # The next waiter may be able to run too
+            self._condition.notify_all()
+
+    def _can_run_locked(self, ticket: tuple) -> bool:
+        if self._waiting[0] is not ticket or sum(self._running.values()) >= self.max_concurrent:
+            return False
+        return ticket[2] != BULK or self._running[BULK] < self.max_bulk
+
+    def _release(self, name: str):
+        with self._condition:
+            self._running[name] -= 1
+            self._condition.notify_all()
+
+    def iterate(self, items: Iterable[T], name: Optional[str] = None) -> Iterator[T]:
+        """
+        Yield from a lazy decode, holding a slot only while each item is produced
+
+        faster-whisper decodes a segment per next() call, so work of a more
+        urgent class gets the slot between segments.
+        """
+        name = name or current_work_class()
+        iterator = iter(items)
+        try:
+            while True:
+                with self.slot(name):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    def stats(self) -> dict:
+        """Queue depth, running steps and wait times per work class, for /status"""
+        with self._condition:
+            waiting = {name: 0 for name in PRIORITIES}
+            for _, _, name in self._waiting:
+                waiting[name] += 1
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_bulk': self.max_bulk,
+                'classes': {
+                    name: {
+                        'queue_depth': waiting[name],
+                        'running': self._running[name],
+                        'granted': stats['granted'],
+                        'avg_wait_seconds': round(stats['wait_seconds'] / stats['granted'], 4)
+                                            if stats['granted'] else 0.0,
+                        'max_wait_seconds': round(stats['max_wait_seconds'], 4),
+                        'wait_seconds_total': round(stats['wait_seconds'], 4)
+                    }
+                    for name, stats in self._stats.items()
+                }
+            }
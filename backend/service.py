@@ -1,20 +1,33 @@
 """
 Lightweight Flask service for voice recording and transcription
-Handles audio capture and communicates with Ollama for transcription
+Handles audio capture and transcribes with faster-whisper, or with a remote backend
 """
+import itertools
+import json
 import os
-import tempfile
 import threading
 import time
-import wave
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import sounddevice as sd
-import numpy as np
+from functools import partial
 
 from whisper_client import WhisperClient
+from remote_client import FORWARDED_HEADER, RemoteClient
+from model_registry import ModelRegistry
+from jobs import JobQueue, JobQueueFull, TranscriptionJob
+from events import EventBus
+from audio_buffer import RecordingBuffer, recover_spools, remove_stale_recordings
+from audio_decode import UnsupportedAudio, iter_pcm_blocks
+from speculative import SpeculativeDecoder
+from state import StateStore
+from scheduler import BULK, InferenceScheduler, work_class
+from sessions import InvalidSessionId, SessionManager, TooManySessions
+from transcript_log import TranscriptLog, remove_stale_transcripts, transcript_path
+from capture import CaptureHub
 from wake_word_listener import WakeWordListener
+from wake_detector import WakePhraseCascade
+import metrics
 
 
 app = Flask(__name__)
@@ -23,128 +36,495 @@ CORS(app)  # Enable CORS for Obsidian plugin communication
 # Configuration
 SAMPLE_RATE = 16000  # 16kHz sample rate
 CHANNELS = 1  # Mono audio
-TEMP_DIR = tempfile.gettempdir()
-
-# Global state
-recording_state = {
-    'is_recording': False,
-    'audio_data': [],
-    'last_transcription': None,
-    'error': None
-}
-
-# Wake word listener state
-listen_mode_state = {
-    'enabled': False,
-    'is_listening': False,
-    'is_recording_from_wake': False,
-    'streaming_chunks': [],  # Buffer for streaming chunks
-    'last_chunk_id': 0  # Incrementing ID for chunks
-}
+WAKE_PHRASE = "obsidian note"
+STOP_PHRASE = "obsidian stop"
+WAKE_DETECTOR_MODEL = "tiny.en"  # Small model that screens for the wake phrase
+MODEL_MEMORY_BUDGET_MB = 4096  # Estimated RAM all cached Whisper models may use
+TRANSCRIPTION_WORKERS = 1  # Concurrent background decodes
+MAX_PENDING_JOBS = 8  # Recordings that may wait for a worker
+MAX_PENDING_JOBS_PER_SESSION = 4  # Of those, recordings one client may have waiting
+MAX_SESSIONS = 32  # Clients (Obsidian windows) recording through this backend
+SESSION_IDLE_SECONDS = 3600  # Idle sessions are forgotten after this long
+SESSION_HEADER = 'X-Session-Id'  # Or ?session_id=; clients that send neither share the 'default' session
+LONG_FORM_SECONDS = 120  # Longer recordings are split at pauses and decoded in parallel
+SPECULATIVE_DECODING = True  # Decode manual recordings while they are made, so stopping only waits for the tail
+MODEL_WORKERS = max(1, (os.cpu_count() or 1) // 4)  # Parallel decodes per model for long-form
+EVENT_HISTORY = 1000  # Events kept so /events clients can resume
+EVENT_KEEPALIVE_SECONDS = 15
+STARTUP_WAIT_SECONDS = 600  # How long queued jobs wait for the first model to become ready
+SERVER_THREADS = 16  # Request threads; each open /events or /transcribe stream holds one
+TRANSCRIPTION_ENGINE = 'local'  # 'local' decodes recordings and uploads here, 'remote' sends them to REMOTE_ENGINE_URL
+REMOTE_ENGINE_URL = 'http://localhost:8766'  # Another instance of this backend, or a server with /api/transcribe
+SPOOL_DIR = os.path.join(os.path.expanduser('~'), '.obsidian-whisper', 'spool')  # Recordings in progress
+KEPT_RECORDING_RETENTION_SECONDS = 14 * 24 * 3600  # Recordings saved after a failure, or recovered after a crash, are deleted after this long
+TRANSCRIPT_DIR = os.path.join(os.path.expanduser('~'), '.obsidian-whisper', 'transcripts')  # Per-session chunk logs
+TRANSCRIPT_RETENTION_CHUNKS = 10000  # Newest chunks kept per session
+TRANSCRIPT_RETENTION_SECONDS = 30 * 24 * 3600  # Older chunks are compacted away, and logs unused this long deleted
+STREAMING_CHUNKS_PAGE = 500  # Most chunks one /streaming-chunks response returns
+
+# Global state, shared by request threads, the listener thread and job workers.
+# Each client records in its own session: buffer, last result and chunk stream.
+# Chunks are logged to disk, so clients can catch up after a disconnect or a restart.
+sessions = SessionManager(
+    max_sessions=MAX_SESSIONS,
+    idle_seconds=SESSION_IDLE_SECONDS,
+    chunk_log_factory=lambda session_id: TranscriptLog(
+        transcript_path(TRANSCRIPT_DIR, session_id),
+        retention_chunks=TRANSCRIPT_RETENTION_CHUNKS,
+        retention_seconds=TRANSCRIPT_RETENTION_SECONDS
+    ),
+    stale_log_cleanup=lambda session_ids: (
+        remove_stale_transcripts(TRANSCRIPT_DIR, TRANSCRIPT_RETENTION_SECONDS,
+                                 keep=[transcript_path(TRANSCRIPT_DIR, session_id) for session_id in session_ids]),
+        remove_stale_recordings(SPOOL_DIR, KEPT_RECORDING_RETENTION_SECONDS)
+    ),
+    # A session with a queued job or listen mode still gets chunks and results
+    busy=lambda session_id: job_queue.has_unfinished(session_id) or owns_listen_mode(session_id)
+)
+
+# Wake word listener state; there is one microphone, so one session owns listen mode
+listen_mode_state = StateStore(
+    enabled=False,
+    is_listening=False,
+    is_recording_from_wake=False,
+    session_id=None  # Session that enabled listen mode and receives its notes
+)
+listen_mode_lock = threading.Lock()  # Serializes enabling/disabling the listener
+
+recovered_recordings = []  # Spools left by a crash, finalized to WAV at startup
 
 # Audio device configuration
-audio_config = {
-    'device_id': None  # None = use default device
-}
-
-# Initialize Whisper client
+audio_config = StateStore(
+    device_id=None  # None = use default device
+)
+
+# Whisper models and clients. All models decode through one scheduler, so
+# wake chunks go ahead of long transcriptions and at most MODEL_WORKERS
+# decodes (each with cpu_count / MODEL_WORKERS threads) share the cores.
+inference_scheduler = InferenceScheduler(max_concurrent=MODEL_WORKERS)
+model_registry = ModelRegistry(
+    memory_budget_mb=MODEL_MEMORY_BUDGET_MB,
+    client_factory=partial(
+        WhisperClient,
+        num_workers=MODEL_WORKERS,
+        cpu_threads=max(1, (os.cpu_count() or 1) // MODEL_WORKERS),
+        scheduler=inference_scheduler
+    )
+)
+model_switch_lock = threading.Lock()
+model_state = StateStore(
+    phase='starting',  # starting -> loading -> warming -> ready (or failed)
+    pending=None,  # Model size being loaded in the background
+    switch=0,  # Bumped by every model switch; a load finishing for an older one is ignored
+    error=None,
+    startup_seconds=None  # Process start to ready
+)
+startup_done = threading.Event()  # Set once the first model is ready or failed to load
+service_started = time.perf_counter()
 whisper_client = None
+remote_engine = None  # RemoteClient while the 'remote' engine is configured
+wake_detector_client = None
 wake_listener = None
-audio_stream = None
-
-
-def init_whisper(model_size: str = "small.en"):
-    """Initialize Whisper client with configuration"""
-    global whisper_client, wake_listener
-    whisper_client = WhisperClient(model_size=model_size)
 
-    # Initialize wake word listener
-    if whisper_client:
-        wake_listener = WakeWordListener(
+# One input stream shared by the manual recorder and the wake listener
+capture_hub = CaptureHub(SAMPLE_RATE, CHANNELS, device_id=audio_config['device_id'])
+
+# Push channel for /events subscribers
+event_bus = EventBus(max_events=EVENT_HISTORY)
+
+# Background transcription of manual recordings
+job_queue = JobQueue(
+    # Recordings stopped during startup wait for the model instead of failing
+    lambda: remote_engine or (whisper_client if startup_done.wait(STARTUP_WAIT_SECONDS) else None),
+    max_workers=TRANSCRIPTION_WORKERS,
+    max_queue_depth=MAX_PENDING_JOBS,
+    max_pending_per_owner=MAX_PENDING_JOBS_PER_SESSION,
+    long_form_seconds=LONG_FORM_SECONDS
+)
+
+# /metrics gauges read from live state at scrape time, so the audio
+# callback and the listener loop do no extra work
+_queue_seconds = metrics.Gauge(
+    'wake_audio_queue_seconds', 'Captured audio waiting for the wake listener (its lag behind real time)')
+_queue_overflow = metrics.Counter(
+    'wake_audio_queue_overflow_frames_total', 'Frames dropped because the wake listener fell behind')
+_chunks_transcribed = metrics.Counter(
+    'wake_chunks_transcribed_total', 'Listener chunks sent to Whisper since listening started')
+_blocks_skipped = metrics.Counter(
+    'wake_blocks_skipped_total', 'Silent listener blocks skipped by the VAD since listening started')
+_capture_status = metrics.Counter(
+    'capture_callback_status_total', 'Audio callbacks flagged with input overflow or underflow')
+_capture_frames = metrics.Counter('capture_frames_total', 'Frames delivered by the audio input stream')
+_model_load_seconds = metrics.Gauge(
+    'whisper_model_load_seconds', 'Time the last load of each cached model took',
+    ('model', 'compute_type', 'device'))
+_overload_level = metrics.Gauge(
+    'wake_overload_level', 'Listener overload policy level (0 = normal, higher = cheaper decoding)')
+_job_queue_depth = metrics.Gauge('transcription_job_queue_depth', 'Recordings waiting for a transcription worker')
+_rss_bytes = metrics.Gauge('process_resident_memory_bytes', 'Resident memory of the backend process')
+_inference_queue_depth = metrics.Gauge(
+    'inference_queue_depth', 'Decode steps waiting for the inference scheduler', ('work_class',))
+_inference_wait_seconds = metrics.Counter(
+    'inference_wait_seconds_total', 'Time decode steps spent waiting for the inference scheduler', ('work_class',))
+
+
+def _listener_metric(read):
+    return lambda: read(wake_listener) if wake_listener and wake_listener.is_listening else None
+
+
+_queue_seconds.set_function(_listener_metric(lambda l: l.audio_queue.available() / l.sample_rate))
+_queue_overflow.set_function(_listener_metric(lambda l: l.audio_queue.overflow_frames))
+_chunks_transcribed.set_function(_listener_metric(lambda l: l.chunks_transcribed))
+_blocks_skipped.set_function(_listener_metric(lambda l: l.blocks_skipped))
+_capture_status.set_function(lambda: capture_hub.status_count)
+_capture_frames.set_function(lambda: capture_hub.frames_captured)
+_model_load_seconds.set_function(lambda: dict(model_registry.load_times))
+_overload_level.set_function(_listener_metric(lambda l: l.overload.level))
+_job_queue_depth.set_function(lambda: job_queue.stats()['queue_depth'])
+_rss_bytes.set_function(metrics.current_rss_bytes)
+
+
+def _scheduler_metric(field):
+    return lambda: {(name,): stats[field] for name, stats in inference_scheduler.stats()['classes'].items()}
+
+
+_inference_queue_depth.set_function(_scheduler_metric('queue_depth'))
+_inference_wait_seconds.set_function(_scheduler_metric('wait_seconds_total'))
+
+
+def init_whisper(model_size: str = "small.en", compute_type: str = "int8", device: str = "cpu"):
+    """
+    Load and warm up the initial Whisper model and create the wake word listener
+
+    Runs on a background thread at startup so the HTTP server is reachable
+    immediately; /status reports the phase meanwhile.
+    """
+    try:
+        model_state['phase'] = 'loading'
+        model_state['pending'] = model_size
+        client = model_registry.get(model_size, compute_type, device)
+        model_state['pending'] = None
+        if not client:
+            model_state['phase'] = 'failed'
+            model_state['error'] = f"Failed to load Whisper model {model_size}"
+            return
+
+        model_state['phase'] = 'warming'
+        client.warm_up()
+        activate_whisper_client(client)
+        if wake_detector_client:
+            wake_detector_client.warm_up()
+
+        model_state['phase'] = 'ready'
+        model_state['startup_seconds'] = round(time.perf_counter() - service_started, 2)
+        print(f"[OK] Whisper {model_size} ready {model_state['startup_seconds']}s after startup")
+    except Exception as e:
+        model_state['phase'] = 'failed'
+        model_state['error'] = str(e)
+        print(f"[WARN] Whisper model failed to load: {e}")
+    finally:
+        startup_done.set()
+
+
+def init_wake_listener():
+    """Create the wake word listener around the active model"""
+    global wake_detector_client, wake_listener
+
+    # Wake screening model is independent of the content model, keep it loaded
+    wake_detector_client = model_registry.get(WAKE_DETECTOR_MODEL)
+    if wake_detector_client:
+        model_registry.pin(wake_detector_client.model_key)
+
+    wake_detector = None
+    if wake_detector_client:
+        wake_detector = WakePhraseCascade(
+            wake_detector_client,
             whisper_client,
-            wake_phrase="obsidian note",
-            stop_phrase="obsidian stop",
-            streaming_mode=True,  # Enable streaming mode
-            device_id=audio_config['device_id']  # Use configured device
+            wake_phrase=WAKE_PHRASE
         )
-        # Set up callbacks
-        wake_listener.on_wake_detected = on_wake_phrase_detected
-        wake_listener.on_stop_detected = on_stop_phrase_detected
-        wake_listener.on_transcription_complete = on_wake_transcription_complete
-        wake_listener.on_chunk_transcribed = on_chunk_transcribed  # Streaming callback
+    wake_listener = WakeWordListener(
+        whisper_client,
+        wake_phrase=WAKE_PHRASE,
+        stop_phrase=STOP_PHRASE,
+        streaming_mode=True,  # Enable streaming mode
+        capture_hub=capture_hub,  # Share the service's input stream
+        wake_detector=wake_detector,
+        fallback_client=wake_detector_client,  # Decodes with the small model when overloaded
+        spool_dir=SPOOL_DIR
+    )
+    # Set up callbacks
+    wake_listener.on_wake_detected = on_wake_phrase_detected
+    wake_listener.on_stop_detected = on_stop_phrase_detected
+    wake_listener.on_transcription_complete = on_wake_transcription_complete
+    wake_listener.on_chunk_transcribed = on_chunk_transcribed  # Streaming callback
+    wake_listener.on_overload_changed = on_listener_overload_changed
+
+
+def activate_whisper_client(client: WhisperClient, switch: int = None) -> bool:
+    """
+    Atomically make client the model used for new transcriptions
+
+    Transcriptions already running keep their reference to the previous
+    client and finish on it.
+
+    Args:
+        client: Loaded model
+        switch: model_state['switch'] the client was loaded for; if a later
+                switch happened since, client is not activated
+
+    Returns:
+        True if client is now active
+    """
+    global whisper_client
+
+    with model_switch_lock:
+        if switch is not None and model_state['switch'] != switch:
+            print(f"[MODELS] Not activating {client.model_size}: another model was chosen meanwhile")
+            return False
+        previous = whisper_client
+        if previous is client:
+            return True
+        model_registry.pin(client.model_key)
+        whisper_client = client
+        if wake_listener:
+            wake_listener.set_whisper_client(client)
+        else:
+            init_wake_listener()
+        if previous:
+            model_registry.unpin(previous.model_key)
+
+    print(f"[MODELS] Active model: {client.model_size}")
+    return True
+
+
+def switch_whisper_model(model_size: str, compute_type: str = "int8", device: str = "cpu") -> bool:
+    """
+    Switch the active model, loading it in the background if needed
+
+    Returns:
+        True if the model is loading in the background, False if the switch was immediate
+    """
+    with model_state.transaction() as state:
+        switch = state['switch'] + 1
+        state.update(switch=switch, pending=model_size, error=None)
+
+    def settle(**changes) -> bool:
+        """Record the outcome, unless a later switch is already under way"""
+        with model_state.transaction() as state:
+            if state['switch'] != switch:
+                return False
+            state.update(pending=None, **changes)
+            return True
+
+    def on_ready(client):
+        if model_state['switch'] != switch:
+            return  # Superseded; don't spend time warming it up
+        if not client.warmed_up:
+            client.warm_up()  # Before it takes traffic, so the first request after the swap isn't slow
+        if activate_whisper_client(client, switch=switch):
+            settle()
+
+    def on_error(error):
+        if settle(error=str(error)):
+            print(f"[MODELS] Keeping {whisper_client.model_size if whisper_client else None}: {error}")
+
+    return model_registry.load_async(model_size, compute_type, device,
+                                     on_ready=on_ready, on_error=on_error)
+
+
+def configure_engine(engine: str, remote_url: str = None):
+    """
+    Choose where recordings and uploads are transcribed
+
+    The wake listener always decodes with the local model: it needs word
+    timings and low latency, and its chunks are small.
+
+    Args:
+        engine: 'local' or 'remote'
+        remote_url: Remote backend URL (None = REMOTE_ENGINE_URL)
+
+    Raises:
+        ValueError: For an unknown engine
+    """
+    global remote_engine
+
+    if engine == 'local':
+        client = None
+    elif engine == 'remote':
+        client = RemoteClient(remote_url or REMOTE_ENGINE_URL)
+    else:
+        raise ValueError(f"Unknown engine '{engine}', expected 'local' or 'remote'")
+
+    with model_switch_lock:
+        previous, remote_engine = remote_engine, client
+    if previous:
+        previous.close()
+    if client:
+        # Connect and find the endpoint now rather than on the first recording
+        threading.Thread(target=client.warm_up, daemon=True).start()
+    print(f"[SERVICE] Transcription engine: {engine}" + (f" ({client.base_url})" if client else ""))
+
+
+def transcription_engine():
+    """Engine for recordings and uploads: the remote if configured, else the active model"""
+    return remote_engine or whisper_client
+
+
+def owns_listen_mode(session_id: str) -> bool:
+    """Whether listen mode is on and delivers its notes to the session"""
+    state = listen_mode_state.snapshot()
+    return state['enabled'] and state['session_id'] == session_id
+
+
+def request_session():
+    """
+    Session of the client making the request, created on first use
+
+    Raises:
+        InvalidSessionId, TooManySessions: Answered by the error handlers below
+    """
+    return sessions.get(request.headers.get(SESSION_HEADER) or request.args.get('session_id'))
+
+
+@app.errorhandler(InvalidSessionId)
+def invalid_session(error):
+    return jsonify({'error': str(error)}), 400
+
+
+@app.errorhandler(TooManySessions)
+def too_many_sessions(error):
+    return jsonify({'error': str(error)}), 503
+
+
+def listen_session():
+    """Session that owns listen mode"""
+    return sessions.get(listen_mode_state['session_id'])
 
 
 def on_wake_phrase_detected():
     """Callback when wake phrase is detected"""
-    global listen_mode_state
     listen_mode_state['is_recording_from_wake'] = True
-    listen_mode_state['streaming_chunks'] = []  # Clear chunks for new recording
+    session = listen_session()
+    # Earlier notes stay in the log; clients poll from since_id for this one's chunks
+    event_bus.publish('wake', {'session_id': session.id, 'since_id': session.chunks.last_id})
     print("[SERVICE] Wake phrase detected - recording started")
 
 
 def on_stop_phrase_detected():
     """Callback when stop phrase is detected"""
-    global listen_mode_state
     listen_mode_state['is_recording_from_wake'] = False
+    event_bus.publish('stop', {'session_id': listen_mode_state['session_id']})
     print("[SERVICE] Stop phrase detected - recording stopped")
 
 
 def on_wake_transcription_complete(transcription: str):
     """Callback when wake word transcription is complete"""
-    global recording_state
-    recording_state['last_transcription'] = transcription
+    session = listen_session()
+    session.state['last_transcription'] = transcription
+    event_bus.publish('transcription', {'source': 'wake_word', 'transcription': transcription,
+                                        'session_id': session.id})
     print(f"[SERVICE] Wake word transcription complete: {transcription}")
 
 
-def on_chunk_transcribed(chunk: str):
-    """Callback when a chunk is transcribed in streaming mode"""
-    global listen_mode_state
-    listen_mode_state['last_chunk_id'] += 1
-    chunk_data = {
-        'id': listen_mode_state['last_chunk_id'],
-        'text': chunk,
-        'timestamp': datetime.now().isoformat()
-    }
-    listen_mode_state['streaming_chunks'].append(chunk_data)
+def on_chunk_transcribed(chunk: str, is_stable: bool = True):
+    """
+    Callback when a chunk is transcribed in streaming mode
+
+    Stable chunks are final and stored; tentative ones may still change and
+    are only pushed to /events subscribers as a preview.
+    """
+    session = listen_session()
+    if not is_stable:
+        event_bus.publish('tentative', {'text': chunk, 'stable': False, 'session_id': session.id})
+        return
 
-    # Keep only last 100 chunks to prevent memory issues
-    if len(listen_mode_state['streaming_chunks']) > 100:
-        listen_mode_state['streaming_chunks'] = listen_mode_state['streaming_chunks'][-100:]
+    # Appended to the session's durable log, which is compacted down to the newest
+    # TRANSCRIPT_RETENTION_CHUNKS chunks of the last TRANSCRIPT_RETENTION_SECONDS
+    chunk_data = session.chunks.append(chunk, stable=True)
+    event_bus.publish('chunk', {**chunk_data, 'session_id': session.id})
 
     print(f"[SERVICE] Chunk transcribed: {chunk}")
 
 
-def audio_callback(indata, frames, time_info, status):
-    """Callback function for audio recording"""
-    if status:
-        print(f"Audio status: {status}")
-    if recording_state['is_recording']:
-        recording_state['audio_data'].append(indata.copy())
+def on_listener_overload_changed(stats: dict):
+    """Callback when the listener steps its overload policy up or down"""
+    event_bus.publish('overload', stats['overload'])
+
+
+def on_job_progress(job: TranscriptionJob, segment: dict):
+    """Callback after each segment a background job decodes"""
+    event_bus.publish('job_progress', {
+        'job_id': job.id,
+        'session_id': job.owner,
+        'progress': round(job.progress, 3),
+        'segment': segment
+    })
+
+
+def on_job_finished(job: TranscriptionJob):
+    """Callback when a background transcription job finishes"""
+    session = sessions.find(job.owner)  # None if the session was dropped meanwhile
+    if session and job.status == TranscriptionJob.COMPLETED:
+        session.state['last_transcription'] = job.transcription
+    elif session and job.status == TranscriptionJob.FAILED:
+        session.state['error'] = job.error
+    event_bus.publish('job', job.to_dict())
+
+
+job_queue.on_job_progress = on_job_progress
+job_queue.on_job_finished = on_job_finished
 
 
 @app.route('/status', methods=['GET'])
 def status():
-    """Check service and Whisper status"""
-    whisper_ready = whisper_client.check_health() if whisper_client else False
-    model_name = whisper_client.model_size if whisper_client else None
+    """Check service and Whisper status; is_recording is for the calling session"""
+    session = request_session()
+    client = whisper_client
+    whisper_ready = client.check_health() if client else False
+    model_name = client.model_size if client else None
+    models = model_state.snapshot()
+    listen_mode = listen_mode_state.snapshot()
 
     return jsonify({
         'service': 'running',
+        'state': models['phase'],
+        'startup_seconds': models['startup_seconds'],
         'whisper_ready': whisper_ready,
         'model_available': whisper_ready,
         'model_name': model_name,
-        'is_recording': recording_state['is_recording'] or listen_mode_state['is_recording_from_wake'],
-        'listen_mode_enabled': listen_mode_state['enabled'],
-        'listen_mode_listening': listen_mode_state['is_listening'],
+        'session_id': session.id,
+        'is_recording': session.state['is_recording'] or (
+            listen_mode['is_recording_from_wake'] and listen_mode['session_id'] == session.id),
+        'listen_mode_enabled': listen_mode['enabled'],
+        'listen_mode_listening': listen_mode['is_listening'],
+        'listen_mode_session': listen_mode['session_id'],
+        'sessions': [s.to_dict() for s in sessions.sessions()],
         'selected_device_id': audio_config['device_id'],
+        'model_loading': models['pending'],
+        'model_error': models['error'],
+        'models': model_registry.status(),
+        'jobs': job_queue.stats(),
+        'scheduler': inference_scheduler.stats(),
+        'wake_detector': wake_listener.wake_detector.get_stats() if wake_listener and wake_listener.wake_detector else None,
+        'listener': wake_listener.get_stats() if wake_listener and wake_listener.is_listening else None,
+        'recovered_recordings': [path for path in recovered_recordings if os.path.exists(path)],
+        'engine': 'remote' if remote_engine else 'local',
+        'remote': remote_engine.get_stats() if remote_engine else None,
         'timestamp': datetime.now().isoformat()
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of latency, throughput, backlog and memory metrics"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/audio-devices', methods=['GET'])
 def get_audio_devices():
     """Get list of available audio input devices"""
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
         input_devices = []
 
@@ -181,14 +561,13 @@ def get_audio_devices():
 @app.route('/audio-device', methods=['POST'])
 def set_audio_device():
     """Set the audio input device to use"""
-    global audio_config, wake_listener
-
     data = request.json
     device_id = data.get('device_id')
 
     # Validate device_id
     if device_id is not None:
         try:
+            import sounddevice as sd
             devices = sd.query_devices()
             if device_id < 0 or device_id >= len(devices):
                 return jsonify({'error': 'Invalid device ID'}), 400
@@ -203,11 +582,11 @@ def set_audio_device():
     # Update configuration
     audio_config['device_id'] = device_id
 
-    # Restart wake listener if it's running
-    if wake_listener and listen_mode_state['enabled']:
-        wake_listener.stop_listening()
-        wake_listener.device_id = device_id
-        wake_listener.start_listening()
+    # Reopen the shared stream once; recorder and listener stay subscribed
+    try:
+        capture_hub.set_device(device_id)
+    except Exception as e:
+        return jsonify({'error': f'Failed to open device: {str(e)}'}), 500
 
     return jsonify({
         'status': 'updated',
@@ -217,21 +596,25 @@ def set_audio_device():
 
 @app.route('/listen-mode/enable', methods=['POST'])
 def enable_listen_mode():
-    """Enable continuous listening for wake words"""
-    global listen_mode_state
-
+    """Enable continuous listening for wake words, delivering notes to the calling session"""
+    session = request_session()
     if not wake_listener:
+        phase = model_state['phase']
+        if phase in ('starting', 'loading', 'warming'):
+            return jsonify({'error': 'Model is still loading', 'state': phase}), 503
         return jsonify({'error': 'Wake word listener not initialized'}), 500
 
-    if listen_mode_state['enabled']:
-        return jsonify({'status': 'already_enabled'})
+    with listen_mode_lock:
+        if listen_mode_state['enabled']:
+            return jsonify({'status': 'already_enabled', 'session_id': listen_mode_state['session_id']})
 
-    wake_listener.start_listening()
-    listen_mode_state['enabled'] = True
-    listen_mode_state['is_listening'] = True
+        listen_mode_state['session_id'] = session.id
+        wake_listener.start_listening()
+        listen_mode_state.update(enabled=True, is_listening=True)
 
     return jsonify({
         'status': 'enabled',
+        'session_id': session.id,
         'wake_phrase': 'Obsidian Note',
         'stop_phrase': 'Obsidian Stop'
     })
@@ -240,101 +623,212 @@ def enable_listen_mode():
 @app.route('/listen-mode/disable', methods=['POST'])
 def disable_listen_mode():
     """Disable continuous listening for wake words"""
-    global listen_mode_state
-
     if not wake_listener:
         return jsonify({'error': 'Wake word listener not initialized'}), 500
 
-    if not listen_mode_state['enabled']:
-        return jsonify({'status': 'already_disabled'})
+    with listen_mode_lock:
+        if not listen_mode_state['enabled']:
+            return jsonify({'status': 'already_disabled'})
 
-    wake_listener.stop_listening()
-    listen_mode_state['enabled'] = False
-    listen_mode_state['is_listening'] = False
-    listen_mode_state['is_recording_from_wake'] = False
+        wake_listener.stop_listening()
+        listen_mode_state.update(enabled=False, is_listening=False, is_recording_from_wake=False)
 
     return jsonify({'status': 'disabled'})
 
 
 @app.route('/start-recording', methods=['POST'])
 def start_recording():
-    """Start audio recording"""
-    if recording_state['is_recording']:
+    """Start audio recording in the calling session"""
+    session = request_session()
+    if session.state['is_recording']:
         return jsonify({'error': 'Already recording'}), 400
 
-    # Reset state
-    recording_state['is_recording'] = True
-    recording_state['audio_data'] = []
-    recording_state['error'] = None
-    recording_state['last_transcription'] = None
+    # Written from the audio callback, so the spool is created here and extended in the background.
+    # Buffer and decoder are ready and subscribed before they are published, so a stop
+    # that sees is_recording gets both and can unsubscribe the buffer.
+    audio_buffer = RecordingBuffer(SAMPLE_RATE, CHANNELS, spool_dir=SPOOL_DIR, realtime=True)
+    audio_buffer.open()
+    speculative = SpeculativeDecoder(
+        transcription_engine, audio_buffer,
+        long_tail_seconds=LONG_FORM_SECONDS) if SPECULATIVE_DECODING else None
+    capture_hub.subscribe(audio_buffer)
+
+    with session.state.transaction() as state:
+        # Check and set together, so two concurrent requests can't both start
+        started = not state['is_recording']
+        if started:
+            state.update(is_recording=True, audio_data=audio_buffer, speculative=speculative,
+                         error=None, last_transcription=None, job_id=None)
+    if not started:
+        capture_hub.unsubscribe(audio_buffer)
+        if speculative:
+            speculative.stop()
+        audio_buffer.close()
+        return jsonify({'error': 'Already recording'}), 400
 
     return jsonify({
         'status': 'recording',
+        'session_id': session.id,
         'message': 'Recording started'
     })
 
 
 @app.route('/stop-recording', methods=['POST'])
 def stop_recording():
-    """Stop recording and transcribe audio"""
-    if not recording_state['is_recording']:
-        return jsonify({'error': 'Not currently recording'}), 400
-
-    recording_state['is_recording'] = False
+    """Stop the calling session's recording and transcribe it"""
+    session = request_session()
+    with session.state.transaction() as state:
+        if not state['is_recording']:
+            return jsonify({'error': 'Not currently recording'}), 400
+        # Take ownership of the buffer; the job frees it
+        audio_buffer = state['audio_data']
+        speculative = state['speculative']
+        state.update(is_recording=False, audio_data=None, speculative=None)
+
+    # An empty buffer is falsy (it has a length), so test for None: a stop that
+    # comes before the first audio callback must still unsubscribe it
+    if audio_buffer is not None:
+        capture_hub.unsubscribe(audio_buffer)
+    if speculative:
+        speculative.stop(wait=False)  # No more audio; the job decodes whatever is left
 
     # Check if we have audio data
-    if not recording_state['audio_data']:
+    if audio_buffer is None or not len(audio_buffer):
+        if speculative:
+            speculative.stop()
+        if audio_buffer is not None:
+            audio_buffer.close()
         return jsonify({'error': 'No audio data recorded'}), 400
 
-    try:
-        # Combine all audio chunks
-        audio_array = np.concatenate(recording_state['audio_data'], axis=0)
+    def release(keep: bool = False):
+        # The background decoder reads the buffer, so it must be done before the buffer closes
+        if speculative:
+            speculative.stop()
+        return audio_buffer.close(keep=keep)
 
-        # Save to temporary WAV file
-        temp_audio_path = os.path.join(TEMP_DIR, f'voice_note_{int(time.time())}.wav')
+    if not transcription_engine() and model_state['phase'] == 'failed':
+        # Keep the audio so it can be transcribed later
+        return jsonify({'error': 'Whisper client not initialized',
+                        'recording': release(keep=True)}), 500
 
-        # Write WAV file using wave module
-        with wave.open(temp_audio_path, 'wb') as wav_file:
-            wav_file.setnchannels(CHANNELS)
-            wav_file.setsampwidth(2)  # 2 bytes for int16
-            wav_file.setframerate(SAMPLE_RATE)
-            wav_file.writeframes(audio_array.tobytes())
+    # Decode in the background (during startup the job waits for the model); the client follows progress via /jobs/<id>.
+    # The job reads the buffer in place and frees it when done. Most of it was decoded while recording.
+    try:
+        job = job_queue.submit(audio_buffer.view(), SAMPLE_RATE, release=release,
+                               owner=session.id, speculative=speculative)
+    except JobQueueFull as e:
+        session.state['error'] = str(e)
+        return jsonify({'error': str(e), 'recording': release(keep=True)}), 503
+    session.state['job_id'] = job.id
 
-        print(f"Audio saved to: {temp_audio_path}")
+    return jsonify({
+        'status': 'queued',
+        'job_id': job.id,
+        'session_id': session.id,
+        'audio_seconds': round(job.duration, 2),
+        'timestamp': datetime.now().isoformat()
+    }), 202
+
+
+@app.route('/transcribe', methods=['POST'])
+def transcribe_upload():
+    """
+    Transcribe an uploaded audio file while it streams in
+
+    The body is raw 16kHz int16 PCM, WAV, or compressed audio (MP3, Opus,
+    M4A, ... via PyAV), optionally sent chunked. Segments are returned as
+    NDJSON lines while they decode, ending with a 'done' (or 'error') line.
+    The body is decoded as it arrives, without temp files.
+
+    Query params: format (pcm|wav|av, default: detect), sample_rate and
+    channels for raw PCM.
+    """
+    # Uploads forwarded by another backend are decoded here, never forwarded on
+    client = whisper_client if request.headers.get(FORWARDED_HEADER) else transcription_engine()
+    if not client:
+        return jsonify({'error': 'Model is not ready', 'state': model_state['phase']}), 503
+
+    blocks = iter_pcm_blocks(
+        request.stream,
+        content_type=request.content_type,
+        audio_format=request.args.get('format'),
+        sample_rate=request.args.get('sample_rate', SAMPLE_RATE, type=int),
+        channels=request.args.get('channels', 1, type=int)
+    )
+    # Pull the first block now so format errors get a proper status code
+    try:
+        first = next(blocks, None)
+    except UnsupportedAudio as e:
+        return jsonify({'error': str(e)}), 415
+    if first is None:
+        return jsonify({'error': 'No audio in request body'}), 400
+
+    received = {'samples': 0}
+
+    def counted(blocks):
+        for block in blocks:
+            received['samples'] += len(block)
+            yield block
+
+    def stream():
+        start = time.perf_counter()
+        texts = []
+        try:
+            with work_class(BULK):
+                for segment in client.iter_segments_stream(counted(itertools.chain([first], blocks))):
+                    text = segment.text.strip()
+                    texts.append(text)
+                    yield json.dumps({
+                        'type': 'segment',
+                        'start': round(segment.start, 2),
+                        'end': round(segment.end, 2),
+                        'text': text
+                    }) + "\n"
+        except Exception as e:
+            print(f"[SERVICE] Upload transcription failed: {e}")
+            yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+            return
+
+        yield json.dumps({
+            'type': 'done',
+            'transcription': " ".join(t for t in texts if t),
+            'audio_seconds': round(received['samples'] / SAMPLE_RATE, 2),
+            'decode_seconds': round(time.perf_counter() - start, 2),
+            'model': client.model_size
+        }) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-        # Transcribe using Whisper
-        if not whisper_client:
-            return jsonify({'error': 'Whisper client not initialized'}), 500
 
-        transcription = whisper_client.transcribe_audio(temp_audio_path)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get progress and result of a transcription job"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
-        # Clean up temp file
-        try:
-            os.remove(temp_audio_path)
-        except:
-            pass
-
-        if transcription:
-            recording_state['last_transcription'] = transcription
-            return jsonify({
-                'status': 'completed',
-                'transcription': transcription,
-                'timestamp': datetime.now().isoformat()
-            })
-        else:
-            return jsonify({'error': 'Transcription failed'}), 500
 
-    except Exception as e:
-        recording_state['error'] = str(e)
-        return jsonify({'error': f'Processing error: {str(e)}'}), 500
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running transcription job"""
+    job = job_queue.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
 
 
 @app.route('/transcription', methods=['GET'])
 def get_last_transcription():
-    """Get the last transcription result"""
-    if recording_state['last_transcription']:
+    """Get the calling session's last transcription result"""
+    transcription = request_session().state['last_transcription']
+    if transcription:
         return jsonify({
-            'transcription': recording_state['last_transcription'],
+            'transcription': transcription,
             'timestamp': datetime.now().isoformat()
         })
     else:
@@ -343,87 +837,153 @@ def get_last_transcription():
 
 @app.route('/streaming-chunks', methods=['GET'])
 def get_streaming_chunks():
-    """Get streaming transcription chunks since last check"""
+    """
+    Get the calling session's streaming transcription chunks since last check
+
+    Returns at most ?limit= (default STREAMING_CHUNKS_PAGE) chunks; with
+    has_more, poll again from latest_id to get the rest.
+    """
+    session = request_session()
     since_id = request.args.get('since_id', 0, type=int)
+    limit = max(1, min(request.args.get('limit', STREAMING_CHUNKS_PAGE, type=int), STREAMING_CHUNKS_PAGE))
 
     # Get chunks with ID greater than since_id
-    new_chunks = [
-        chunk for chunk in listen_mode_state['streaming_chunks']
-        if chunk['id'] > since_id
-    ]
+    new_chunks, latest_id = session.chunks.since(since_id, limit)
+    listen_mode = listen_mode_state.snapshot()
 
     return jsonify({
         'chunks': new_chunks,
-        'latest_id': listen_mode_state['last_chunk_id'],
-        'is_recording': listen_mode_state['is_recording_from_wake']
+        'latest_id': latest_id,
+        'has_more': latest_id < session.chunks.last_id,
+        'is_recording': listen_mode['is_recording_from_wake'] and listen_mode['session_id'] == session.id
+    })
+
+
+@app.route('/events', methods=['GET'])
+def events():
+    """
+    Server-Sent Events stream of chunk, wake, stop, transcription and job events
+
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) and receive
+    everything they missed that is still in the history. With ?session_id=,
+    events of other sessions are left out.
+    """
+    session_id = request.args.get('session_id')
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_event_id', event_bus.last_id, type=int)
+    if last_id > event_bus.last_id:
+        # Ids from before a backend restart, replay the whole history
+        last_id = 0
+
+    def stream():
+        nonlocal last_id
+        yield "retry: 3000\n\n"
+        if last_id and last_id < event_bus.oldest_id() - 1:
+            # Some events fell out of the history; tell the client to resync
+            yield f"event: gap\ndata: {{\"oldest_id\": {event_bus.oldest_id()}}}\n\n"
+        while True:
+            new_events = event_bus.wait(last_id, timeout=EVENT_KEEPALIVE_SECONDS)
+            if not new_events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in new_events:
+                if session_id and event.data.get('session_id', session_id) != session_id:
+                    continue
+                yield event.to_sse()
+            last_id = new_events[-1].id
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
 @app.route('/config', methods=['POST'])
 def update_config():
-    """Update Whisper configuration"""
+    """Update Whisper configuration and, with 'engine' (local|remote) and 'remote_url', the engine"""
     data = request.json
+
+    if 'engine' in data:
+        try:
+            configure_engine(data['engine'], data.get('remote_url'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if 'model' not in data:
+            return jsonify({'status': 'updated', 'engine': data['engine']})
+
     model_size = data.get('model', 'tiny').split('/')[-1].split('-')[-1]  # Extract size from model name
+    compute_type = data.get('compute_type', 'int8')
+    device = data.get('device', 'cpu')
+
+    if 'memory_budget_mb' in data:
+        model_registry.set_memory_budget(int(data['memory_budget_mb']))
 
-    init_whisper(model_size)
+    # The current model keeps serving requests until the new one is ready
+    loading = switch_whisper_model(model_size, compute_type, device)
 
     return jsonify({
-        'status': 'updated',
+        'status': 'loading' if loading else 'updated',
         'model': model_size
     })
 
 
-def start_audio_stream():
-    """Start the audio input stream"""
-    global audio_stream
-    print("Starting audio stream...")
-    device_name = "default" if audio_config['device_id'] is None else f"device {audio_config['device_id']}"
-    print(f"Using audio device: {device_name}")
-
-    with sd.InputStream(
-        device=audio_config['device_id'],  # Use configured device
-        callback=audio_callback,
-        channels=CHANNELS,
-        samplerate=SAMPLE_RATE,
-        dtype=np.int16
-    ) as stream:
-        audio_stream = stream
-        print("Audio stream started. Press Ctrl+C to stop.")
-        # Keep the stream open
-        while True:
-            time.sleep(0.1)
-
-
 if __name__ == '__main__':
     print("=" * 50)
     print("Voice Transcription Backend Service")
     print("=" * 50)
 
-    # Initialize Whisper client
-    print("\nInitializing Whisper model...")
-    # Options: tiny, base.en, small.en, medium.en, large
-    # Upgraded to small.en for better wake word recognition
-    init_whisper(model_size="small.en")
+    def startup():
+        # Start the shared audio stream
+        device_name = "default" if audio_config['device_id'] is None else f"device {audio_config['device_id']}"
+        print(f"Using audio device: {device_name}")
+        try:
+            capture_hub.start()
+        except Exception as e:
+            print(f"[WARN] Could not open audio device: {e}")
 
-    # Check Whisper status
-    if whisper_client and whisper_client.check_health():
-        print("[OK] Whisper small.en model loaded and ready")
-    else:
-        print("[WARN] Whisper model failed to load")
+        # Initialize Whisper client
+        print("\nInitializing Whisper model in the background...")
         print("  The model will download automatically on first use")
+        # Options: tiny, base.en, small.en, medium.en, large
+        # Upgraded to small.en for better wake word recognition
+        init_whisper(model_size="small.en")
+
+    # Finalize recordings a previous run was making when it died, before new spools appear
+    remove_stale_recordings(SPOOL_DIR, KEPT_RECORDING_RETENTION_SECONDS)
+    recovered_recordings.extend(recover_spools(SPOOL_DIR))
 
-    # Start audio stream in background thread
-    audio_thread = threading.Thread(target=start_audio_stream, daemon=True)
-    audio_thread.start()
+    if TRANSCRIPTION_ENGINE != 'local':
+        configure_engine(TRANSCRIPTION_ENGINE)
 
-    # Start Flask server
-    print("\nStarting Flask server on http://localhost:8765")
+    # Audio and models come up in the background; the server answers
+    # /status (state: loading/warming/ready) right away
+    threading.Thread(target=startup, daemon=True).start()
+
+    # Start HTTP server
+    print("\nStarting server on http://localhost:8765")
     print("API Endpoints:")
     print("  GET  /status           - Check service status")
     print("  POST /start-recording  - Start recording")
-    print("  POST /stop-recording   - Stop recording and transcribe")
+    print("  POST /stop-recording   - Stop recording and queue transcription")
+    print("  GET  /jobs/<id>        - Transcription job progress and result")
+    print("  POST /transcribe       - Transcribe an uploaded audio stream (NDJSON)")
+    print("  GET  /events           - Server-Sent Events push channel")
+    print("  GET  /metrics          - Prometheus metrics")
     print("  GET  /transcription    - Get last transcription")
-    print("  POST /config           - Update Ollama config")
+    print("  POST /config           - Switch model or transcription engine")
     print("=" * 50)
 
-    app.run(host='localhost', port=8765, debug=False)
+    try:
+        # cheroot hands the app the request body as it arrives (waitress buffers
+        # it first), so /transcribe decodes uploads while they stream in
+        from cheroot.wsgi import Server as WSGIServer
+    except ImportError:
+        print("[WARN] cheroot not installed, falling back to Flask's development server")
+        app.run(host='localhost', port=8765, debug=False, threaded=True)
+    else:
+        server = WSGIServer(('localhost', 8765), app, numthreads=SERVER_THREADS)
+        try:
+            server.start()
+        except KeyboardInterrupt:
+            server.stop()
@@ -0,0 +1,151 @@
+"""
+Recording sessions
+Each client (an Obsidian window or vault) records under its own session id
+with its own buffer, last result and chunk stream, so several clients can
+record at once without overwriting each other.
+"""
+import threading
+import time
+from typing import Callable, List, Optional
+
+from state import ChunkLog, StateStore
+
+
+DEFAULT_SESSION = 'default'
+
+
+class InvalidSessionId(ValueError):
+    """The session id is too long or contains control characters"""
+
+
+class TooManySessions(RuntimeError):
+    """Raised when max_sessions sessions exist and none of them can be dropped"""
+
+
+class RecordingSession:
+    def __init__(self, session_id: str, chunks=None):
+        """
+        State of one client's recordings
+
+        Args:
+            session_id: Client-chosen id
+            chunks: Log of streamed chunks (ChunkLog or TranscriptLog;
+                    None = the last 100 chunks in memory)
+        """
+        self.id = session_id
+        self.state = StateStore(
+            is_recording=False,
+            audio_data=None,  # RecordingBuffer of the recording in progress
+            last_transcription=None,
+            error=None,
+            job_id=None,  # Latest transcription job
+            speculative=None  # SpeculativeDecoder of the recording in progress
+        )
+        self.chunks = chunks if chunks is not None else ChunkLog(max_chunks=100)
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def to_dict(self) -> dict:
+        """Session summary, for /status"""
+        state = self.state.snapshot()
+        return {
+            'session_id': self.id,
+            'is_recording': state['is_recording'],
+            'recorded_seconds': round(state['audio_data'].duration, 1) if state['audio_data'] else 0.0,
+            'decoded_seconds': round(state['speculative'].committed_seconds, 1) if state['speculative'] else 0.0,
+            'job_id': state['job_id'],
+            'idle_seconds': round(time.monotonic() - self.last_active, 1)
+        }
+
+
+class SessionManager:
+    def __init__(self, max_sessions: int = 32, idle_seconds: float = 3600,
+                 chunk_log_factory: Optional[Callable[[str], object]] = None,
+                 stale_log_cleanup: Optional[Callable[[List[str]], object]] = None,
+                 busy: Optional[Callable[[str], bool]] = None):
+        """
+        Registry of recording sessions, created on first use
+
+        Args:
+            max_sessions: Sessions kept at once; idle ones are dropped first
+            idle_seconds: Sessions unused this long (and not recording) are dropped
+            chunk_log_factory: Callable(session_id) opening a session's chunk log,
+                               e.g. a durable TranscriptLog (None = in memory)
+            stale_log_cleanup: Callable(session ids in use) deleting the logs of
+                               sessions gone for good; run at most every idle_seconds
+            busy: Callable(session_id) telling whether work still writes to the
+                  session (queued jobs, listen mode); such sessions are never dropped
+        """
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.chunk_log_factory = chunk_log_factory
+        self.stale_log_cleanup = stale_log_cleanup
+        self.busy = busy
+        self._last_cleanup = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate(session_id: Optional[str]) -> str:
+        """Normalize a client-supplied id (None or empty = the default session)"""
+        session_id = (session_id or DEFAULT_SESSION).strip() or DEFAULT_SESSION
+        if len(session_id) > 128 or not session_id.isprintable():
+            raise InvalidSessionId("session_id must be 1-128 printable characters")
+        return session_id
+
+    def get(self, session_id: Optional[str] = None) -> RecordingSession:
+        """
+        Session for the id, created if new
+
+        Raises:
+            InvalidSessionId: For malformed ids
+            TooManySessions: If max_sessions sessions are all recording or busy
+        """
+        session_id = self.validate(session_id)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._prune_locked()
+                if len(self._sessions) >= self.max_sessions:
+                    raise TooManySessions(f"Too many recording sessions ({self.max_sessions})")
+                chunks = self.chunk_log_factory(session_id) if self.chunk_log_factory else None
+                session = self._sessions[session_id] = RecordingSession(session_id, chunks)
+        session.touch()
+        return session
+
+    def find(self, session_id: Optional[str]) -> Optional[RecordingSession]:
+        """Existing session for the id, without creating one"""
+        try:
+            session_id = self.validate(session_id)
+        except InvalidSessionId:
+            return None
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def sessions(self) -> List[RecordingSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def _prune_locked(self):
+        """Drop idle sessions, oldest first, to make room"""
+        now = time.monotonic()
+        idle = sorted((s for s in self._sessions.values()
+                       if not s.state['is_recording'] and not (self.busy and self.busy(s.id))),
+                      key=lambda s: s.last_active)
+        for session in idle:
+            if now - session.last_active < self.idle_seconds and len(self._sessions) < self.max_sessions:
+                break
+            if session.id != DEFAULT_SESSION:
+                del self._sessions[session.id]
+                close = getattr(session.chunks, 'close', None)
+                if close:
+                    close()  # A durable log stays on disk and is reopened if the client returns
+        if self.stale_log_cleanup and (self._last_cleanup is None or now - self._last_cleanup >= self.idle_seconds):
+            self._last_cleanup = now
+            try:
+                self.stale_log_cleanup(list(self._sessions))
+            except OSError as e:
+                print(f"[SESSIONS] Failed to remove old transcript logs: {e}")
@@ -0,0 +1,130 @@
+"""
+Speculative transcription of manual recordings
+While a recording is in progress, a background thread decodes it piece by
+piece, each piece cut at a speech pause a few seconds behind the live edge,
+so no word is split and the committed segments never change. When the
+recording stops only the audio after the last cut is left to decode.
+"""
+import threading
+import time
+from typing import Callable, Iterator, List, Optional
+
+from audio_buffer import RecordingBuffer
+from engine import LongFormSegment, TranscriptionEngine
+from scheduler import INTERACTIVE, work_class
+from vad import find_split_points
+
+
+class SpeculativeDecoder:
+    def __init__(self, get_client: Callable[[], Optional[TranscriptionEngine]],
+                 recording: RecordingBuffer,
+                 piece_seconds: float = 10.0,
+                 tail_seconds: float = 2.0,
+                 search_seconds: float = 3.0,
+                 poll_seconds: float = 1.0,
+                 prompt_chars: int = 200,
+                 long_tail_seconds: float = 120.0):
+        """
+        Start decoding a recording as it is captured
+
+        Args:
+            get_client: Returns the engine to decode with (None = skip this round)
+            recording: Buffer the capture hub is writing the recording to
+            piece_seconds: Undecoded audio needed before a piece is decoded
+            tail_seconds: Audio at the live edge never cut into, as speech may continue there
+            search_seconds: How far before the tail to look for a pause to cut at
+            poll_seconds: How often the recording is checked for new audio
+            prompt_chars: Committed text carried into the next piece's prompt
+            long_tail_seconds: A tail longer than this at stop is decoded as long-form
+        """
+        self.get_client = get_client
+        self.recording = recording
+        self.sample_rate = recording.sample_rate
+        self.piece_seconds = piece_seconds
+        self.tail_seconds = tail_seconds
+        self.search_seconds = search_seconds
+        self.poll_seconds = poll_seconds
+        self.prompt_chars = prompt_chars
+        self.long_tail_seconds = long_tail_seconds
+
+        self.segments: List[LongFormSegment] = []  # Committed, timed from the recording start
+        self.committed_samples = 0  # Audio before this point is decoded
+        self.pieces_decoded = 0
+        self.error = None  # Set if a background decode failed; the tail decode then covers the rest
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='speculative-decoder', daemon=True)
+        self._thread.start()
+
+    @property
+    def committed_seconds(self) -> float:
+        return self.committed_samples / self.sample_rate
+
+    def stop(self, wait: bool = True):
+        """Stop decoding in the background (a piece being decoded is finished first if wait)"""
+        self._stop.set()
+        if wait and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def finish(self, client: TranscriptionEngine) -> Iterator[LongFormSegment]:
+        """
+        Yield the whole recording's segments: those decoded while recording,
+        then the tail after the last cut, decoded now
+        """
+        self.stop()
+        print(f"[SPECULATIVE] {self.committed_seconds:.1f}s decoded while recording, "
+              f"{self.recording.duration - self.committed_seconds:.1f}s left")
+        yield from self.segments
+        end = len(self.recording)
+        if (end - self.committed_samples) / self.sample_rate > self.long_tail_seconds:
+            # Background decoding fell behind or failed: decode the rest as a long recording
+            offset = self.committed_samples / self.sample_rate
+            for segment in client.iter_segments_long(self.recording.view()[self.committed_samples:end],
+                                                     self.sample_rate):
+                yield LongFormSegment(segment.start + offset, segment.end + offset, segment.text)
+            return
+        yield from self._decode(client, self.committed_samples, end)
+
+    def _run(self):
+        with work_class(INTERACTIVE):
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    self._decode_ready()
+                except Exception as e:
+                    self.error = str(e)
+                    print(f"[SPECULATIVE] Background decoding stopped: {e}")
+                    return
+
+    def _decode_ready(self):
+        """Decode the next piece if enough audio has been captured past the last cut"""
+        end = len(self.recording)
+        pending = end - self.committed_samples
+        if pending < (self.piece_seconds + self.tail_seconds) * self.sample_rate:
+            return
+        client = self.get_client()
+        if not client or not client.check_health():
+            return
+
+        # Cut at the quietest point just before the live edge
+        region = self.recording.view()[self.committed_samples:end - int(self.tail_seconds * self.sample_rate)]
+        points = find_split_points(region, self.sample_rate,
+                                   max_segment_seconds=len(region) / self.sample_rate - 0.01,
+                                   search_seconds=self.search_seconds)
+        cut = self.committed_samples + points[1]
+
+        start = time.perf_counter()
+        segments = list(self._decode(client, self.committed_samples, cut))
+        self.segments.extend(segments)
+        self.committed_samples = cut
+        self.pieces_decoded += 1
+        print(f"[SPECULATIVE] Decoded up to {self.committed_seconds:.1f}s "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def _decode(self, client: TranscriptionEngine, start: int, end: int) -> Iterator[LongFormSegment]:
+        if end <= start:
+            return
+        offset = start / self.sample_rate
+        prompt = " ".join(s.text.strip() for s in self.segments)[-self.prompt_chars:] or None
+        for segment in client.iter_segments(self.recording.view()[start:end], self.sample_rate,
+                                            initial_prompt=prompt):
+            yield LongFormSegment(segment.start + offset, segment.end + offset, segment.text)
@@ -0,0 +1,119 @@
+"""
+Thread-safe service state
+The service's shared state is touched from request threads, the listener
+thread, job workers and the model loader; these containers make every
+read, update and read-modify-write atomic.
+"""
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+class StateStore:
+    def __init__(self, **initial):
+        """
+        Lock-protected dictionary of named fields
+
+        Single reads and writes use store['key']; multi-field changes that
+        must be seen together go through update() or transaction().
+
+        Args:
+            **initial: Fields and their starting values
+        """
+        self._data = dict(initial)
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            return self._data[key]
+
+    def __setitem__(self, key: str, value: Any):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._data[key] = value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.get(key, default)
+
+    def update(self, **fields):
+        """Set several fields atomically"""
+        with self._lock:
+            unknown = set(fields) - set(self._data)
+            if unknown:
+                raise KeyError(', '.join(sorted(unknown)))
+            self._data.update(fields)
+
+    def snapshot(self) -> dict:
+        """Consistent copy of every field"""
+        with self._lock:
+            return dict(self._data)
+
+    @contextmanager
+    def transaction(self) -> Iterator[dict]:
+        """
+        Hold the lock for a read-modify-write, e.g. check-then-set
+
+        Yields the underlying dict; keep the block short and don't call
+        anything that may wait on another thread.
+        """
+        with self._lock:
+            yield self._data
+
+
+class ChunkLog:
+    def __init__(self, max_chunks: int = 100):
+        """
+        Bounded, id-numbered log of streamed transcription chunks
+
+        Args:
+            max_chunks: Chunks kept for /streaming-chunks polling
+        """
+        self._chunks = deque(maxlen=max_chunks)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._last_id
+
+    def append(self, text: str, stable: bool = True) -> dict:
+        """Add a chunk and return it with its id and timestamp"""
+        with self._lock:
+            self._last_id += 1
+            chunk = {
+                'id': self._last_id,
+                'text': text,
+                'stable': stable,
+                'timestamp': datetime.now().isoformat()
+            }
+            self._chunks.append(chunk)
+            return chunk
+
+    def since(self, since_id: int, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """
+        Chunks with an id greater than since_id, and the id to resume from
+
+        Both are read together, so a chunk appended meanwhile is never
+        skipped by a poller that resumes from the returned id. That id is the
+        latest, or the last chunk returned when limit cuts the result short.
+        Ids are consecutive, so the start position is computed rather than searched.
+        """
+        with self._lock:
+            if not self._chunks:
+                return [], self._last_id
+            start = max(0, since_id - self._chunks[0]['id'] + 1)
+            chunks = list(itertools.islice(self._chunks, start, None if limit is None else start + limit))
+            if chunks and chunks[-1]['id'] != self._last_id:
+                return chunks, chunks[-1]['id']
+            return chunks, self._last_id
+
+    def clear(self):
+        """Drop the chunks; ids keep increasing so pollers never see an id reused"""
+        with self._lock:
+            self._chunks.clear()
@@ -0,0 +1,223 @@
+"""
+Incremental streaming transcription
+Re-decodes a growing audio buffer and only commits words that two
+consecutive decodes agree on (LocalAgreement-2). Committed text is final and
+never re-sent; the rest is reported as tentative. Committed text that has
+been trimmed from the buffer is carried over as the decoder prompt.
+"""
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+from whisper_client import WhisperClient, to_float32
+
+
+Word = Tuple[float, float, str]  # (start, end, text) in seconds since the stream began
+
+
+def _norm(word: str) -> str:
+    return re.sub(r"[^\w']+", "", word.lower())
+
+
+def join_words(words: List[Word]) -> str:
+    """Join word texts (which carry their own leading spaces) into a string"""
+    return "".join(w[2] for w in words).strip()
+
+
+class HypothesisBuffer:
+    def __init__(self):
+        """Tracks committed words and the latest unconfirmed hypothesis"""
+        self.committed_in_buffer = []  # Committed words still covered by the audio buffer
+        self.previous = []  # Last decode's words after the committed prefix
+        self.new = []
+        self.last_committed_time = 0.0
+
+    def insert(self, words: List[Word], offset: float):
+        """
+        Add a new decode of the buffer
+
+        Args:
+            words: Words with times relative to the buffer start
+            offset: Absolute time of the buffer start
+        """
+        new = [(s + offset, e + offset, w) for s, e, w in words]
+        # Ignore words that end before what has already been committed
+        self.new = [w for w in new if w[0] > self.last_committed_time - 0.1]
+
+        # The decoder often repeats the last committed words at the start; drop that n-gram
+        if self.new and abs(self.new[0][0] - self.last_committed_time) < 1:
+            tail = self.committed_in_buffer
+            for n in range(min(len(tail), len(self.new), 5), 0, -1):
+                if [_norm(w[2]) for w in tail[-n:]] == [_norm(w[2]) for w in self.new[:n]]:
+                    self.new = self.new[n:]
+                    break
+
+    def flush(self) -> List[Word]:
+        """
+        Commit the longest prefix the last two decodes agree on
+
+        Returns:
+            Newly committed words
+        """
+        commit = []
+        while self.new and self.previous:
+            if _norm(self.new[0][2]) != _norm(self.previous[0][2]):
+                break
+            word = self.new.pop(0)
+            self.previous.pop(0)
+            commit.append(word)
+            self.last_committed_time = word[1]
+
+        self.previous = self.new
+        self.new = []
+        self.committed_in_buffer.extend(commit)
+        return commit
+
+    def commit_all(self) -> List[Word]:
+        """Commit the whole tentative hypothesis (end of an utterance)"""
+        commit = self.previous
+        if commit:
+            self.last_committed_time = commit[-1][1]
+        self.previous = []
+        self.committed_in_buffer.extend(commit)
+        return commit
+
+    def pop_committed(self, time: float):
+        """Forget committed words that end before time (trimmed from the buffer)"""
+        while self.committed_in_buffer and self.committed_in_buffer[0][1] <= time:
+            self.committed_in_buffer.pop(0)
+
+    @property
+    def tentative(self) -> List[Word]:
+        return self.previous
+
+
+class StreamingTranscriber:
+    def __init__(self, whisper_client: WhisperClient,
+                 sample_rate: int = 16000,
+                 min_chunk_seconds: float = 1.0,
+                 max_buffer_seconds: float = 15.0,
+                 prompt_chars: int = 200,
+                 beam_size: int = 5):
+        """
+        Initialize streaming transcriber
+
+        Args:
+            whisper_client: Client used for decoding
+            sample_rate: Sample rate of inserted audio
+            min_chunk_seconds: New audio required before re-decoding
+            max_buffer_seconds: Buffer length after which audio up to the last
+                                committed segment end is trimmed
+            prompt_chars: Committed text carried into the decoder prompt
+            beam_size: Beam width for each decode
+        """
+        self.whisper_client = whisper_client
+        self.sample_rate = sample_rate
+        self.min_chunk_seconds = min_chunk_seconds
+        self.max_buffer_seconds = max_buffer_seconds
+        self.prompt_chars = prompt_chars
+        self.beam_size = beam_size
+        self.reset()
+
+    def reset(self):
+        """Start a new stream, forgetting audio, hypotheses and prompt"""
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0.0  # Absolute time of audio[0]
+        self.pending_samples = 0  # Samples inserted since the last decode
+        self.hypothesis = HypothesisBuffer()
+        self.committed = []  # Every committed word of the stream
+        self.decodes = 0
+
+    @property
+    def buffer_seconds(self) -> float:
+        return len(self.audio) / self.sample_rate
+
+    @property
+    def committed_text(self) -> str:
+        return join_words(self.committed)
+
+    @property
+    def tentative_text(self) -> str:
+        return join_words(self.hypothesis.tentative)
+
+    def insert_audio(self, block: np.ndarray):
+        """Append captured audio (int16 or float) to the buffer"""
+        samples = to_float32(block, self.sample_rate)
+        self.audio = np.concatenate((self.audio, samples))
+        self.pending_samples += len(samples)
+
+    def process(self, force: bool = False) -> Tuple[str, str]:
+        """
+        Re-decode the buffer if enough new audio arrived
+
+        Args:
+            force: Decode even if less than min_chunk_seconds is new
+
+        Returns:
+            Tuple of (newly committed text, current tentative text)
+        """
+        if not len(self.audio):
+            return "", ""
+        if not force and self.pending_samples < self.min_chunk_seconds * self.sample_rate:
+            return "", self.tentative_text
+
+        segments = self._decode()
+        words = [(w.start, w.end, w.word) for seg in segments for w in (seg.words or [])]
+        self.hypothesis.insert(words, self.buffer_offset)
+        commit = self.hypothesis.flush()
+        self.committed.extend(commit)
+
+        if self.buffer_seconds > self.max_buffer_seconds:
+            segment_ends = [seg.end + self.buffer_offset for seg in segments]
+            self._trim_to_committed(segment_ends)
+
+        return join_words(commit), self.tentative_text
+
+    def finish(self) -> str:
+        """
+        End the current utterance: commit the tentative words and clear the buffer
+
+        The prompt carries over, so the next utterance keeps its context.
+
+        Returns:
+            Text committed by this call
+        """
+        if self.pending_samples:
+            self.process(force=True)
+        commit = self.hypothesis.commit_all()
+        self.committed.extend(commit)
+        self._trim(self.buffer_offset + self.buffer_seconds)
+        return join_words(commit)
+
+    def _decode(self) -> list:
+        self.pending_samples = 0
+        self.decodes += 1
+        return list(self.whisper_client.iter_segments(
+            self.audio,
+            self.sample_rate,
+            beam_size=self.beam_size,
+            initial_prompt=self._prompt(),
+            word_timestamps=True
+        ))
+
+    def _prompt(self) -> Optional[str]:
+        """Committed text that is no longer in the audio buffer"""
+        prompt = join_words([w for w in self.committed if w[1] <= self.buffer_offset])
+        return prompt[-self.prompt_chars:] or None
+
+    def _trim_to_committed(self, segment_ends: List[float]):
+        """Trim at the last segment end that is fully committed"""
+        committed_ends = [t for t in segment_ends if t <= self.hypothesis.last_committed_time]
+        if committed_ends:
+            self._trim(committed_ends[-1])
+        elif self.buffer_seconds > 2 * self.max_buffer_seconds:
+            # One very long segment: fall back to the last committed word
+            self._trim(self.hypothesis.last_committed_time)
+
+    def _trim(self, time: float):
+        cut = int((time - self.buffer_offset) * self.sample_rate)
+        if cut <= 0:
+            return
+        self.audio = self.audio[cut:]
+        self.buffer_offset = time
+        self.hypothesis.pop_committed(time)
@@ -0,0 +1,237 @@
+"""
+Durable transcript log
+Append-only JSON-lines file of a session's streamed chunks, with an
+in-memory id -> file offset index. Pollers resume from any id with a
+binary search and one sequential read, and the text survives a backend
+restart. Old chunks expire by count or age and are compacted away by
+rewriting the file from the oldest kept chunk.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+
+def transcript_path(directory: str, session_id: str) -> str:
+    """File name for a session's log: readable, filesystem-safe and unique per id"""
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', session_id)[:64]
+    digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(directory, f"{safe}-{digest}.jsonl")
+
+
+def remove_stale_transcripts(directory: str, max_age_seconds: float, keep: List[str] = ()) -> int:
+    """
+    Delete logs of sessions no client has used in max_age_seconds
+
+    Args:
+        directory: Where transcript_path() puts the logs
+        max_age_seconds: Logs not written to for this long are deleted
+        keep: Paths of logs still open, left alone whatever their age
+
+    Returns:
+        Number of files deleted
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(('.jsonl', '.jsonl.compact')) or os.path.abspath(entry.path) in keep:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue  # Removed meanwhile, or in use
+    return removed
+
+
+class TranscriptLog:
+    def __init__(self, path: str,
+                 retention_chunks: Optional[int] = 10000,
+                 retention_seconds: Optional[float] = None,
+                 fsync: bool = True):
+        """
+        Open (or create) a transcript log, rebuilding its index from the file
+
+        Has the same interface as state.ChunkLog, so a session can use either.
+
+        Args:
+            path: Log file; its directory is created if missing
+            retention_chunks: Newest chunks kept (None = no limit)
+            retention_seconds: Chunks older than this expire (None = no limit)
+            fsync: Force each chunk to disk before append() returns
+        """
+        self.path = path
+        self.retention_chunks = retention_chunks
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+
+        self._ids = []  # Chunk ids in file order, increasing
+        self._offsets = []  # Byte offset of each chunk's line
+        self._times = []  # Append time of each chunk (epoch seconds)
+        self._first = 0  # Index of the oldest chunk still retained; earlier ones await compaction
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a+b')
+        self._load()
+
+    def _load(self):
+        """Index the existing lines, cutting off a partial line left by a crash"""
+        self._file.seek(0)
+        offset = 0
+        for line in self._file:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("partial line")
+                chunk = json.loads(line)
+            except ValueError:
+                print(f"[TRANSCRIPT] Truncating damaged tail of {self.path} at byte {offset}")
+                self._file.truncate(offset)
+                break
+            self._last_id = chunk['id']
+            if chunk.get('marker'):
+                offset += len(line)
+                continue
+            self._ids.append(chunk['id'])
+            self._offsets.append(offset)
+            self._times.append(_epoch(chunk.get('timestamp')))
+            offset += len(line)
+        self._expire_locked()
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._last_id
+
+    def append(self, text: str, stable: bool = True) -> dict:
+        """Add a chunk and return it with its id and timestamp, once it is on disk"""
+        with self._lock:
+            now = time.time()
+            chunk = {
+                'id': self._last_id + 1,
+                'text': text,
+                'stable': stable,
+                'timestamp': datetime.fromtimestamp(now).isoformat()
+            }
+            line = json.dumps(chunk).encode('utf-8') + b"\n"
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+            self._last_id = chunk['id']
+            self._ids.append(chunk['id'])
+            self._offsets.append(offset)
+            self._times.append(now)
+            self._expire_locked()
+            return chunk
+
+    def since(self, since_id: int, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """
+        Retained chunks with an id greater than since_id, and the id to resume from
+
+        The start is found by binary search and the chunks are read in one
+        sequential read. When limit cuts the result short, the returned id is
+        that of the last chunk returned rather than the latest, so a poller
+        that resumes from it catches up page by page without gaps.
+        """
+        with self._lock:
+            start = max(bisect_right(self._ids, since_id), self._first)
+            end = len(self._ids) if limit is None else min(len(self._ids), start + limit)
+            if start >= end:
+                return [], self._last_id
+            stop = self._offsets[end] if end < len(self._ids) else self._size_locked()
+            self._file.seek(self._offsets[start])
+            data = self._file.read(stop - self._offsets[start])
+            chunks = [json.loads(line) for line in data.splitlines()]
+            return chunks, self._last_id if end == len(self._ids) else self._ids[end - 1]
+
+    def clear(self):
+        """Expire every chunk; ids keep increasing so pollers never see an id reused"""
+        with self._lock:
+            self._first = len(self._ids)
+            self._compact_locked()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def stats(self) -> dict:
+        """Retained chunk count, id range and file size"""
+        with self._lock:
+            return {
+                'chunks': len(self._ids) - self._first,
+                'first_id': self._ids[self._first] if self._first < len(self._ids) else None,
+                'last_id': self._last_id,
+                'file_bytes': self._size_locked()
+            }
+
+    def _size_locked(self) -> int:
+        self._file.seek(0, os.SEEK_END)
+        return self._file.tell()
+
+    def _expire_locked(self):
+        """Apply retention, compacting once expired chunks outnumber the kept ones"""
+        if self.retention_chunks is not None:
+            self._first = max(self._first, len(self._ids) - self.retention_chunks)
+        if self.retention_seconds is not None:
+            cutoff = time.time() - self.retention_seconds
+            while self._first < len(self._ids) and self._times[self._first] < cutoff:
+                self._first += 1
+        if self._first and self._first >= len(self._ids) - self._first:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        """
+        Rewrite the file without the expired prefix
+
+        The kept chunks are one contiguous block at the end of the file, so
+        this is a single copy; the new file replaces the old atomically. If
+        nothing is kept, a marker line preserves the last id across restarts.
+        """
+        if not self._first:
+            return
+        base = self._offsets[self._first] if self._first < len(self._ids) else self._size_locked()
+        temp_path = self.path + '.compact'
+        with open(temp_path, 'wb') as out:
+            if self._first >= len(self._ids):
+                out.write(json.dumps({'id': self._last_id, 'marker': True}).encode('utf-8') + b"\n")
+            self._file.seek(base)
+            while True:
+                block = self._file.read(1 << 20)
+                if not block:
+                    break
+                out.write(block)
+            out.flush()
+            os.fsync(out.fileno())
+        self._file.close()  # Windows can't replace a file that is open
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'a+b')
+
+        self._ids = self._ids[self._first:]
+        self._offsets = [offset - base for offset in self._offsets[self._first:]]
+        self._times = self._times[self._first:]
+        self._first = 0
+
+
+def _epoch(timestamp: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
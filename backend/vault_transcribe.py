@@ -0,0 +1,339 @@
+"""
+Bulk transcription of the audio attachments in an Obsidian vault
+Walks the vault, transcribes recordings that are new or changed since the
+last run, and writes a sidecar note next to each one. A SQLite index keyed
+by path, mtime and content hash makes re-runs over an unchanged vault take
+seconds; results are committed one by one, so an interrupted run resumes
+where it stopped.
+
+Usage:
+    python vault_transcribe.py ~/Notes --model small.en --workers 4
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Iterator, Optional
+
+AUDIO_EXTENSIONS = ('.m4a', '.webm', '.mp3', '.wav', '.ogg', '.opus', '.flac', '.3gp')
+SIDECAR_SUFFIX = '.transcript.md'
+SKIP_DIRS = ('.obsidian', '.trash', '.git')
+INDEX_NAME = '.whisper-transcribe.sqlite'
+
+
+class WorkerPoolFailed(RuntimeError):
+    """The worker processes died (e.g. the model couldn't load); files not finished stay pending"""
+
+
+class TranscriptIndex:
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, path: str):
+        """
+        Persistent record of processed attachments
+
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")  # A crash never loses committed results
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                sha256 TEXT,
+                status TEXT NOT NULL,
+                text TEXT,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+        self.db.commit()
+
+    def load(self) -> dict:
+        """path -> (mtime_ns, size, sha256, status) for every indexed file"""
+        rows = self.db.execute("SELECT path, mtime_ns, size, sha256, status FROM files")
+        return {row[0]: row[1:] for row in rows}
+
+    def find_by_hash(self, sha256: str) -> Optional[str]:
+        """Transcript of an already processed file with the same content (moved or copied)"""
+        row = self.db.execute(
+            "SELECT text FROM files WHERE sha256 = ? AND status = ? LIMIT 1",
+            (sha256, self.DONE)).fetchone()
+        return row[0] if row else None
+
+    def record(self, path: str, mtime_ns: int, size: int, sha256: Optional[str],
+               status: str, text: str = None, error: str = None):
+        """Insert or update one file and commit immediately (the checkpoint)"""
+        self.db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, mtime_ns, size, sha256, status, text, error, datetime.now().isoformat()))
+        self.db.commit()
+
+    def forget_missing(self, present: set) -> int:
+        """Drop entries for files that no longer exist; returns how many"""
+        missing = [p for (p,) in self.db.execute("SELECT path FROM files") if p not in present]
+        self.db.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in missing])
+        self.db.commit()
+        return len(missing)
+
+    def close(self):
+        self.db.close()
+
+
+def iter_attachments(vault: str, extensions=AUDIO_EXTENSIONS) -> Iterator[os.DirEntry]:
+    """Audio files in the vault, skipping Obsidian's config, trash and VCS directories"""
+    stack = [vault]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                elif entry.name.lower().endswith(extensions):
+                    yield entry
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sidecar_path(path: str) -> str:
+    """memo.m4a -> memo.transcript.md"""
+    return os.path.splitext(path)[0] + SIDECAR_SUFFIX
+
+
+def write_sidecar(vault: str, path: str, text: str, model: str, audio_seconds: Optional[float]):
+    """Write the transcript note next to the attachment (path relative to the vault), atomically"""
+    name = path.replace(os.sep, '/')
+    lines = [
+        '---',
+        f'source: "[[{name}]]"',
+        f'transcribed: {datetime.now().isoformat(timespec="seconds")}',
+        f'model: {model}',
+    ]
+    if audio_seconds is not None:
+        lines.append(f'duration: {audio_seconds:.0f}')
+    lines += ['---', '', f'![[{name}]]', '', text, '']
+
+    target = sidecar_path(os.path.join(vault, path))
+    temp = target + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    os.replace(temp, target)
+
+
+# Worker process state: one model per process, loaded once
+_worker_client = None
+
+
+def _init_worker(model: str, compute_type: str, cpu_threads: int):
+    global _worker_client
+    sys.stdout = open(os.devnull, 'w')  # Keep per-file model chatter off the progress output
+    from whisper_client import WhisperClient
+    _worker_client = WhisperClient(model, compute_type=compute_type, cpu_threads=cpu_threads)
+    if not _worker_client.check_health():
+        raise RuntimeError(f"Failed to load Whisper model {model}")
+
+
+def _transcribe_file(path: str) -> dict:
+    """Decode and transcribe one attachment inside a worker process"""
+    from audio_decode import iter_pcm_blocks
+
+    samples = 0
+    texts = []
+
+    def counted(blocks):
+        nonlocal samples
+        for block in blocks:
+            samples += len(block)
+            yield block
+
+    with open(path, 'rb') as f:
+        audio_format = None if path.lower().endswith('.wav') else 'av'
+        blocks = counted(iter_pcm_blocks(f, audio_format=audio_format))
+        for segment in _worker_client.iter_segments_stream(blocks):
+            text = segment.text.strip()
+            if text:
+                texts.append(text)
+    return {'text': " ".join(texts), 'audio_seconds': samples / 16000}
+
+
+def scan(vault: str, index: TranscriptIndex, force: bool = False):
+    """
+    Compare the vault with the index
+
+    Only files whose size or mtime changed are hashed, so an unchanged vault
+    costs one stat per attachment.
+
+    Returns:
+        (todo, present, stats): files to transcribe as (path, mtime_ns, size, sha256),
+        every attachment path seen, and counters. Paths are relative to the
+        vault, so the index survives the vault being moved.
+    """
+    known = index.load()
+    todo, present = [], set()
+    stats = {'scanned': 0, 'unchanged': 0, 'reused': 0}
+
+    for entry in iter_attachments(vault):
+        stat = entry.stat()
+        path = os.path.relpath(entry.path, vault)
+        present.add(path)
+        stats['scanned'] += 1
+
+        previous = known.get(path)
+        if not force and previous and previous[3] == TranscriptIndex.DONE \
+                and previous[0] == stat.st_mtime_ns and previous[1] == stat.st_size:
+            stats['unchanged'] += 1
+            continue
+
+        sha256 = file_sha256(entry.path)
+        if not force and previous and previous[2] == sha256 and previous[3] == TranscriptIndex.DONE:
+            # Touched but not modified
+            index.record(path, stat.st_mtime_ns, stat.st_size, sha256, TranscriptIndex.DONE,
+                         text=index.find_by_hash(sha256))
+            stats['unchanged'] += 1
+            continue
+        todo.append((path, stat.st_mtime_ns, stat.st_size, sha256))
+
+    return todo, present, stats
+
+
+def run(vault: str, model: str = 'small.en', compute_type: str = 'int8',
+        workers: int = None, threads_per_worker: int = 2,
+        index_path: str = None, force: bool = False, dry_run: bool = False) -> dict:
+    """Transcribe new and changed attachments; returns counters for the run"""
+    vault = os.path.abspath(vault)
+    index = TranscriptIndex(index_path or os.path.join(vault, INDEX_NAME))
+    started = time.perf_counter()
+
+    try:
+        todo, present, stats = scan(vault, index, force)
+        stats['forgotten'] = index.forget_missing(present)
+        stats.update({'transcribed': 0, 'failed': 0})
+        print(f"[VAULT] {stats['scanned']} attachments, {stats['unchanged']} unchanged, "
+              f"{len(todo)} to transcribe")
+
+        # Identical content already transcribed elsewhere (moved or copied file)
+        remaining = []
+        for path, mtime_ns, size, sha256 in todo:
+            text = None if force else index.find_by_hash(sha256)
+            if text is None:
+                remaining.append((path, mtime_ns, size, sha256))
+                continue
+            if not dry_run:
+                write_sidecar(vault, path, text, model, None)
+                index.record(path, mtime_ns, size, sha256, TranscriptIndex.DONE, text=text)
+            stats['reused'] += 1
+
+        if dry_run or not remaining:
+            return stats
+
+        workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        workers = min(workers, len(remaining))
+        print(f"[VAULT] Transcribing with {workers} worker(s) x {threads_per_worker} thread(s)")
+
+        for path, mtime_ns, size, sha256 in remaining:
+            index.record(path, mtime_ns, size, sha256, TranscriptIndex.PENDING)
+
+        pending_files = iter(remaining)
+        in_flight = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model, compute_type, threads_per_worker)) as pool:
+            try:
+                while True:
+                    # Keep a bounded number of files queued so progress is committed steadily
+                    while len(in_flight) < workers * 2:
+                        item = next(pending_files, None)
+                        if item is None:
+                            break
+                        in_flight[pool.submit(_transcribe_file, os.path.join(vault, item[0]))] = item
+                    if not in_flight:
+                        break
+
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    broken = None
+                    for future in finished:
+                        path, mtime_ns, size, sha256 = in_flight.pop(future)
+                        done = stats['transcribed'] + stats['failed'] + 1
+                        try:
+                            result = future.result()
+                        except BrokenProcessPool as e:
+                            broken = e  # Not the file's fault; it stays pending for the next run
+                            continue
+                        except Exception as e:
+                            index.record(path, mtime_ns, size, sha256, TranscriptIndex.FAILED,
+                                         error=str(e))
+                            stats['failed'] += 1
+                            print(f"[VAULT] ({done}/{len(remaining)}) {path}: failed: {e}")
+                            continue
+                        try:
+                            write_sidecar(vault, path, result['text'], model, result['audio_seconds'])
+                            index.record(path, mtime_ns, size, sha256, TranscriptIndex.DONE,
+                                         text=result['text'])
+                            stats['transcribed'] += 1
+                            print(f"[VAULT] ({done}/{len(remaining)}) {path}: "
+                                  f"{result['audio_seconds']:.0f}s")
+                        except Exception as e:
+                            index.record(path, mtime_ns, size, sha256, TranscriptIndex.FAILED,
+                                         error=str(e))
+                            stats['failed'] += 1
+                            print(f"[VAULT] ({done}/{len(remaining)}) {path}: failed: {e}")
+                    if broken:
+                        raise broken
+            except BrokenProcessPool as e:
+                # Raised by submit() or a result once a worker died or its initializer failed.
+                # Finished files are already committed to the index.
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise WorkerPoolFailed(
+                    f"Transcription workers stopped ({e or 'a worker process died'}); "
+                    f"{stats['transcribed']} file(s) finished and saved, the rest run next time")
+            except KeyboardInterrupt:
+                print("[VAULT] Interrupted; finished files are saved, the rest run next time")
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        return stats
+    finally:
+        index.close()
+        print(f"[VAULT] Done in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('vault', help='Path to the Obsidian vault')
+    parser.add_argument('--model', default='small.en')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: cores / threads per worker)')
+    parser.add_argument('--threads-per-worker', type=int, default=2)
+    parser.add_argument('--index', help=f'Index database (default: <vault>/{INDEX_NAME})')
+    parser.add_argument('--force', action='store_true', help='Re-transcribe everything')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be transcribed')
+    args = parser.parse_args()
+
+    try:
+        stats = run(args.vault, args.model, args.compute_type, args.workers,
+                    args.threads_per_worker, args.index, args.force, args.dry_run)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    except WorkerPoolFailed as e:
+        print(f"[VAULT] Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[VAULT] {stats}")
+
+
+if __name__ == '__main__':
+    main()
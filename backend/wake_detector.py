@@ -0,0 +1,183 @@
+"""
+Two-stage wake phrase detection
+A tiny Whisper model screens every speech window with greedy decoding and a
+lenient fuzzy match; only windows it flags are re-decoded by the full model,
+which must contain the exact wake phrase before recording starts.
+"""
+import re
+import threading
+from difflib import SequenceMatcher
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from whisper_client import WhisperClient
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip punctuation so phrase matching ignores formatting"""
+    return " ".join(re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split())
+
+
+def fuzzy_phrase_score(text: str, phrase: str) -> float:
+    """
+    Best similarity between the phrase and any same-length word window of the text
+
+    Args:
+        text: Transcription to search
+        phrase: Phrase to look for
+
+    Returns:
+        Similarity ratio in [0, 1], 1.0 for an exact match
+    """
+    words = normalize_text(text).split()
+    target = normalize_text(phrase)
+    n = len(target.split())
+    if not words or n == 0:
+        return 0.0
+
+    best = 0.0
+    for i in range(max(1, len(words) - n + 1)):
+        window = " ".join(words[i:i + n])
+        best = max(best, SequenceMatcher(None, window, target).ratio())
+        if best == 1.0:
+            break
+    return best
+
+
+class WakePhraseCascade:
+    def __init__(self, detector_client: WhisperClient,
+                 verifier_client: WhisperClient,
+                 wake_phrase: str,
+                 screen_threshold: float = 0.7):
+        """
+        Initialize the wake phrase cascade
+
+        Args:
+            detector_client: Small, fast model used to screen every window (e.g. tiny.en)
+            verifier_client: Full model used to confirm screener hits
+            wake_phrase: Phrase that starts a recording
+            screen_threshold: Minimum fuzzy score for the screener to pass a window
+                              on to the verifier. Lower catches more wake phrases
+                              at the cost of more full-model decodes.
+        """
+        self.detector_client = detector_client
+        self.verifier_client = verifier_client
+        self.wake_phrase = normalize_text(wake_phrase)
+        self.screen_threshold = screen_threshold
+
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the online counters"""
+        with self._lock:
+            self._stats = {
+                'windows_screened': 0,
+                'screener_hits': 0,
+                'confirmed': 0,
+                'rejected': 0,
+            }
+
+    def get_stats(self) -> dict:
+        """
+        Online cascade counters
+
+        Without labels only the screener's false-accept rate can be observed
+        (hits the verifier rejected); use evaluate() on labeled audio for
+        false-reject rates.
+
+        Returns:
+            Counter snapshot plus derived rates
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        screened = stats['windows_screened']
+        hits = stats['screener_hits']
+        stats['screener_hit_rate'] = hits / screened if screened else 0.0
+        stats['screener_false_accept_rate'] = stats['rejected'] / hits if hits else 0.0
+        return stats
+
+    def screen(self, audio: np.ndarray, sample_rate: int = 16000) -> Tuple[bool, Optional[str]]:
+        """
+        Stage 1: cheap check whether the window might contain the wake phrase
+
+        Returns:
+            Tuple of (passed, screener transcription)
+        """
+        text = self.detector_client.transcribe_array(audio, sample_rate, beam_size=1)
+        passed = bool(text) and fuzzy_phrase_score(text, self.wake_phrase) >= self.screen_threshold
+        return passed, text
+
+    def verify(self, audio: np.ndarray, sample_rate: int = 16000) -> Tuple[bool, Optional[str]]:
+        """
+        Stage 2: decode with the full model and require the exact wake phrase
+
+        Returns:
+            Tuple of (confirmed, full model transcription)
+        """
+        text = self.verifier_client.transcribe_array(audio, sample_rate)
+        confirmed = bool(text) and self.wake_phrase in normalize_text(text)
+        return confirmed, text
+
+    def detect(self, audio: np.ndarray, sample_rate: int = 16000) -> Tuple[bool, Optional[str]]:
+        """
+        Run the cascade over one speech window
+
+        Args:
+            audio: Mono audio window
+            sample_rate: Sample rate of the audio
+
+        Returns:
+            Tuple of (wake phrase detected, best available transcription)
+        """
+        passed, text = self.screen(audio, sample_rate)
+        with self._lock:
+            self._stats['windows_screened'] += 1
+            if passed:
+                self._stats['screener_hits'] += 1
+
+        if not passed:
+            return False, text
+
+        confirmed, full_text = self.verify(audio, sample_rate)
+        with self._lock:
+            self._stats['confirmed' if confirmed else 'rejected'] += 1
+
+        return confirmed, full_text
+
+    def evaluate(self, samples: Iterable[Tuple[np.ndarray, bool]],
+                 sample_rate: int = 16000) -> dict:
+        """
+        Measure false-accept / false-reject rates on labeled windows
+
+        Args:
+            samples: Iterable of (audio window, contains_wake_phrase) pairs
+            sample_rate: Sample rate of the audio
+
+        Returns:
+            Rates for the screener alone and for the full cascade
+        """
+        positives = negatives = 0
+        screen_fa = screen_fr = cascade_fa = cascade_fr = 0
+
+        for audio, is_wake in samples:
+            passed, _ = self.screen(audio, sample_rate)
+            detected = passed and self.verify(audio, sample_rate)[0]
+
+            if is_wake:
+                positives += 1
+                screen_fr += not passed
+                cascade_fr += not detected
+            else:
+                negatives += 1
+                screen_fa += passed
+                cascade_fa += detected
+
+        return {
+            'positives': positives,
+            'negatives': negatives,
+            'screener_false_accept_rate': screen_fa / negatives if negatives else 0.0,
+            'screener_false_reject_rate': screen_fr / positives if positives else 0.0,
+            'false_accept_rate': cascade_fa / negatives if negatives else 0.0,
+            'false_reject_rate': cascade_fr / positives if positives else 0.0,
+        }
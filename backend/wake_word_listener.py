@@ -2,15 +2,19 @@
 Wake word listener using continuous audio monitoring
 Detects wake phrase "computer take note" and stop phrase "computer end note"
 """
+import re
 import threading
 import time
-import wave
-import tempfile
-import os
-import queue
-import sounddevice as sd
+from typing import List, Optional, Tuple
 import numpy as np
 from whisper_client import WhisperClient
+from capture import CaptureHub
+from vad import EnergyVAD
+from audio_buffer import RingBuffer, RecordingBuffer
+from wake_detector import WakePhraseCascade, normalize_text
+from streaming import StreamingTranscriber, Word, join_words
+from overload import OverloadPolicy
+from scheduler import WAKE, work_class
 
 
 class WakeWordListener:
@@ -18,7 +22,13 @@ class WakeWordListener:
                  wake_phrase: str = "computer take note",
                  stop_phrase: str = "computer end note",
                  streaming_mode: bool = True,
-                 device_id: int = None):
+                 device_id: int = None,
+                 capture_hub: CaptureHub = None,
+                 vad: EnergyVAD = None,
+                 wake_detector: WakePhraseCascade = None,
+                 fallback_client: WhisperClient = None,
+                 overload_policy: OverloadPolicy = None,
+                 spool_dir: str = None):
         """
         Initialize wake word listener
 
@@ -26,35 +36,91 @@ class WakeWordListener:
             whisper_client: WhisperClient instance for transcription
             wake_phrase: Phrase to start recording
             stop_phrase: Phrase to stop recording
-            streaming_mode: If True, transcribe and stream chunks in real-time
-            device_id: Audio input device ID (None = use default)
+            streaming_mode: If True, transcribe and stream chunks in real-time.
+                            Only text that is stable across consecutive decodes is
+                            committed; the rest is reported as tentative.
+                            If False, the note is assembled at the stop phrase from
+                            the chunk decodes made while listening for it.
+            device_id: Audio input device ID (None = use default); only used
+                       when the listener opens its own capture hub
+            capture_hub: Shared capture hub, or a replay source from
+                         audio_source (FileSource, GeneratorSource), to subscribe
+                         to (None = open a private hub on device_id)
+            vad: Voice activity detector gating what reaches Whisper
+                 (None = EnergyVAD with default thresholds)
+            wake_detector: Cheap-then-full cascade used while waiting for the
+                           wake phrase (None = decode every window with whisper_client)
+            fallback_client: Smaller model to decode with when the listener
+                             can't keep up even with greedy decoding
+            overload_policy: Decides when lag calls for cheaper decoding
+                             (None = OverloadPolicy defaults)
+            spool_dir: Directory the recorded note is spooled to
+                       (None = system temp dir)
         """
         self.whisper_client = whisper_client
         self.wake_phrase = wake_phrase.lower()
         self.stop_phrase = stop_phrase.lower()
         self.streaming_mode = streaming_mode
         self.device_id = device_id
+        self.spool_dir = spool_dir
 
         self.is_listening = False
         self.is_recording = False
         self.process_thread = None
-        self.audio_stream = None
 
         # Audio settings
         self.sample_rate = 16000
         self.channels = 1
-        self.chunk_duration = 3  # Process in 3-second chunks
+        self.block_duration = 0.5  # Audio handed to the VAD at a time
+        self.chunk_duration = 3  # Longest chunk before a forced cut; chunks normally end at speech pauses
+        self.beam_size = 5
+        self.seam_seconds = 1.0  # Audio each side of a mid-speech chunk cut re-decoded in batch mode
+        self.seam_edge_seconds = 0.3  # A word this close to a cut counts as running across it
+        self.vad = vad or EnergyVAD(sample_rate=self.sample_rate)
+        self.wake_detector = wake_detector
+
+        # Stats
+        self.blocks_skipped = 0  # Silent blocks that never reached Whisper
+        self.chunks_transcribed = 0
+        self.seams_redecoded = 0  # Batch mode chunk boundaries decoded again with context
+        self.frames_processed = 0  # Frames taken off the queue since listening started
 
         # Buffers and Queues
-        self.audio_queue = queue.Queue()
-        self.full_recording_buffer = []  # Stores audio while in recording mode
+        self.queue_seconds = 30  # Audio the callback can run ahead of the decoder
+        self.audio_queue = self._new_audio_queue()
+        self.full_recording_buffer = RecordingBuffer(self.sample_rate, self.channels,
+                                                     spool_dir=spool_dir)  # Stores audio while in recording mode
         self.streaming_transcription = []  # Accumulates streamed chunks
+        self._note_chunks = []  # Batch mode: chunk decodes of the current note, see _add_note_chunk
+        self.streamer = StreamingTranscriber(whisper_client, self.sample_rate)
+        self._stream_held = ""  # Committed words that might be the start of the stop phrase
+        self._stop_pattern = self._phrase_pattern(self.stop_phrase)
+        self._wake_pattern = self._phrase_pattern(self.wake_phrase)
+
+        # Overload handling: settings the policy levels are applied on top of
+        self.fallback_client = fallback_client
+        self.overload = overload_policy or OverloadPolicy(
+            max_level=len(OverloadPolicy.LEVELS) - (1 if fallback_client else 2))
+        self._base_settings = (self.chunk_duration, self.beam_size, self.streamer.min_chunk_seconds,
+                               self.vad.energy_threshold_db, self.vad.hangover_frames)
 
         # Callbacks
         self.on_wake_detected = None
         self.on_stop_detected = None
         self.on_transcription_complete = None
         self.on_chunk_transcribed = None  # New: for streaming chunks
+        self.on_overload_changed = None  # Called with get_stats() when the policy level changes
+
+        # Audio capture; a private hub is only opened while listening
+        self.capture_hub = capture_hub
+        self._owns_capture_hub = capture_hub is None
+
+    def set_whisper_client(self, whisper_client: WhisperClient):
+        """Swap the content model; the chunk being decoded finishes on the old one"""
+        self.whisper_client = whisper_client
+        self._apply_overload_level()
+        if self.wake_detector:
+            self.wake_detector.verifier_client = whisper_client
 
     def start_listening(self):
         """Start continuous listening for wake word"""
@@ -64,26 +130,31 @@ class WakeWordListener:
 
         self.is_listening = True
         self.is_recording = False
-        self.audio_queue = queue.Queue()
-        self.full_recording_buffer = []
+        self.audio_queue = self._new_audio_queue()
+        self.full_recording_buffer.reset()
         self.streaming_transcription = []
+        self._note_chunks = []
+        self.frames_processed = 0
+        self.vad.reset()
+        self.overload.reset()
+        self._apply_overload_level()
         
         # Start processing thread
         self.process_thread = threading.Thread(target=self._process_audio_queue, daemon=True)
         self.process_thread.start()
-        
-        # Start audio stream
+
+        # Subscribe to captured audio
         try:
-            self.audio_stream = sd.InputStream(
-                device=self.device_id,  # Use specified device or default
-                channels=self.channels,
-                samplerate=self.sample_rate,
-                callback=self._audio_callback,
-                dtype=np.int16,
-                blocksize=int(self.sample_rate * 0.5)  # 0.5s blocks for responsiveness
-            )
-            self.audio_stream.start()
-            device_name = "default" if self.device_id is None else f"device {self.device_id}"
+            if self._owns_capture_hub:
+                self.capture_hub = CaptureHub(self.sample_rate, self.channels,
+                                              device_id=self.device_id)
+                self.capture_hub.start()
+            self.capture_hub.subscribe(self.audio_queue)
+            if not self.capture_hub.is_running:
+                # Replay sources start after subscribing so no frame is missed
+                self.capture_hub.start()
+            device_id = self.capture_hub.device_id
+            device_name = "default" if device_id is None else f"device {device_id}"
             print(f"[WAKE WORD] Started listening for '{self.wake_phrase}' on {device_name}")
         except Exception as e:
             print(f"[WAKE WORD] Error starting audio stream: {e}")
@@ -93,112 +164,308 @@ class WakeWordListener:
         """Stop continuous listening"""
         self.is_listening = False
         self.is_recording = False
-        
-        if self.audio_stream:
-            self.audio_stream.stop()
-            self.audio_stream.close()
-            self.audio_stream = None
-            
+
+        if self.capture_hub:
+            self.capture_hub.unsubscribe(self.audio_queue)
+            if self._owns_capture_hub:
+                self.capture_hub.stop()
+                self.capture_hub = None
+
         if self.process_thread:
             self.process_thread.join(timeout=2)
-            
+
+        self.full_recording_buffer.close()  # A note cut short by stopping isn't kept
         print("[WAKE WORD] Stopped listening")
 
-    def _audio_callback(self, indata, frames, time, status):
-        """Callback for sounddevice input stream"""
-        if status:
-            print(f"[WAKE WORD] Audio status: {status}")
-        if self.is_listening:
-            self.audio_queue.put(indata.copy())
+    def _new_audio_queue(self) -> RingBuffer:
+        return RingBuffer(int(self.sample_rate * self.queue_seconds), self.channels)
 
     def _process_audio_queue(self):
-        """Main loop to process audio from the queue"""
+        """Main loop to process audio from the queue, decoding ahead of other work"""
+        with work_class(WAKE):
+            self._process_loop()
+
+    def _process_loop(self):
         current_chunk_buffer = []
-        samples_per_chunk = int(self.sample_rate * self.chunk_duration)
         current_samples = 0
-        
+        block_frames = int(self.sample_rate * self.block_duration)
+        pre_roll = None  # Last silent block, prepended so word onsets aren't clipped
+
         while self.is_listening:
             try:
                 # Get audio data from queue (blocking with timeout)
-                try:
-                    data = self.audio_queue.get(timeout=1.0)
-                except queue.Empty:
+                data = self.audio_queue.read(block_frames, timeout=1.0)
+                if data is None:
+                    continue
+                self.frames_processed += len(data)
+                self._check_overload()
+                max_chunk_samples = int(self.sample_rate * self.chunk_duration)
+
+                # If we are recording, ALSO add to the full recording buffer
+                if self.is_recording:
+                    self.full_recording_buffer.write(data)
+
+                is_speech = self.vad.is_speech(data)
+
+                # Streaming a note: the incremental decoder does its own windowing
+                if self.is_recording and self.streaming_mode:
+                    if current_chunk_buffer:
+                        current_chunk_buffer = []
+                        current_samples = 0
+                    if is_speech:
+                        self._stream_block(data)
+                    else:
+                        self.blocks_skipped += 1
+                        self._stream_pause()
                     continue
-                
+
+                if not is_speech:
+                    self.blocks_skipped += 1
+                    pre_roll = data
+                    if current_chunk_buffer:
+                        # Speech just ended: cut the chunk at the pause
+                        self._flush_chunk(current_chunk_buffer,
+                                          trailing_samples=len(data) if self.is_recording else 0)
+                        current_chunk_buffer = []
+                        current_samples = 0
+                    continue
+
+                if not current_chunk_buffer and pre_roll is not None:
+                    current_chunk_buffer.append(pre_roll)
+                    current_samples += len(pre_roll)
+                pre_roll = None
+
                 # Add to current processing buffer
                 current_chunk_buffer.append(data)
                 current_samples += len(data)
-                
-                # If we are recording, ALSO add to the full recording buffer
-                if self.is_recording:
-                    self.full_recording_buffer.append(data)
-                
-                # Check if we have enough data for a transcription chunk
-                if current_samples >= samples_per_chunk:
-                    # Combine buffer into one array
-                    audio_chunk = np.concatenate(current_chunk_buffer)
-                    
-                    # Reset buffer (sliding window could be better, but keeping simple for now)
+
+                # Long stretch of continuous speech: force a cut
+                if current_samples >= max_chunk_samples:
+                    self._flush_chunk(current_chunk_buffer, forced=True)
                     current_chunk_buffer = []
                     current_samples = 0
-                    
-                    # Transcribe this chunk
-                    transcription = self._transcribe_chunk(audio_chunk)
-                    
-                    if transcription:
-                        self._handle_transcription(transcription)
-                        
+
             except Exception as e:
                 print(f"[WAKE WORD] Error in process loop: {e}")
                 time.sleep(0.5)
 
-    def _handle_transcription(self, transcription: str):
-        """Handle the transcription result"""
-        transcription_lower = transcription.lower().strip()
+    @property
+    def lag_seconds(self) -> float:
+        """Captured audio not yet processed, i.e. how far behind real time the listener is"""
+        return self.audio_queue.available() / self.sample_rate
+
+    def get_stats(self) -> dict:
+        """Lag, overload policy and throughput counters, for /status"""
+        return {
+            'overload': self.overload.get_stats(),
+            'dropped_seconds': round(self.audio_queue.overflow_frames / self.sample_rate, 2),
+            'chunks_transcribed': self.chunks_transcribed,
+            'seams_redecoded': self.seams_redecoded,
+            'blocks_skipped': self.blocks_skipped,
+            'chunk_duration': self.chunk_duration,
+            'beam_size': self.beam_size,
+            'model': self._decode_client.model_size if self._decode_client else None
+        }
+
+    def _check_overload(self):
+        """Feed the current lag to the overload policy and apply any level change"""
+        if not self.overload.update(self.lag_seconds):
+            return
+        self._apply_overload_level()
+        print(f"[WAKE WORD] {self.lag_seconds:.1f}s behind real time, "
+              f"overload policy now '{self.overload.level_name}'")
+        if self.on_overload_changed:
+            self.on_overload_changed(self.get_stats())
+
+    def _apply_overload_level(self):
+        """Set VAD, chunking, beam and model for the current overload level"""
+        (chunk_duration, beam_size, min_stream_seconds,
+         energy_threshold_db, hangover_frames) = self._base_settings
+        level = self.overload.level
+
+        if level >= 1:
+            # Only clearly voiced audio, and stop sending trailing silence sooner
+            energy_threshold_db += 6
+            hangover_frames //= 3
+        if level >= 2:
+            chunk_duration *= 2
+            min_stream_seconds *= 2
+        if level >= 3:
+            beam_size = 1
+
+        self.vad.energy_threshold_db = energy_threshold_db
+        self.vad.hangover_frames = hangover_frames
+        self.chunk_duration = chunk_duration
+        self.beam_size = beam_size
+        self.streamer.beam_size = beam_size
+        self.streamer.min_chunk_seconds = min_stream_seconds
+        self.streamer.whisper_client = self._decode_client
+
+    @property
+    def _decode_client(self) -> WhisperClient:
+        """Model used for listener decodes at the current overload level"""
+        if self.overload.level >= 4 and self.fallback_client:
+            return self.fallback_client
+        return self.whisper_client
+
+    def _flush_chunk(self, chunk_buffer: list, forced: bool = False, trailing_samples: int = 0):
+        """
+        Transcribe a buffered speech chunk and act on the result
+
+        Args:
+            chunk_buffer: Blocks making up the chunk
+            forced: The chunk was cut mid-speech at chunk_duration rather than at a pause
+            trailing_samples: Audio already recorded after the chunk (the silent block that ended it)
+        """
+        # Combine buffer into one array
+        audio_chunk = np.concatenate(chunk_buffer)
+
+        # Batch mode note: keep the words and their timings for the final transcript
+        if self.is_recording:
+            self._add_note_chunk(audio_chunk, forced, trailing_samples)
+            return
+
+        # Idle: let the cascade screen for the wake phrase with the small model
+        if self.wake_detector:
+            detected, transcription = self.wake_detector.detect(audio_chunk, self.sample_rate)
+            self.chunks_transcribed += 1
+            if transcription:
+                print(f"[WAKE WORD] Heard: {transcription}")
+            if detected:
+                self._on_wake(audio_chunk, forced)
+            return
+
+        # Transcribe this chunk
+        transcription = self._transcribe_chunk(audio_chunk)
+        self.chunks_transcribed += 1
+
+        if transcription:
+            self._handle_transcription(transcription, audio_chunk, forced)
+
+    def _handle_transcription(self, transcription: str, audio_chunk: np.ndarray, forced: bool):
+        """Handle the transcription result while waiting for the wake phrase"""
         print(f"[WAKE WORD] Heard: {transcription}")
 
         # Check for wake phrase
-        if not self.is_recording and self.wake_phrase in transcription_lower:
-            print(f"[WAKE WORD] Wake phrase detected!")
-            self.is_recording = True
-            self.full_recording_buffer = [] # Start fresh recording
-            self.streaming_transcription = []  # Reset streaming buffer
-            if self.on_wake_detected:
-                self.on_wake_detected()
-
-        # Check for stop phrase
-        elif self.is_recording and self.stop_phrase in transcription_lower:
-            print(f"[WAKE WORD] Stop phrase detected!")
-            self.is_recording = False
-
-            if self.on_stop_detected:
-                self.on_stop_detected()
-
-            # In streaming mode, we've already sent chunks, just signal completion
-            if self.streaming_mode:
-                if self.on_transcription_complete:
-                    # Send final aggregated transcription (optional, for reference)
-                    full_text = " ".join(self.streaming_transcription)
-                    self.on_transcription_complete(self._clean_transcription(full_text))
-            else:
-                # Batch mode: Get full transcription of recorded audio
-                full_transcription = self._process_recording()
-                if self.on_transcription_complete and full_transcription:
-                    self.on_transcription_complete(full_transcription)
-
-            self.full_recording_buffer = []
-            self.streaming_transcription = []
-
-        # During recording: handle chunk streaming
-        elif self.is_recording:
-            if self.streaming_mode and self.on_chunk_transcribed:
-                # Clean the chunk (remove wake/stop phrases if present)
-                clean_chunk = transcription_lower.replace(self.wake_phrase, '').replace(self.stop_phrase, '').strip()
-                if clean_chunk:
-                    self.streaming_transcription.append(clean_chunk)
-                    # Emit chunk in real-time
-                    print(f"[WAKE WORD] Streaming chunk: {clean_chunk}")
-                    self.on_chunk_transcribed(clean_chunk)
+        if self.wake_phrase in transcription.lower():
+            self._on_wake(audio_chunk, forced)
+
+    def _on_wake(self, audio_chunk: np.ndarray = None, forced: bool = False):
+        """
+        Switch into recording mode after the wake phrase
+
+        Args:
+            audio_chunk: Chunk the wake phrase was heard in; in batch mode it
+                         opens the note, so words said right after the phrase are kept
+            forced: The chunk was cut mid-speech, so the recording continues it seamlessly
+        """
+        print(f"[WAKE WORD] Wake phrase detected!")
+        self.is_recording = True
+        self.full_recording_buffer.reset()  # Start fresh recording
+        self._note_chunks = []
+        if not self.streaming_mode and audio_chunk is not None:
+            # Decoded with word timings at the stop phrase, to cut right after the wake phrase
+            self.full_recording_buffer.write(audio_chunk)
+            self._note_chunks.append({'start': 0, 'end': len(audio_chunk),
+                                      'forced': forced, 'words': None})
+        self.streaming_transcription = []  # Reset streaming buffer
+        self.streamer.reset()
+        self._stream_held = ""
+        if self.on_wake_detected:
+            self.on_wake_detected()
+
+    def _on_stop(self):
+        """Leave recording mode after the stop phrase and deliver the note"""
+        print(f"[WAKE WORD] Stop phrase detected!")
+        self.is_recording = False
+
+        if self.on_stop_detected:
+            self.on_stop_detected()
+
+        # In streaming mode, we've already sent chunks, just signal completion
+        if self.streaming_mode:
+            if self.on_transcription_complete:
+                # Send final aggregated transcription (optional, for reference)
+                full_text = " ".join(self.streaming_transcription)
+                self.on_transcription_complete(self._clean_transcription(full_text))
+        else:
+            # Batch mode: Get full transcription of recorded audio
+            full_transcription = self._process_recording()
+            if self.on_transcription_complete and full_transcription:
+                self.on_transcription_complete(full_transcription)
+
+        self.full_recording_buffer.reset()
+        self._note_chunks = []
+        self.streaming_transcription = []
+        self.streamer.reset()
+        self._stream_held = ""
+
+    def _stream_block(self, data: np.ndarray):
+        """Feed a speech block to the incremental decoder"""
+        self.streamer.insert_audio(data)
+        committed, tentative = self.streamer.process()
+        if self.streamer.pending_samples == 0:
+            self.chunks_transcribed += 1
+        self._emit_streamed(committed, tentative)
+
+    def _stream_pause(self):
+        """Speech paused: nothing will change the tentative words, commit them"""
+        if self.streamer.buffer_seconds or self.streamer.tentative_text:
+            committed = self.streamer.finish()
+            self.chunks_transcribed += 1
+            self._emit_streamed(committed, "")
+
+    def _emit_streamed(self, committed: str, tentative: str):
+        """
+        Emit newly committed text, watching for the stop phrase
+
+        Trailing committed words that could be the start of the stop phrase
+        are held back until the next commit shows whether they are.
+        """
+        text = f"{self._stream_held} {committed}".strip()
+        probe = f"{text} {tentative}".strip()
+
+        if self._stop_pattern.search(probe):
+            if not self._stop_pattern.search(text):
+                # Stop phrase is still tentative; the user is done, commit it now
+                text = f"{text} {self.streamer.finish()}".strip()
+            match = self._stop_pattern.search(text)
+            self._emit_chunk(text[:match.start()] if match else text, True)
+            self._stream_held = ""
+            self._on_stop()
+            return
+
+        text, self._stream_held = self._split_stop_prefix(text)
+        self._emit_chunk(text, True)
+        if tentative and self.on_chunk_transcribed:
+            self.on_chunk_transcribed(tentative, False)
+
+    def _emit_chunk(self, text: str, is_stable: bool):
+        # Clean the chunk (remove a wake phrase caught at the start)
+        text = self._wake_pattern.sub('', text).strip(" ,.")
+        if not text:
+            return
+        self.streaming_transcription.append(text)
+        # Emit chunk in real-time
+        print(f"[WAKE WORD] Streaming chunk: {text}")
+        if self.on_chunk_transcribed:
+            self.on_chunk_transcribed(text, is_stable)
+
+    def _split_stop_prefix(self, text: str):
+        """Split off trailing words that match the beginning of the stop phrase"""
+        words = text.split()
+        stop_words = self.stop_phrase.split()
+        for n in range(min(len(words), len(stop_words) - 1), 0, -1):
+            tail = [re.sub(r"[^\w']+", "", w.lower()) for w in words[-n:]]
+            if tail == stop_words[:n]:
+                return " ".join(words[:-n]), " ".join(words[-n:])
+        return text, ""
+
+    @staticmethod
+    def _phrase_pattern(phrase: str):
+        """Regex matching phrase case-insensitively, with any punctuation between words"""
+        words = [re.escape(w) for w in phrase.lower().split()]
+        return re.compile(r"\b" + r"[\W_]+".join(words) + r"\b", re.IGNORECASE)
 
     def _clean_transcription(self, text: str) -> str:
         """Remove wake and stop phrases from transcription and capitalize"""
@@ -218,70 +485,177 @@ class WakeWordListener:
     def _transcribe_chunk(self, audio_chunk: np.ndarray) -> str:
         """Transcribe a small audio chunk"""
         try:
-            # Save chunk to temporary file
-            temp_path = os.path.join(tempfile.gettempdir(), f'wake_chunk_{int(time.time())}_{id(audio_chunk)}.wav')
+            # Quick transcription, straight from memory
+            return self._decode_client.transcribe_array(audio_chunk, self.sample_rate,
+                                                        beam_size=self.beam_size)
 
-            with wave.open(temp_path, 'wb') as wav_file:
-                wav_file.setnchannels(self.channels)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(self.sample_rate)
-                wav_file.writeframes(audio_chunk.tobytes())
+        except Exception as e:
+            print(f"[WAKE WORD] Chunk transcription error: {e}")
+            return None
 
-            # Quick transcription
-            transcription = self.whisper_client.transcribe_audio(temp_path)
+    def _add_note_chunk(self, audio_chunk: np.ndarray, forced: bool, trailing_samples: int):
+        """
+        Decode a batch mode chunk with word timings and watch it for the stop phrase
 
-            # Clean up
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+        The words are kept with their position in the recording, so the final
+        transcript is assembled from these decodes instead of decoding the
+        whole recording again.
+        """
+        end = len(self.full_recording_buffer) - trailing_samples
+        start = end - len(audio_chunk)  # Negative when the pre-roll predates the recording
+        words = self._decode_words(audio_chunk, start, self._note_prompt(start / self.sample_rate))
+        self.chunks_transcribed += 1
+        self._note_chunks.append({'start': start, 'end': end, 'forced': forced, 'words': words})
 
-            return transcription
+        if words is None:
+            return
+        text = join_words(words)
+        if text:
+            print(f"[WAKE WORD] Heard: {text}")
 
+        # Include the previous chunk's last words: the stop phrase may straddle a cut
+        recent = [w for chunk in self._note_chunks[-2:] for w in (chunk['words'] or [])]
+        if self._find_phrase(recent, self.stop_phrase) is not None:
+            self._on_stop()
+
+    def _decode_words(self, audio: np.ndarray, start: int,
+                      prompt: str = None) -> Optional[List[Word]]:
+        """
+        Decode audio with word timestamps
+
+        Args:
+            audio: Samples to decode
+            start: Position of the first sample in the recording
+            prompt: Preceding note text to condition the decoder on
+
+        Returns:
+            Words with times in seconds since the recording began, or None on error
+        """
+        offset = start / self.sample_rate
+        try:
+            segments = self._decode_client.iter_segments(audio, self.sample_rate,
+                                                         beam_size=self.beam_size,
+                                                         initial_prompt=prompt,
+                                                         word_timestamps=True)
+            return [(w.start + offset, w.end + offset, w.word)
+                    for segment in segments for w in (segment.words or [])]
         except Exception as e:
             print(f"[WAKE WORD] Chunk transcription error: {e}")
             return None
 
+    def _note_prompt(self, before: float, max_chars: int = 200) -> Optional[str]:
+        """Tail of the note's words ending before the given time, as decoder context"""
+        words = [w for chunk in self._note_chunks for w in (chunk['words'] or []) if w[1] <= before]
+        return join_words(words)[-max_chars:] or None
+
+    @staticmethod
+    def _find_phrase(words: List[Word], phrase: str, last: bool = True) -> Optional[Tuple[int, int]]:
+        """Index range (start, end) of the last (or first) exact occurrence of phrase in words"""
+        phrase_words = phrase.split()
+        normalized = [normalize_text(w[2]) for w in words]
+        starts = range(len(words) - len(phrase_words), -1, -1) if last \
+            else range(len(words) - len(phrase_words) + 1)
+        for i in starts:
+            if normalized[i:i + len(phrase_words)] == phrase_words:
+                return i, i + len(phrase_words)
+        return None
+
+    def _assemble_note(self, audio: np.ndarray) -> Optional[str]:
+        """
+        Build the batch mode transcript from the chunk decodes
+
+        Only the wake chunk (not decoded with word timings yet) and the seams
+        where a chunk was cut mid-word are decoded again, with the preceding
+        text as context. The note is then cut at the wake and stop phrases by
+        word.
+
+        Returns:
+            The note text, or None if the chunk decodes can't be used
+        """
+        chunks = self._note_chunks
+        if not chunks:
+            return None
+        for chunk in chunks:
+            if chunk['words'] is None:
+                chunk['words'] = self._decode_words(audio[max(chunk['start'], 0):chunk['end']],
+                                                    chunk['start'])
+                if chunk['words'] is None:
+                    return None
+
+        words = list(chunks[0]['words'])
+        for previous, chunk in zip(chunks, chunks[1:]):
+            if previous['forced'] and chunk['start'] == previous['end']:
+                words = self._merge_seam(audio, words, chunk)
+            else:
+                words += chunk['words']
+
+        # Cut right after the wake phrase, if it was heard in the first chunk
+        first_end = chunks[0]['end'] / self.sample_rate + self.seam_seconds
+        wake = self._find_phrase(words, self.wake_phrase, last=False)
+        if wake and words[wake[1] - 1][1] <= first_end:
+            words = words[wake[1]:]
+        # And right before the stop phrase
+        stop = self._find_phrase(words, self.stop_phrase)
+        if stop:
+            words = words[:stop[0]]
+
+        # Phrases the decoder punctuated or split oddly are removed from the text
+        text = self._wake_pattern.sub('', join_words(words), count=1)
+        text = self._stop_pattern.split(text)[0].strip(" ,.")
+        return text[0].upper() + text[1:] if text else ""
+
+    def _merge_seam(self, audio: np.ndarray, words: List[Word], chunk: dict) -> List[Word]:
+        """
+        Join the next chunk's words at a mid-speech cut
+
+        If a word runs across the cut, the audio around it is decoded again
+        and its words replace both chunks' words within half a seam of the
+        cut, where the chunk decodes may have clipped or guessed a word.
+        """
+        cut = chunk['start'] / self.sample_rate
+        edge = self.seam_edge_seconds
+        straddles = (words and words[-1][1] >= cut - edge) and \
+            (chunk['words'] and chunk['words'][0][0] <= cut + edge)
+        if not straddles:
+            return words + chunk['words']
+
+        start = max(chunk['start'] - int(self.seam_seconds * self.sample_rate), 0)
+        end = min(chunk['start'] + int(self.seam_seconds * self.sample_rate), chunk['end'])
+        prompt = join_words([w for w in words if w[1] <= start / self.sample_rate])[-200:] or None
+        seam_words = self._decode_words(audio[start:end], start, prompt)
+        if seam_words is None:
+            return words + chunk['words']
+        self.seams_redecoded += 1
+
+        low, high = cut - self.seam_seconds / 2, cut + self.seam_seconds / 2
+
+        def middle(w):
+            return (w[0] + w[1]) / 2
+
+        return ([w for w in words if middle(w) < low]
+                + [w for w in seam_words if low <= middle(w) < high]
+                + [w for w in chunk['words'] if middle(w) >= high])
+
     def _process_recording(self) -> str:
-        """Process the full recording buffer"""
+        """Assemble the note from the recording's chunk decodes, or decode it whole"""
         if not self.full_recording_buffer:
             return None
 
         try:
-            # Combine all chunks
-            full_audio = np.concatenate(self.full_recording_buffer, axis=0)
-
-            # Save to temp file
-            temp_path = os.path.join(tempfile.gettempdir(), f'full_recording_{int(time.time())}.wav')
+            # Zero-copy view of everything recorded
+            full_audio = self.full_recording_buffer.view()
 
-            with wave.open(temp_path, 'wb') as wav_file:
-                wav_file.setnchannels(self.channels)
-                wav_file.setsampwidth(2)
-                wav_file.setframerate(self.sample_rate)
-                wav_file.writeframes(full_audio.tobytes())
+            transcription = self._assemble_note(full_audio)
+            if transcription is not None:
+                return transcription
 
             print(f"[WAKE WORD] Transcribing full recording...")
 
             # Transcribe the full recording
-            transcription = self.whisper_client.transcribe_audio(temp_path)
-
-            # Clean up
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+            transcription = self.whisper_client.transcribe_array(full_audio, self.sample_rate)
 
             # Remove wake and stop phrases from transcription
-            if transcription:
-                # Remove the wake phrase
-                transcription = transcription.lower().replace(self.wake_phrase, '').strip()
-                # Remove the stop phrase
-                transcription = transcription.lower().replace(self.stop_phrase, '').strip()
-                # Capitalize first letter
-                if transcription:
-                    transcription = transcription[0].upper() + transcription[1:]
-
-            return transcription
+            return self._clean_transcription(transcription)
 
         except Exception as e:
             print(f"[WAKE WORD] Full recording processing error: {e}")
@@ -289,11 +663,19 @@ class WakeWordListener:
 
 
 if __name__ == "__main__":
-    # Test wake word listener
+    # Test wake word listener, live or replaying a recording
+    import argparse
     from whisper_client import WhisperClient
+    from audio_source import FileSource
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--file', help='Replay a WAV/FLAC file instead of the microphone')
+    parser.add_argument('--fast', action='store_true', help='Replay as fast as the listener keeps up')
+    args = parser.parse_args()
 
     whisper = WhisperClient(model_size="small.en")
-    listener = WakeWordListener(whisper)
+    source = FileSource(args.file, realtime=not args.fast, trailing_silence=2) if args.file else None
+    listener = WakeWordListener(whisper, capture_hub=source)
 
     def on_wake():
         print(">>> Recording started!")
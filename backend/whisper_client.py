@@ -1,35 +1,65 @@
 """
 Faster-Whisper client for audio transcription
 More reliable than Ollama for whisper models
+
+faster_whisper (and CTranslate2 behind it) is imported when a model is
+first loaded rather than at module import, so importing this module is
+cheap and the service can start serving before any model is ready.
 """
-from faster_whisper import WhisperModel
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, Union
 import os
+import time
+import numpy as np
+
+from vad import find_split_points
+from scheduler import InferenceScheduler, current_work_class, work_class
+from metrics import observe_transcription
+from engine import LongFormSegment, TranscriptionEngine, WHISPER_SAMPLE_RATE  # faster-whisper expects mono float32 PCM at 16kHz
 
 
-class WhisperClient:
-    def __init__(self, model_size: str = "small.en", device: str = "cpu"):
+class WhisperClient(TranscriptionEngine):
+    def __init__(self, model_size: str = "small.en", device: str = "cpu",
+                 compute_type: str = "int8", cpu_threads: int = 0,
+                 num_workers: int = 1,
+                 scheduler: Optional[InferenceScheduler] = None):
         """
         Initialize Faster-Whisper client
 
         Args:
             model_size: Model size (tiny, base.en, small.en, medium.en, large)
             device: Device to run on (cpu or cuda)
+            compute_type: CTranslate2 compute type (int8 for CPU efficiency)
+            cpu_threads: Threads per decode (0 = CTranslate2 default)
+            num_workers: Decodes the model can run in parallel; long-form
+                         transcription spreads segments across them
+            scheduler: Orders decode steps by work class; share one between
+                       clients so models don't compete for the cores
+                       (None = a scheduler of this client's own)
         """
         self.model_size = model_size
         self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.num_workers = num_workers
+        self.scheduler = scheduler or InferenceScheduler(max_concurrent=num_workers)
         self.model = None
+        self._batched_pipeline = None
+        self.warmed_up = False
         self._load_model()
 
     def _load_model(self):
         """Load the whisper model"""
         try:
             print(f"Loading Whisper {self.model_size} model...")
+            from faster_whisper import WhisperModel
             # Download and cache the model automatically
             self.model = WhisperModel(
                 self.model_size,
                 device=self.device,
-                compute_type="int8"  # Use int8 for CPU efficiency
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.num_workers
             )
             print(f"Whisper {self.model_size} model loaded successfully")
         except Exception as e:
@@ -50,24 +80,259 @@ class WhisperClient:
             print("Whisper model not loaded")
             return None
 
+        # Check if file exists
+        if not os.path.exists(audio_file_path):
+            print(f"Audio file not found: {audio_file_path}")
+            return None
+
+        print(f"Transcribing: {audio_file_path}")
+        return self._transcribe(audio_file_path)
+
+    def transcribe_array(self, audio: np.ndarray,
+                         sample_rate: int = WHISPER_SAMPLE_RATE,
+                         beam_size: int = 5) -> Optional[str]:
+        """
+        Transcribe in-memory audio without going through a temporary file
+
+        Args:
+            audio: Mono audio samples, int16 PCM or float32 in [-1, 1].
+                   A (frames, 1) array as delivered by sounddevice is accepted.
+            sample_rate: Sample rate of the audio (must be 16kHz)
+            beam_size: Beam width, 1 for greedy decoding
+
+        Returns:
+            Transcribed text or None if error
+        """
+        if not self.model:
+            print("Whisper model not loaded")
+            return None
+
         try:
-            # Check if file exists
-            if not os.path.exists(audio_file_path):
-                print(f"Audio file not found: {audio_file_path}")
-                return None
+            samples = to_float32(audio, sample_rate)
+        except ValueError as e:
+            print(f"Transcription error: {e}")
+            return None
+
+        if samples.size == 0:
+            return None
+
+        print(f"Transcribing {samples.size / WHISPER_SAMPLE_RATE:.1f}s of audio")
+        return self._transcribe(samples, beam_size=beam_size)
 
-            print(f"Transcribing: {audio_file_path}")
+    def transcribe_bytes(self, pcm: Union[bytes, bytearray, memoryview],
+                         sample_rate: int = WHISPER_SAMPLE_RATE) -> Optional[str]:
+        """
+        Transcribe a buffer of raw little-endian int16 mono PCM
+
+        Args:
+            pcm: Raw PCM bytes (no WAV header)
+            sample_rate: Sample rate of the audio (must be 16kHz)
+
+        Returns:
+            Transcribed text or None if error
+        """
+        # frombuffer is a view over the caller's buffer, no copy until normalization
+        return self.transcribe_array(np.frombuffer(pcm, dtype='<i2'), sample_rate)
+
+    def iter_segments(self, audio: np.ndarray,
+                      sample_rate: int = WHISPER_SAMPLE_RATE,
+                      beam_size: int = 5,
+                      initial_prompt: Optional[str] = None,
+                      word_timestamps: bool = False) -> Iterator:
+        """
+        Decode in-memory audio lazily, yielding segments as they are decoded
+
+        Lets callers report progress or stop early between segments.
+
+        Args:
+            audio: Mono audio samples, int16 PCM or float32 in [-1, 1]
+            sample_rate: Sample rate of the audio (must be 16kHz)
+            beam_size: Beam width, 1 for greedy decoding
+            initial_prompt: Preceding text to condition the decoder on
+            word_timestamps: Also compute per-word timings (segment.words)
+
+        Yields:
+            faster-whisper Segment objects (start, end, text, ...)
+        """
+        if not self.model:
+            raise RuntimeError("Whisper model not loaded")
+
+        samples = to_float32(audio, sample_rate)
+        start = time.perf_counter()
+        yield from self._segments(samples, beam_size, initial_prompt, word_timestamps)
+        self._observe('stream', start, samples.size)
+
+    def iter_segments_long(self, audio: np.ndarray,
+                           sample_rate: int = WHISPER_SAMPLE_RATE,
+                           batch_size: int = 8,
+                           max_segment_seconds: float = 30.0,
+                           window_seconds: float = 600.0) -> Iterator[LongFormSegment]:
+        """
+        Decode a long recording in parallel, yielding segments in order
+
+        Uses faster-whisper's batched pipeline when available. Otherwise the
+        audio is cut at speech pauses and the pieces are decoded concurrently
+        across the model's num_workers. Audio is converted to float32 a piece
+        or window at a time, so a recording spooled to disk (a memmap) is
+        never copied into RAM whole.
+
+        Args:
+            audio: Mono audio samples, int16 PCM or float32 in [-1, 1]
+            sample_rate: Sample rate of the audio (must be 16kHz)
+            batch_size: Segments decoded together by the batched pipeline
+            max_segment_seconds: Longest piece when splitting manually
+            window_seconds: Audio handed to the batched pipeline per call
 
-            # Transcribe the audio file
+        Yields:
+            LongFormSegment with timestamps relative to the start of the audio
+        """
+        if not self.model:
+            raise RuntimeError("Whisper model not loaded")
+
+        if sample_rate != WHISPER_SAMPLE_RATE:
+            raise ValueError(f"Expected {WHISPER_SAMPLE_RATE}Hz audio, got {sample_rate}Hz")
+        audio = mono_view(audio)
+        start = time.perf_counter()
+
+        if self._batched_pipeline is None:
+            try:
+                # Batched long-form pipeline, faster-whisper >= 1.1
+                from faster_whisper import BatchedInferencePipeline
+                self._batched_pipeline = BatchedInferencePipeline(model=self.model)
+            except ImportError:
+                self._batched_pipeline = False
+
+        if self._batched_pipeline:
+            # Windows are cut at pauses too, so no word straddles two calls
+            points = find_split_points(audio, WHISPER_SAMPLE_RATE, window_seconds)
+            for window_start, window_end in zip(points[:-1], points[1:]):
+                offset = window_start / WHISPER_SAMPLE_RATE
+                with self.scheduler.slot():
+                    segments, info = self._batched_pipeline.transcribe(
+                        to_float32(audio[window_start:window_end]),
+                        batch_size=batch_size,
+                        beam_size=5,
+                        language="en",
+                        condition_on_previous_text=False
+                    )
+                for segment in self.scheduler.iterate(segments):
+                    yield LongFormSegment(segment.start + offset, segment.end + offset, segment.text)
+            self._observe('long', start, len(audio))
+            return
+
+        points = find_split_points(audio, WHISPER_SAMPLE_RATE, max_segment_seconds)
+        pieces = list(zip(points[:-1], points[1:]))
+        caller_class = current_work_class()
+
+        def decode(piece):
+            start, end = piece
+            offset = start / WHISPER_SAMPLE_RATE
+            with work_class(caller_class):  # Pool threads are scheduled as the caller
+                return [
+                    LongFormSegment(segment.start + offset, segment.end + offset, segment.text)
+                    for segment in self._segments(to_float32(audio[start:end]))
+                ]
+
+        # Results are consumed in submission order, so the text stays in order
+        with ThreadPoolExecutor(max_workers=max(1, self.num_workers)) as pool:
+            futures = [pool.submit(decode, piece) for piece in pieces]
+            try:
+                for future in futures:
+                    yield from future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+        self._observe('long', start, len(audio))
+
+    def iter_segments_stream(self, blocks: Iterable[np.ndarray],
+                             window_seconds: float = 30.0,
+                             prompt_chars: int = 200) -> Iterator[LongFormSegment]:
+        """
+        Decode audio that is still arriving, one window at a time
+
+        Blocks are buffered until a window is full, then the window is cut at
+        a speech pause and decoded while the rest keeps arriving. Memory stays
+        bounded by about one window regardless of the total length. The tail
+        of each window's text is the prompt for the next.
+
+        Args:
+            blocks: 16kHz mono int16 (or float32) arrays, e.g. from audio_decode.iter_pcm_blocks
+            window_seconds: Longest piece decoded at once
+            prompt_chars: Preceding text carried into the next window's prompt
+
+        Yields:
+            LongFormSegment with timestamps relative to the start of the stream
+        """
+        if not self.model:
+            raise RuntimeError("Whisper model not loaded")
+
+        window = int(window_seconds * WHISPER_SAMPLE_RATE)
+        pending = []
+        pending_samples = 0
+        offset = 0  # Samples already decoded
+        prompt = None
+
+        def decode(piece):
+            nonlocal prompt
+            texts = []
+            for segment in self.iter_segments(piece, initial_prompt=prompt):
+                texts.append(segment.text)
+                yield LongFormSegment(segment.start + offset / WHISPER_SAMPLE_RATE,
+                                      segment.end + offset / WHISPER_SAMPLE_RATE, segment.text)
+            text = "".join(texts).strip()
+            prompt = ((prompt + " " if prompt else "") + text)[-prompt_chars:] or prompt
+
+        for block in blocks:
+            pending.append(block)
+            pending_samples += len(block)
+            if pending_samples <= window:
+                continue
+            buffered = np.concatenate(pending)
+            cut = find_split_points(buffered, WHISPER_SAMPLE_RATE, window_seconds)[1]
+            yield from decode(buffered[:cut])
+            offset += cut
+            pending = [buffered[cut:]]
+            pending_samples = len(pending[0])
+
+        if pending_samples:
+            yield from decode(np.concatenate(pending))
+
+    def _segments(self, samples: np.ndarray, beam_size: int = 5,
+                  initial_prompt: Optional[str] = None,
+                  word_timestamps: bool = False) -> Iterator:
+        """Lazily decode normalized float32 samples, a scheduler slot per segment"""
+        with self.scheduler.slot():
             segments, info = self.model.transcribe(
-                audio_file_path,
-                beam_size=5,
-                language="en",  # Set to English, can be made configurable
-                condition_on_previous_text=False
+                samples,
+                beam_size=beam_size,
+                language="en",
+                condition_on_previous_text=False,
+                initial_prompt=initial_prompt,
+                word_timestamps=word_timestamps
             )
+        yield from self.scheduler.iterate(segments)
+
+    def _observe(self, mode: str, start: float, samples: int):
+        """Record a completed decode in the /metrics histograms"""
+        observe_transcription(self.model_size, mode, time.perf_counter() - start,
+                              samples / WHISPER_SAMPLE_RATE)
+
+    def _transcribe(self, audio: Union[str, np.ndarray], beam_size: int = 5) -> Optional[str]:
+        """Run the model over a file path or normalized float32 samples"""
+        try:
+            start = time.perf_counter()
+            with self.scheduler.slot():
+                segments, info = self.model.transcribe(
+                    audio,
+                    beam_size=beam_size,
+                    language="en",  # Set to English, can be made configurable
+                    condition_on_previous_text=False
+                )
 
             # Combine all segments into one text
-            transcription = " ".join([segment.text for segment in segments])
+            transcription = " ".join([segment.text for segment in self.scheduler.iterate(segments)])
+            observe_transcription(self.model_size, 'file' if isinstance(audio, str) else 'array',
+                                  time.perf_counter() - start, info.duration)
 
             print(f"Transcription complete: {transcription[:100]}...")
             return transcription.strip()
@@ -76,6 +341,40 @@ class WhisperClient:
             print(f"Transcription error: {e}")
             return None
 
+    def warm_up(self) -> float:
+        """
+        Run one short throwaway decode
+
+        The first decode after loading pays for CTranslate2 kernel selection
+        and buffer allocation; doing it here keeps that off the first real
+        transcription.
+
+        Returns:
+            Seconds the warm-up decode took (0 if the model isn't loaded)
+        """
+        if not self.model:
+            return 0.0
+        start = time.perf_counter()
+        # Low-level noise rather than digital silence, so the decoder runs normally
+        noise = np.random.default_rng(0).normal(0, 0.01, WHISPER_SAMPLE_RATE).astype(np.float32)
+        try:
+            with self.scheduler.slot():
+                segments, info = self.model.transcribe(noise, beam_size=1, language="en",
+                                                       condition_on_previous_text=False)
+                for _ in segments:
+                    pass
+            self.warmed_up = True
+        except Exception as e:
+            print(f"Warm-up error: {e}")
+        elapsed = time.perf_counter() - start
+        print(f"Whisper {self.model_size} warmed up in {elapsed:.2f}s")
+        return elapsed
+
+    @property
+    def model_key(self) -> tuple:
+        """(model_size, compute_type, device) identifying the loaded weights"""
+        return (self.model_size, self.compute_type, self.device)
+
     def check_health(self) -> bool:
         """
         Check if Whisper model is loaded and ready
@@ -86,6 +385,38 @@ class WhisperClient:
         return self.model is not None
 
 
+def mono_view(audio: np.ndarray) -> np.ndarray:
+    """1-D view of mono audio of shape (frames,) or (frames, 1), without copying"""
+    audio = np.asarray(audio)
+    if audio.ndim == 2:
+        if audio.shape[1] != 1:
+            raise ValueError(f"Expected mono audio, got {audio.shape[1]} channels")
+        audio = audio[:, 0]
+    return audio
+
+
+def to_float32(audio: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Normalize captured audio into the 1-D float32 layout faster-whisper decodes
+
+    Args:
+        audio: int16 PCM or float samples, shape (frames,) or (frames, 1)
+        sample_rate: Sample rate of the audio
+
+    Returns:
+        Contiguous float32 array scaled to [-1, 1]
+    """
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        raise ValueError(f"Expected {WHISPER_SAMPLE_RATE}Hz audio, got {sample_rate}Hz")
+
+    audio = mono_view(audio)
+    if audio.dtype == np.int16:
+        samples = audio.astype(np.float32)
+        samples *= 1.0 / 32768.0
+        return samples
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
 if __name__ == "__main__":
     # Test the Whisper client
     client = WhisperClient(model_size="tiny")
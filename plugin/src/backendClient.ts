@@ -6,6 +6,8 @@ export interface BackendStatus {
     service: string;
     ollama_connected: boolean;
     model_available: boolean;
+    state?: 'starting' | 'loading' | 'warming' | 'ready' | 'failed';
+    session_id?: string;
     is_recording: boolean;
     timestamp: string;
 }
@@ -16,18 +18,49 @@ export interface TranscriptionResult {
     timestamp: string;
 }
 
+export interface TranscriptionSegment {
+    start: number;
+    end: number;
+    text: string;
+}
+
+export interface TranscriptionJob {
+    job_id: string;
+    status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+    progress: number;
+    transcription: string | null;
+    error: string | null;
+    finished_at: string | null;
+}
+
 export class BackendClient {
     private baseUrl: string;
+    private sessionId: string;
 
-    constructor(baseUrl: string) {
+    /**
+     * @param sessionId Recording session of this client; the backend keeps each
+     *                  session's recording and results apart, so several
+     *                  Obsidian windows can record at the same time
+     */
+    constructor(baseUrl: string, sessionId: string = 'default') {
         this.baseUrl = baseUrl.replace(/\/$/, ''); // Remove trailing slash
+        this.sessionId = sessionId;
+    }
+
+    /**
+     * URL of a session-scoped endpoint. The session goes in the query string
+     * rather than a header, as EventSource can't set headers and vault names
+     * need not be ASCII.
+     */
+    private sessionUrl(path: string): string {
+        return `${this.baseUrl}${path}?session_id=${encodeURIComponent(this.sessionId)}`;
     }
 
     /**
      * Check backend and Ollama status
      */
     async getStatus(): Promise<BackendStatus> {
-        const response = await fetch(`${this.baseUrl}/status`);
+        const response = await fetch(this.sessionUrl('/status'));
         if (!response.ok) {
             throw new Error(`Backend request failed: ${response.statusText}`);
         }
@@ -38,7 +71,7 @@ export class BackendClient {
      * Start audio recording
      */
     async startRecording(): Promise<void> {
-        const response = await fetch(`${this.baseUrl}/start-recording`, {
+        const response = await fetch(this.sessionUrl('/start-recording'), {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -52,10 +85,10 @@ export class BackendClient {
     }
 
     /**
-     * Stop recording and get transcription
+     * Stop recording and wait for the background transcription job
      */
-    async stopRecording(): Promise<TranscriptionResult> {
-        const response = await fetch(`${this.baseUrl}/stop-recording`, {
+    async stopRecording(onProgress?: (job: TranscriptionJob) => void): Promise<TranscriptionResult> {
+        const response = await fetch(this.sessionUrl('/stop-recording'), {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -67,14 +100,171 @@ export class BackendClient {
             throw new Error(error.error || 'Failed to stop recording');
         }
 
+        const queued = await response.json();
+        const job = await this.waitForJob(queued.job_id, onProgress);
+
+        if (job.status !== 'completed' || !job.transcription) {
+            throw new Error(job.error || `Transcription ${job.status}`);
+        }
+
+        return {
+            status: job.status,
+            transcription: job.transcription,
+            timestamp: job.finished_at || new Date().toISOString()
+        };
+    }
+
+    /**
+     * Get the status of a transcription job
+     */
+    async getJob(jobId: string): Promise<TranscriptionJob> {
+        const response = await fetch(`${this.baseUrl}/jobs/${jobId}`);
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Failed to get transcription job');
+        }
+
         return await response.json();
     }
 
+    /**
+     * Subscribe to the backend's Server-Sent Events stream
+     * (chunk, wake, stop, transcription, job_progress, job) for this session.
+     * EventSource reconnects on its own and resumes from the last event id.
+     */
+    subscribeEvents(handlers: { [eventType: string]: (data: any) => void }): EventSource {
+        const source = new EventSource(this.sessionUrl('/events'));
+        for (const eventType of Object.keys(handlers)) {
+            source.addEventListener(eventType, (event: MessageEvent) => {
+                handlers[eventType](JSON.parse(event.data));
+            });
+        }
+        return source;
+    }
+
+    /**
+     * Wait for a transcription job to finish, driven by pushed job events.
+     * If the event stream breaks or timeoutMs passes, the job is polled
+     * once: a finished job resolves, a lost job or backend rejects.
+     */
+    waitForJob(
+        jobId: string,
+        onProgress?: (job: TranscriptionJob) => void,
+        timeoutMs: number = 30 * 60 * 1000
+    ): Promise<TranscriptionJob> {
+        return new Promise((resolve, reject) => {
+            let source: EventSource;
+            let settled = false;
+            const settle = (job: TranscriptionJob | null, error?: Error) => {
+                if (settled) {
+                    return;
+                }
+                settled = true;
+                clearTimeout(timer);
+                source.close();
+                if (job) {
+                    resolve(job);
+                } else {
+                    reject(error);
+                }
+            };
+            const isFinished = (job: TranscriptionJob) =>
+                job.status === 'completed' || job.status === 'failed' || job.status === 'cancelled';
+
+            // Settle from the job's current state; keepWaiting says what to do if it is still running
+            const poll = async (keepWaiting: boolean, reason: string) => {
+                try {
+                    const job = await this.getJob(jobId);
+                    if (isFinished(job)) {
+                        settle(job);
+                    } else if (!keepWaiting) {
+                        settle(null, new Error(reason));
+                    }
+                } catch (error) {
+                    settle(null, error);
+                }
+            };
+
+            source = this.subscribeEvents({
+                job_progress: (data) => {
+                    if (data.job_id === jobId) {
+                        onProgress?.({ ...data, status: 'running' } as TranscriptionJob);
+                    }
+                },
+                job: (data: TranscriptionJob) => {
+                    if (data.job_id === jobId) {
+                        settle(data);
+                    }
+                }
+            });
+
+            // The job may have finished before the stream was open
+            source.addEventListener('open', () => poll(true, ''));
+
+            // The backend went away (or restarted and lost the job) if the poll fails too;
+            // while it answers, EventSource keeps reconnecting unless it gave up
+            source.addEventListener('error', () =>
+                poll(source.readyState !== EventSource.CLOSED, 'Lost the connection to the backend'));
+
+            const timer = setTimeout(
+                () => poll(false, `Transcription did not finish within ${Math.round(timeoutMs / 60000)} minutes`),
+                timeoutMs);
+        });
+    }
+
+    /**
+     * Transcribe an audio file (WAV, raw 16kHz PCM, or compressed audio).
+     * Segments arrive as NDJSON while the backend decodes them.
+     */
+    async transcribeAudio(
+        data: ArrayBuffer,
+        contentType: string,
+        onSegment?: (segment: TranscriptionSegment) => void
+    ): Promise<string> {
+        const response = await fetch(`${this.baseUrl}/transcribe`, {
+            method: 'POST',
+            headers: { 'Content-Type': contentType },
+            body: data
+        });
+
+        if (!response.ok || !response.body) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.error || 'Failed to transcribe audio');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        let transcription = '';
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (value) {
+                buffered += decoder.decode(value, { stream: true });
+            }
+            const lines = buffered.split('\n');
+            buffered = done ? '' : lines.pop() || '';
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const message = JSON.parse(line);
+                if (message.type === 'segment' && onSegment) {
+                    onSegment(message);
+                } else if (message.type === 'done') {
+                    transcription = message.transcription;
+                } else if (message.type === 'error') {
+                    throw new Error(message.error);
+                }
+            }
+            if (done) break;
+        }
+        return transcription;
+    }
+
     /**
      * Get the last transcription result
      */
     async getLastTranscription(): Promise<TranscriptionResult> {
-        const response = await fetch(`${this.baseUrl}/transcription`);
+        const response = await fetch(this.sessionUrl('/transcription'));
 
         if (!response.ok) {
             const error = await response.json();
@@ -2,6 +2,17 @@ import { Notice, Plugin, TFile } from 'obsidian';
 import { VoiceNotesSettings, DEFAULT_SETTINGS, VoiceNotesSettingTab } from './settings';
 import { BackendClient } from './backendClient';
 
+// Audio attachments the backend can transcribe, by file extension
+const AUDIO_CONTENT_TYPES: Record<string, string> = {
+    wav: 'audio/wav',
+    mp3: 'audio/mpeg',
+    m4a: 'audio/mp4',
+    ogg: 'audio/ogg',
+    opus: 'audio/ogg',
+    webm: 'audio/webm',
+    flac: 'audio/flac'
+};
+
 export default class VoiceNotesPlugin extends Plugin {
     settings: VoiceNotesSettings;
     backendClient: BackendClient;
@@ -12,8 +23,13 @@ export default class VoiceNotesPlugin extends Plugin {
     async onload() {
         await this.loadSettings();
 
-        // Initialize backend client
-        this.backendClient = new BackendClient(this.settings.backendUrl);
+        // Initialize backend client, with a recording session of this vault's own.
+        // The id is kept across reloads, so the backend's transcript log for it is reused.
+        if (!this.settings.sessionId) {
+            this.settings.sessionId = `${this.app.vault.getName()}-${Math.random().toString(36).slice(2, 8)}`;
+            await this.saveData(this.settings);
+        }
+        this.backendClient = new BackendClient(this.settings.backendUrl, this.settings.sessionId);
 
         // Add ribbon icon for recording
         this.ribbonIcon = this.addRibbonIcon(
@@ -53,6 +69,21 @@ export default class VoiceNotesPlugin extends Plugin {
             }
         });
 
+        this.addCommand({
+            id: 'transcribe-audio-file',
+            name: 'Transcribe Active Audio File',
+            checkCallback: (checking: boolean) => {
+                const file = this.app.workspace.getActiveFile();
+                if (!file || !(file.extension.toLowerCase() in AUDIO_CONTENT_TYPES)) {
+                    return false;
+                }
+                if (!checking) {
+                    this.transcribeAudioFile(file);
+                }
+                return true;
+            }
+        });
+
         // Add settings tab
         this.addSettingTab(new VoiceNotesSettingTab(this.app, this));
 
@@ -109,7 +140,9 @@ export default class VoiceNotesPlugin extends Plugin {
             this.statusBarItem.setText('⏳ Processing...');
             this.ribbonIcon.removeClass('voice-notes-recording');
 
-            const result = await this.backendClient.stopRecording();
+            const result = await this.backendClient.stopRecording((job) => {
+                this.statusBarItem.setText(`⏳ Processing... ${Math.round(job.progress * 100)}%`);
+            });
             this.isRecording = false;
 
             if (result.transcription) {
@@ -139,6 +172,38 @@ export default class VoiceNotesPlugin extends Plugin {
         }
     }
 
+    async transcribeAudioFile(file: TFile) {
+        try {
+            this.statusBarItem.setText('⏳ Transcribing file...');
+            const data = await this.app.vault.readBinary(file);
+            const transcription = await this.backendClient.transcribeAudio(
+                data,
+                AUDIO_CONTENT_TYPES[file.extension.toLowerCase()],
+                (segment) => {
+                    this.statusBarItem.setText(`⏳ Transcribing file... ${Math.round(segment.end)}s`);
+                }
+            );
+
+            if (transcription) {
+                await this.appendTranscriptionToNote(`![[${file.path}]]\n${transcription}`);
+                this.statusBarItem.setText('✓ Transcribed');
+                new Notice(`✓ Transcribed ${file.name}`);
+            } else {
+                this.statusBarItem.setText('✗ Failed');
+                new Notice('No speech found in file');
+            }
+        } catch (error) {
+            this.statusBarItem.setText('✗ Error');
+            new Notice(`Failed to transcribe ${file.name}: ${error.message}`);
+            console.error('Transcribe file error:', error);
+        }
+
+        // Reset status after 3 seconds
+        setTimeout(() => {
+            this.statusBarItem.setText('🎤 Ready');
+        }, 3000);
+    }
+
     async appendTranscriptionToNote(transcription: string) {
         const noteName = this.settings.targetNoteName;
         const timestamp = new Date().toLocaleString('en-US', {
@@ -189,7 +254,7 @@ export default class VoiceNotesPlugin extends Plugin {
         await this.saveData(this.settings);
 
         // Update backend client URL if changed
-        this.backendClient = new BackendClient(this.settings.backendUrl);
+        this.backendClient = new BackendClient(this.settings.backendUrl, this.settings.sessionId);
 
         // Update backend config
         try {
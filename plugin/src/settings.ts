@@ -9,6 +9,7 @@ export interface VoiceNotesSettings {
     wakePhrase: string;
     stopPhrase: string;
     autoStartListening: boolean;
+    sessionId: string;  // Backend recording session, generated on first load
 }
 
 export const DEFAULT_SETTINGS: VoiceNotesSettings = {
@@ -18,7 +19,8 @@ export const DEFAULT_SETTINGS: VoiceNotesSettings = {
     targetNoteName: 'Voice Notes.md',
     wakePhrase: 'computer start note',
     stopPhrase: 'computer end note',
-    autoStartListening: false
+    autoStartListening: false,
+    sessionId: ''
 };
 
 export class VoiceNotesSettingTab extends PluginSettingTab {
@@ -143,10 +145,14 @@ export class VoiceNotesSettingTab extends PluginSettingTab {
                     text: data.ollama_connected ? '✓ Ollama is connected' : '✗ Ollama is not connected',
                     cls: data.ollama_connected ? 'voice-notes-status-success' : 'voice-notes-status-error'
                 });
-                statusEl.createEl('p', {
-                    text: data.model_available ? '✓ Model is available' : '✗ Model not found',
-                    cls: data.model_available ? 'voice-notes-status-success' : 'voice-notes-status-error'
-                });
+                if (!data.model_available && ['starting', 'loading', 'warming'].includes(data.state)) {
+                    statusEl.createEl('p', { text: `… Model is ${data.state === 'warming' ? 'warming up' : 'loading'}` });
+                } else {
+                    statusEl.createEl('p', {
+                        text: data.model_available ? '✓ Model is available' : '✗ Model not found',
+                        cls: data.model_available ? 'voice-notes-status-success' : 'voice-notes-status-error'
+                    });
+                }
             } else {
                 statusEl.empty();
                 statusEl.createEl('p', {